@@ -0,0 +1,223 @@
+"""
+Content-Encoding negotiation for chunk transfer between services.
+
+zstd is preferred when the optional `zstandard` package is installed, gzip is
+always available. Chunks that are already compressed (recognised by their magic
+bytes) or whose leading sample does not shrink are sent as-is.
+"""
+import os
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+CHUNK_COMPRESSION_ENABLED = os.getenv("CHUNK_COMPRESSION_ENABLED", "false").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes, smaller bodies are not worth it
+COMPRESSION_SAMPLE_SIZE = int(os.getenv("COMPRESSION_SAMPLE_SIZE", "65536"))
+COMPRESSION_MIN_SAVING = float(os.getenv("COMPRESSION_MIN_SAVING", "0.1"))  # sample must shrink by 10%
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+# Preference order for responses
+SUPPORTED_ENCODINGS = (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+# zstd decompressobj has no output limit; at zstd's worst-case ratio (a 4-byte RLE block
+# decodes to 128 KB) this much input yields at most a few MB per call
+_ZSTD_FEED_SIZE = 256
+
+# Magic numbers of formats that are already compressed
+_COMPRESSED_SIGNATURES = (
+    b"\x1f\x8b",              # gzip
+    b"\x28\xb5\x2f\xfd",      # zstd
+    b"PK\x03\x04",            # zip, docx, xlsx, jar, apk
+    b"\x89PNG",               # png
+    b"\xff\xd8\xff",          # jpeg
+    b"GIF8",                  # gif
+    b"BZh",                   # bzip2
+    b"\xfd7zXZ\x00",          # xz
+    b"7z\xbc\xaf\x27\x1c",    # 7z
+    b"Rar!",                  # rar
+    b"OggS",                  # ogg
+    b"fLaC",                  # flac
+    b"ID3",                   # mp3
+    b"\x1aE\xdf\xa3",         # matroska / webm
+)
+
+
+class DecompressedTooLarge(ValueError):
+    """Decoded body exceeds the allowed size"""
+
+
+class TruncatedBody(ValueError):
+    """Encoded body ends before the end of its gzip or zstd frame"""
+
+
+# Raised for corrupt or truncated encoded bodies
+DECODE_ERRORS = (zlib.error, TruncatedBody) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def looks_compressed(data: bytes) -> bool:
+    """True when the data starts with the signature of an already-compressed format"""
+    head = bytes(data[:16])
+    if head.startswith(_COMPRESSED_SIGNATURES):
+        return True
+    # RIFF containers (webp, avi) and ISO media (mp4, mov, heic)
+    if head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"AVI "):
+        return True
+    return head[4:8] == b"ftyp"
+
+
+def is_compressible(data: bytes) -> bool:
+    """Cheap check: skip small bodies, known compressed formats and samples that do not shrink"""
+    if len(data) < COMPRESSION_MIN_SIZE or looks_compressed(data):
+        return False
+    sample = bytes(data[:COMPRESSION_SAMPLE_SIZE])
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1.0 - COMPRESSION_MIN_SAVING)
+
+
+def select_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred supported encoding allowed by an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(bytes(data))
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compressobj(encoding: str):
+    """Incremental compressor with compress(piece) and flush(), for streamed responses"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str], max_size: int) -> bytes:
+    """Decode a Content-Encoding, refusing output larger than max_size"""
+    if encoding in (None, "", "identity"):
+        return data
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd is not supported by this service")
+        # Bounded read: a frame header may declare any size
+        with zstandard.ZstdDecompressor().stream_reader(bytes(data)) as reader:
+            output = bytearray()
+            while len(output) <= max_size:
+                piece = reader.read(max_size + 1 - len(output))
+                if not piece:
+                    break
+                output += piece
+        output = bytes(output)
+    elif encoding == "gzip":
+        reader = zlib.decompressobj(31)
+        output = reader.decompress(data, max_size + 1)
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    if len(output) > max_size:
+        raise DecompressedTooLarge(f"Decoded body exceeds {max_size} bytes")
+    return output
+
+
+class DecodingReader:
+    """
+    File-like view decoding a Content-Encoding while it is read, so an encoded
+    upload can be stored without holding either form in memory. Raises
+    DecompressedTooLarge once more than max_size bytes have been produced.
+    """
+
+    def __init__(self, raw, encoding: str, max_size: int):
+        self.max_size = max_size
+        self.bytes_read = 0
+        self._raw = raw
+        self._encoding = encoding
+        self._gzip = None
+        self._zstd = None  # decompressor of the current frame, None between frames
+        self._zstd_input = memoryview(b"")
+        self._zstd_output = b""
+        self._zstd_frames = 0
+        if encoding == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd is not supported by this service")
+        elif encoding == "gzip":
+            self._gzip = zlib.decompressobj(31)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def _read_gzip(self, size: int) -> bytes:
+        while not self._gzip.eof:
+            data = self._gzip.unconsumed_tail or self._raw.read(COMPRESSION_SAMPLE_SIZE)
+            if not data:
+                raise TruncatedBody("gzip body ends before the end of its stream")
+            output = self._gzip.decompress(data, size)
+            if output:
+                return output
+        return b""
+
+    def _read_zstd(self, size: int) -> bytes:
+        # Concatenated frames decode to the concatenation of their content
+        while not self._zstd_output:
+            if not self._zstd_input:
+                data = self._raw.read(COMPRESSION_SAMPLE_SIZE)
+                if not data:
+                    if self._zstd is not None or not self._zstd_frames:
+                        raise TruncatedBody("zstd body ends before the end of its frame")
+                    return b""
+                self._zstd_input = memoryview(data)
+            if self._zstd is None:
+                self._zstd = zstandard.ZstdDecompressor().decompressobj()
+            feed, self._zstd_input = self._zstd_input[:_ZSTD_FEED_SIZE], self._zstd_input[_ZSTD_FEED_SIZE:]
+            self._zstd_output = self._zstd.decompress(feed)
+            if self._zstd.eof:
+                self._zstd_input = memoryview(self._zstd.unused_data + bytes(self._zstd_input))
+                self._zstd = None
+                self._zstd_frames += 1
+            if self.bytes_read + len(self._zstd_output) > self.max_size:
+                raise DecompressedTooLarge(f"Decoded body exceeds {self.max_size} bytes")
+        output, self._zstd_output = self._zstd_output[:size], self._zstd_output[size:]
+        return output
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            pieces = []
+            while True:
+                piece = self.read(COMPRESSION_SAMPLE_SIZE)
+                if not piece:
+                    return b"".join(pieces)
+                pieces.append(piece)
+        piece = self._read_zstd(size) if self._encoding == "zstd" else self._read_gzip(size)
+        self.bytes_read += len(piece)
+        if self.bytes_read > self.max_size:
+            raise DecompressedTooLarge(f"Decoded body exceeds {self.max_size} bytes")
+        return piece
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETag of an encoded representation (it differs byte-wise from identity)"""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
-from fastapi.responses import StreamingResponse, Response
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .minio_client import (
-    ensure_bucket, upload_chunk, download_chunk, 
-    delete_chunk, list_chunks, MINIO_BUCKET
+from .storage import (
+    backend, maintain_periodically, run_io, run_upload, io_pool_stats, take,
+    StorageError, ChunkNotFound, PresignUnsupported
 )
 from .auth import get_current_user
-from minio.error import S3Error
-from io import BytesIO
+from . import compression, deadline, framing
+from .streams import AsyncBodyReader, iter_object
+from .usage import usage
+from .http_cache import (
+    IMMUTABLE_CACHE_CONTROL, make_etag, format_http_date,
+    is_not_modified, has_conditional_headers, requests_no_cache
+)
+from pydantic import BaseModel
+from typing import List, Optional
+from collections import deque
 import uuid
+import json
 import asyncio
+import os
+
+PRESIGN_MAX_CHUNKS = 1000
+MAX_CHUNK_UPLOAD_SIZE = int(os.getenv("MAX_CHUNK_UPLOAD_SIZE", str(64 * 1024 * 1024)))
+BATCH_GET_CONCURRENCY = int(os.getenv("BATCH_GET_CONCURRENCY", "16"))  # storage reads in flight per batch
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "10000"))  # chunks per GET /chunks page
+PRESIGN_DEFAULT_EXPIRY = int(os.getenv("PRESIGN_DEFAULT_EXPIRY", "900"))  # seconds
+PRESIGN_MAX_EXPIRY = int(os.getenv("PRESIGN_MAX_EXPIRY", "604800"))  # S3 limit: 7 days
+# Downloads are relayed to the client in pieces of this size
+STREAM_PIECE_SIZE = int(os.getenv("STREAM_PIECE_SIZE", str(256 * 1024)))
 
 app = FastAPI(
     title="Block Storage Service API",
@@ -17,6 +36,9 @@ app = FastAPI(
     description="API for storing, retrieving, and deleting file chunks with Auth0 authentication."
 )
 
+# Enforce X-Request-Timeout deadlines (added first so CORS headers still wrap its 504s)
+app.add_middleware(deadline.DeadlineMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,34 +50,50 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize MinIO bucket on startup"""
+    """Prepare the storage backend (MinIO bucket, chunk directory or segment index) on startup"""
     try:
-        print("Initializing MinIO connection...")
-        ensure_bucket()
-        print("Block Storage Service started successfully with MinIO")
+        print(f"Initializing {backend.name} storage...")
+        await run_io(backend.ensure_ready)
+        print(f"Block Storage Service started successfully with {backend.name}")
+        # Counters behind /stats start from a full scan, then follow uploads and deletes
+        app.state.usage_reconciler = asyncio.create_task(usage.reconcile_periodically())
+        if backend.maintenance_interval > 0:
+            app.state.storage_maintenance = asyncio.create_task(maintain_periodically())
     except Exception as e:
-        print(f"Failed to initialize MinIO: {e}")
-        print("Check if MinIO service is running and accessible")
+        print(f"Failed to initialize {backend.name} storage: {e}")
+        print("Check if the storage backend is running and accessible")
         # Don't raise here to allow service to start for debugging
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Let the storage backend persist its state (the segment store's index)"""
+    try:
+        await run_io(backend.close)
+    except Exception as e:
+        print(f"Failed to close {backend.name} storage: {e}")
+
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: deadline.DeadlineExceeded):
+    """The caller gave up already: skip the storage round trip"""
+    print(f"Deadline exceeded for {request.method} {request.url.path}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint (no auth required)"""
     try:
-        # Test MinIO connection by listing buckets
-        from .minio_client import minio_client
-        buckets = minio_client.list_buckets()
+        # Test the backend (MinIO lists its buckets, the filesystem reports free space)
+        details = await run_io(backend.health)
         return {
             "status": "healthy", 
-            "storage": "MinIO", 
-            "bucket": MINIO_BUCKET,
-            "minio_buckets": [b.name for b in buckets]
+            "storage": backend.name, 
+            **details
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "error": str(e),
-            "message": "MinIO connection failed"
+            "message": f"{backend.name} storage check failed"
         }
 
 @app.options("/health")
@@ -65,53 +103,140 @@ async def health_check_options():
 
 @app.get("/")
 async def root():
-    return {"message": "Block Storage Service", "storage": "MinIO", "status": "running", "auth": "Auth0"}
+    return {"message": "Block Storage Service", "storage": backend.name, "status": "running", "auth": "Auth0"}
 
 @app.options("/")
 async def root_options():
     """Handle OPTIONS preflight for root endpoint"""
     return {"message": "OK"}
 
+@app.head("/chunks/{chunk_id}")
+async def head_file_chunk(chunk_id: str, request: Request):
+    """Existence, size and validators of a chunk from its stored metadata, without reading the body"""
+    try:
+        deadline.check()
+        store = await run_io(backend.bypass_cache, chunk_id) if requests_no_cache(request.headers) else backend
+        stat = await run_io(store.stat, chunk_id)
+    except deadline.DeadlineExceeded:
+        raise
+    except ChunkNotFound:
+        return Response(status_code=404)
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    etag = make_etag(stat.etag) if stat.etag else None
+    headers = chunk_cache_headers(etag, stat.last_modified)
+    if etag and is_not_modified(request.headers, etag, stat.last_modified):
+        return Response(status_code=304, headers=headers)
+    headers.update({
+        "Content-Length": str(stat.size),
+        "Accept-Ranges": "bytes"
+    })
+    return Response(status_code=200, headers=headers, media_type="application/octet-stream")
+
+# Registered after HEAD, which GET routes would otherwise answer by opening the object
 @app.get("/chunks/{chunk_id}")
-async def download_file_chunk(chunk_id: str):
-    """Download a file chunk from MinIO - NO AUTH REQUIRED for downloads"""
+async def download_file_chunk(chunk_id: str, request: Request):
+    """Download a file chunk from storage - NO AUTH REQUIRED for downloads"""
     try:
         print(f"Downloading chunk: {chunk_id}")
+        # Cache-Control: no-cache goes past (and drops) the local cache tier
+        store = await run_io(backend.bypass_cache, chunk_id) if requests_no_cache(request.headers) else backend
         
-        # Download chunk data
-        chunk_data = download_chunk(chunk_id)
-        print(f"Successfully downloaded chunk {chunk_id}: {len(chunk_data)} bytes")
+        # Conditional request: answer from object metadata without reading the body
+        if has_conditional_headers(request.headers):
+            stat = await run_io(store.stat, chunk_id)
+            etag = make_etag(stat.etag) if stat.etag else None
+            # The client may hold the identity or any encoded representation
+            candidates = [etag] + [compression.variant_etag(etag, e) for e in compression.SUPPORTED_ENCODINGS] if etag else []
+            for candidate in candidates:
+                if is_not_modified(request.headers, candidate, stat.last_modified):
+                    headers = chunk_cache_headers(candidate, stat.last_modified)
+                    if compression.CHUNK_COMPRESSION_ENABLED:
+                        headers["Vary"] = "Accept-Encoding"
+                    return Response(status_code=304, headers=headers)
         
-        # 🚀 CRITICAL FIX: Ensure Content-Length is accurate
-        actual_size = len(chunk_data)
+        # The caller may have given up while this request queued
+        deadline.check()
+        encoding = None
+        if compression.CHUNK_COMPRESSION_ENABLED:
+            encoding = compression.select_encoding(request.headers.get("accept-encoding"))
         
-        # Return as streaming response with CORRECT headers
+        # Chunks on local disk go out as files: the server copies them from the page cache
+        # (sendfile where it supports it) instead of through Python reads
+        local_path = store.local_path(chunk_id)
+        if local_path and not encoding:
+            stat = await run_io(store.stat, chunk_id)
+            print(f"Sending chunk file {chunk_id}: {stat.size} bytes")
+            headers = chunk_cache_headers(make_etag(stat.etag) if stat.etag else None, stat.last_modified)
+            headers["Accept-Ranges"] = "bytes"
+            if compression.CHUNK_COMPRESSION_ENABLED:
+                headers["Vary"] = "Accept-Encoding"
+            return FileResponse(local_path, media_type="application/octet-stream", headers=headers)
+        
+        reader, info = await run_io(store.open, chunk_id)
+        try:
+            etag = make_etag(info.etag) if info.etag else None
+            
+            # Negotiate Content-Encoding; already-compressed or incompressible chunks go as-is.
+            # The first piece is enough to tell.
+            head = b""
+            if encoding:
+                head = await run_io(reader.read, STREAM_PIECE_SIZE)
+                if not compression.is_compressible(head):
+                    encoding = None
+        except BaseException:
+            reader.close()
+            raise
+        print(f"Streaming chunk {chunk_id}: {info.size} bytes")
+        
+        headers = chunk_cache_headers(
+            compression.variant_etag(etag, encoding) if etag else None,
+            info.last_modified
+        )
+        headers["Accept-Ranges"] = "bytes"  # Enable range requests
+        # 🚀 CRITICAL FIX: Content-Length is the object's length; encoded bodies are sent chunked
+        if not encoding and info.size is not None:
+            headers["Content-Length"] = str(info.size)
+        if compression.CHUNK_COMPRESSION_ENABLED:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        
+        # Relay the chunk piece by piece; the reader is closed when the stream ends
         return StreamingResponse(
-            BytesIO(chunk_data),
+            iter_object(reader, STREAM_PIECE_SIZE, head, compression.compressobj(encoding) if encoding else None),
             media_type="application/octet-stream",
-            headers={
-                "Content-Length": str(actual_size),  # CRITICAL: Must match actual data
-                "Cache-Control": "max-age=3600",
-                "Accept-Ranges": "bytes"  # Enable range requests
-            }
+            headers=headers
         )
     
-    except S3Error as e:
-        print(f"MinIO S3 error downloading chunk {chunk_id}: {e}")
-        if "NoSuchKey" in str(e):
-            raise HTTPException(status_code=404, detail="Chunk not found")
-        raise HTTPException(status_code=500, detail=f"MinIO error: {str(e)}")
+    except deadline.DeadlineExceeded:
+        raise
+    except ChunkNotFound:
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    except StorageError as e:
+        print(f"Storage error downloading chunk {chunk_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         print(f"Error downloading chunk {chunk_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
 
+def chunk_cache_headers(etag: str, last_modified) -> dict:
+    """Validator and caching headers for immutable chunk objects"""
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
 @app.post("/chunks")
 async def upload_file_chunk(
     file: UploadFile = File(...),
     chunk_id: str = Form(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload a file chunk to MinIO (requires Auth0 authentication)"""
+    """Upload a file chunk to storage (requires Auth0 authentication)"""
     try:
         print(f"Received upload request for file: {file.filename}")
         
@@ -121,35 +246,236 @@ async def upload_file_chunk(
         
         print(f"Using chunk_id: {chunk_id}")
         
-        # Read file data
-        data = await file.read()
-        print(f"File size: {len(data)} bytes")
+        # The multipart parser spooled the part to a temporary file; stream it from there
+        size = file.size if file.size is not None else -1
+        print(f"File size: {size} bytes")
         
-        # Upload to MinIO
-        print("Uploading to MinIO...")
-        upload_chunk(chunk_id, data)
+        print(f"Uploading to {backend.name}...")
+        await run_io(backend.put, chunk_id, file.file, size)
+        usage.record_put(size)
         print("Upload successful!")
         
         return {
             "message": "Chunk uploaded successfully",
             "chunk_id": chunk_id,
-            "size": len(data),
-            "bucket": MINIO_BUCKET
+            "size": size,
+            "bucket": backend.location
+        }
+    
+    except StorageError as e:
+        print(f"Storage error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        print(f"Upload error: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+@app.put("/chunks/{chunk_id}")
+async def put_file_chunk(
+    chunk_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload a chunk as a raw application/octet-stream body (no multipart parsing or temp files).
+    The body is streamed into the storage backend as it arrives, never held whole in memory.
+    A zstd or gzip Content-Encoding is decoded on the way, so objects are always kept raw.
+    """
+    content_encoding = (request.headers.get("content-encoding") or "identity").strip().lower()
+    if content_encoding != "identity" and content_encoding not in compression.SUPPORTED_ENCODINGS:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {content_encoding}")
+    
+    declared_length = request.headers.get("content-length")
+    if declared_length is not None:
+        if not declared_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if int(declared_length) > MAX_CHUNK_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail=f"Chunk exceeds {MAX_CHUNK_UPLOAD_SIZE} bytes")
+    
+    async def limited_body():
+        received = 0
+        async for piece in request.stream():
+            received += len(piece)
+            if received > MAX_CHUNK_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail=f"Chunk exceeds {MAX_CHUNK_UPLOAD_SIZE} bytes")
+            yield piece
+    
+    body = AsyncBodyReader(limited_body(), asyncio.get_running_loop())
+    if content_encoding == "identity":
+        source, length = body, int(declared_length) if declared_length is not None else -1
+    else:
+        # The decoded length is unknown until the end (MinIO falls back to a multipart upload)
+        source, length = compression.DecodingReader(body, content_encoding, MAX_CHUNK_UPLOAD_SIZE), -1
+    
+    try:
+        print(f"Receiving raw upload for chunk {chunk_id}: {declared_length or 'unknown'} bytes ({content_encoding})")
+        deadline.check()
+        # The put waits on the client's body, so it runs on the upload pool, not the I/O pool
+        await run_upload(backend.put, chunk_id, source, length)
+        usage.record_put(source.bytes_read)
+        
+        return {
+            "message": "Chunk uploaded successfully",
+            "chunk_id": chunk_id,
+            "size": source.bytes_read,
+            "bucket": backend.location
         }
     
-    except S3Error as e:
-        print(f"MinIO S3 error: {e}")
-        raise HTTPException(status_code=500, detail=f"MinIO error: {str(e)}")
+    except asyncio.CancelledError:
+        body.abort()
+        raise
+    except (HTTPException, deadline.DeadlineExceeded):
+        raise
+    except compression.DecompressedTooLarge:
+        raise HTTPException(status_code=413, detail=f"Chunk exceeds {MAX_CHUNK_UPLOAD_SIZE} bytes")
+    except compression.DECODE_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {content_encoding} body: {str(e)}")
+    except StorageError as e:
+        print(f"Storage error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         print(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+class PresignRequest(BaseModel):
+    """Chunks to presign for direct access to object storage"""
+    chunk_ids: List[str]
+    method: str = "GET"
+    expires_in: int = PRESIGN_DEFAULT_EXPIRY
+
+@app.post("/chunks/presign")
+async def presign_chunks(
+    presign_request: PresignRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Return time-limited MinIO URLs so clients can move chunk bytes without this service.
+    Backends without direct access (filesystem) answer 501 and clients go through this API.
+    """
+    if presign_request.method not in ("GET", "PUT"):
+        raise HTTPException(status_code=400, detail="method must be GET or PUT")
+    if len(presign_request.chunk_ids) > PRESIGN_MAX_CHUNKS:
+        raise HTTPException(status_code=400, detail=f"At most {PRESIGN_MAX_CHUNKS} chunks per request")
+    
+    # Write URLs are only issued for chunk IDs in the caller's namespace
+    if presign_request.method == "PUT":
+        user_id = current_user.get("sub")
+        foreign = [c for c in presign_request.chunk_ids if not c.startswith(f"{user_id}_")]
+        if foreign:
+            raise HTTPException(status_code=403, detail=f"Access denied to {len(foreign)} chunk(s)")
+    
+    expires_in = max(1, min(presign_request.expires_in, PRESIGN_MAX_EXPIRY))
+    try:
+        urls = {
+            chunk_id: backend.presigned_url(chunk_id, presign_request.method, expires_in)
+            for chunk_id in presign_request.chunk_ids
+        }
+        return {
+            "method": presign_request.method,
+            "expires_in": expires_in,
+            "urls": urls
+        }
+    except PresignUnsupported as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        print(f"Presign error: {e}")
+        raise HTTPException(status_code=500, detail=f"Presign failed: {str(e)}")
+
+class ChunkListRequest(BaseModel):
+    """A batch of chunk IDs"""
+    chunk_ids: List[str]
+
+@app.post("/chunks/stat")
+async def stat_chunks(
+    stat_request: ChunkListRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Report existence, size, etag and last-modified for many chunks without reading their bodies"""
+    if len(stat_request.chunk_ids) > PRESIGN_MAX_CHUNKS:
+        raise HTTPException(status_code=400, detail=f"At most {PRESIGN_MAX_CHUNKS} chunks per request")
+    
+    async def stat_one(chunk_id: str):
+        try:
+            stat = await run_io(backend.stat, chunk_id)
+            return chunk_id, {
+                "exists": True,
+                "size": stat.size,
+                "etag": stat.etag,
+                "last_modified": stat.last_modified.isoformat() if stat.last_modified else None
+            }
+        except ChunkNotFound:
+            return chunk_id, {"exists": False}
+        except StorageError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    # Stats run in parallel on the storage I/O pool
+    results = await asyncio.gather(*[stat_one(chunk_id) for chunk_id in stat_request.chunk_ids])
+    return {"chunks": dict(results)}
+
+@app.post("/chunks/batch-get")
+async def batch_get_chunks(
+    batch_request: ChunkListRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Read many chunks in one response, framed as described in framing.py.
+    Up to BATCH_GET_CONCURRENCY chunks are read from storage at a time; entries
+    are emitted in request order, each with its own status.
+    """
+    chunk_ids = batch_request.chunk_ids
+    if len(chunk_ids) > PRESIGN_MAX_CHUNKS:
+        raise HTTPException(status_code=400, detail=f"At most {PRESIGN_MAX_CHUNKS} chunks per request")
+    deadline.check()
+    no_cache = requests_no_cache(request.headers)
+    
+    async def read_one(chunk_id: str):
+        try:
+            store = await run_io(backend.bypass_cache, chunk_id) if no_cache else backend
+            data, _ = await run_io(store.read, chunk_id)
+            return framing.STATUS_OK, data
+        except ChunkNotFound:
+            return framing.STATUS_NOT_FOUND, b""
+        except StorageError as e:
+            return framing.STATUS_ERROR, str(e).encode("utf-8")
+        except Exception as e:
+            return framing.STATUS_ERROR, f"Download failed: {str(e)}".encode("utf-8")
+    
+    async def entries():
+        remaining = iter(chunk_ids)
+        in_flight = deque()
+        
+        def schedule_next():
+            chunk_id = next(remaining, None)
+            if chunk_id is not None:
+                in_flight.append((chunk_id, asyncio.ensure_future(read_one(chunk_id))))
+        
+        try:
+            for _ in range(max(1, BATCH_GET_CONCURRENCY)):
+                schedule_next()
+            while in_flight:
+                chunk_id, task = in_flight.popleft()
+                status, payload = await task
+                schedule_next()
+                yield framing.encode_header(chunk_id, status, len(payload))
+                if payload:
+                    yield payload
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+    
+    print(f"Batch read of {len(chunk_ids)} chunks")
+    return StreamingResponse(
+        entries(),
+        media_type="application/octet-stream",
+        headers={"X-Chunk-Count": str(len(chunk_ids))}
+    )
+
 @app.delete("/chunks/{chunk_id}")
 async def delete_file_chunk(
     chunk_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Delete a file chunk from MinIO (requires Auth0 authentication)"""
+    """Delete a file chunk from storage (requires Auth0 authentication)"""
     try:
         user_id = current_user.get("sub")
         
@@ -158,48 +484,134 @@ async def delete_file_chunk(
         if not (chunk_id.startswith(f"{user_id}_") or user_id in chunk_id):
             raise HTTPException(status_code=403, detail="Access denied to this chunk")
         
-        delete_chunk(chunk_id)
+        # The size keeps /stats current; a missing chunk raises ChunkNotFound here
+        stat = await run_io(backend.stat, chunk_id)
+        await run_io(backend.delete, chunk_id)
+        usage.record_delete(stat.size)
         return {
             "message": "Chunk deleted successfully",
             "chunk_id": chunk_id,
-            "bucket": MINIO_BUCKET,
+            "bucket": backend.location,
             "deleted_by": user_id
         }
     
-    except S3Error as e:
-        if "NoSuchKey" in str(e):
-            return {"message": "Chunk not found (already deleted)", "chunk_id": chunk_id}
-        raise HTTPException(status_code=500, detail=f"MinIO error: {str(e)}")
+    except HTTPException:
+        raise
+    except ChunkNotFound:
+        return {"message": "Chunk not found (already deleted)", "chunk_id": chunk_id}
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
-@app.get("/chunks")
-async def list_all_chunks():
-    """List all chunks in MinIO bucket"""
-    try:
-        chunks = list_chunks()
-        return {
-            "bucket": MINIO_BUCKET,
-            "chunks": chunks,
-            "count": len(chunks)
-        }
+@app.post("/chunks/delete")
+async def delete_file_chunks(
+    delete_request: ChunkListRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delete up to 1000 chunks at once, with one multi-object delete on MinIO (requires Auth0 authentication).
+    Reports a result per chunk; chunks the caller does not own are refused individually.
+    """
+    if len(delete_request.chunk_ids) > PRESIGN_MAX_CHUNKS:
+        raise HTTPException(status_code=400, detail=f"At most {PRESIGN_MAX_CHUNKS} chunks per request")
+    user_id = current_user.get("sub")
+    
+    # Same ownership rule as DELETE /chunks/{chunk_id}
+    results = {}
+    allowed = []
+    for chunk_id in dict.fromkeys(delete_request.chunk_ids):
+        if chunk_id.startswith(f"{user_id}_") or user_id in chunk_id:
+            allowed.append(chunk_id)
+        else:
+            results[chunk_id] = {"deleted": False, "error": "Access denied to this chunk"}
     
-    except S3Error as e:
-        raise HTTPException(status_code=500, detail=f"MinIO error: {str(e)}")
+    async def existing_size(chunk_id: str):
+        try:
+            return chunk_id, (await run_io(backend.stat, chunk_id)).size
+        except ChunkNotFound:
+            return chunk_id, None
+    
+    try:
+        deadline.check()
+        # Sizes of the chunks that exist keep /stats current (S3 deletes do not report them)
+        sizes = dict(await asyncio.gather(*[existing_size(chunk_id) for chunk_id in allowed]))
+        errors = await run_io(backend.delete_many, allowed) if allowed else {}
+    except deadline.DeadlineExceeded:
+        raise
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"List failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
+    
+    for chunk_id in allowed:
+        if chunk_id in errors:
+            results[chunk_id] = {"deleted": False, "error": errors[chunk_id]}
+        else:
+            results[chunk_id] = {"deleted": True}
+            if sizes.get(chunk_id) is not None:
+                usage.record_delete(sizes[chunk_id])
+    deleted = sum(1 for result in results.values() if result["deleted"])
+    print(f"Bulk delete by {user_id}: {deleted} deleted, {len(results) - deleted} failed")
+    return {
+        "deleted": deleted,
+        "failed": len(results) - deleted,
+        "results": results,
+        "bucket": backend.location
+    }
+
+@app.get("/chunks")
+async def list_all_chunks(prefix: str = "", cursor: Optional[str] = None, limit: int = 1000):
+    """
+    List chunks as NDJSON, one page at a time, in the backend's listing order (key order
+    on MinIO and the segment store, shard order on the filesystem). Each chunk is a line
+    {"chunk_id", "size", "etag", "last_modified"}; the last line is {"next_cursor": ...},
+    to be passed back as `cursor` for the next page (null once the listing is complete).
+    """
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    chunks = backend.iter_chunks(prefix, cursor)
+    
+    async def lines():
+        listed = 0
+        last_chunk_id = None
+        try:
+            while listed < limit:
+                # Pulled from the backend in pieces on the I/O pool; nothing beyond the piece is held
+                page = await run_io(take, chunks, min(1000, limit - listed))
+                if not page:
+                    break
+                listed += len(page)
+                last_chunk_id = page[-1].chunk_id
+                yield "".join(
+                    json.dumps({
+                        "chunk_id": info.chunk_id,
+                        "size": info.size,
+                        "etag": info.etag,
+                        "last_modified": info.last_modified.isoformat() if info.last_modified else None
+                    }) + "\n"
+                    for info in page
+                )
+            more = listed == limit and bool(await run_io(take, chunks, 1))
+            yield json.dumps({"next_cursor": last_chunk_id if more else None}) + "\n"
+        except Exception as e:
+            # Headers are gone already: report the failure in-band
+            print(f"Listing chunks failed: {e}")
+            yield json.dumps({"error": f"List failed: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.get("/stats")
 async def get_storage_stats():
-    """Get storage statistics"""
-    try:
-        chunks = list_chunks()
-        return {
-            "bucket": MINIO_BUCKET,
-            "total_chunks": len(chunks),
-            "storage_backend": "MinIO",
-            "endpoint": "minio:9000"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Stats failed: {str(e)}")
+    """Get storage statistics from counters kept by uploads and deletes (no bucket scan)"""
+    stats = {
+        "bucket": backend.location,
+        **usage.snapshot(),
+        "storage_backend": backend.name,
+        "io_pool": io_pool_stats()
+    }
+    # Hit ratio and bytes served by the cache tier and by the backend behind it
+    tiers = backend.tier_stats()
+    if tiers:
+        stats["cache"] = tiers
+    return stats
 
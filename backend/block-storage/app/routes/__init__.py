@@ -1 +0,0 @@
-# This file makes routes a Python package
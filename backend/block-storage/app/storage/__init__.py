@@ -0,0 +1,68 @@
+"""
+Chunk storage backends. STORAGE_BACKEND picks where chunk bytes live:
+
+    minio        objects in a MinIO (S3) bucket (default)
+    filesystem   files under STORAGE_DIR on this host
+    segment      records appended to large segment files under SEGMENT_DIR
+
+With CACHE_DIR set, reads go through a local cache tier in front of that backend (see cache.py).
+The API only talks to `backend`; every backend method is blocking and goes through run_io
+(or run_upload for puts fed by a streamed request body).
+"""
+import asyncio
+import os
+
+from .base import ChunkInfo, ChunkNotFound, PresignUnsupported, StorageBackend, StorageError
+from .cache import CACHE_DIR, CachedBackend
+from .pool import io_pool_stats, run_io, run_upload, take
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio").lower()
+
+
+def create_backend(kind: str = STORAGE_BACKEND, cache_dir: str = CACHE_DIR) -> StorageBackend:
+    """Backend for a STORAGE_BACKEND value, behind the cache tier when cache_dir is set"""
+    primary = _create_primary(kind)
+    return CachedBackend(primary, cache_dir) if cache_dir else primary
+
+
+def _create_primary(kind: str) -> StorageBackend:
+    # Only the selected backend's dependencies are imported
+    if kind == "minio":
+        from .minio_backend import MinioBackend
+        return MinioBackend()
+    if kind == "filesystem":
+        from .filesystem import FilesystemBackend
+        return FilesystemBackend()
+    if kind == "segment":
+        from .segment import SegmentBackend
+        return SegmentBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{kind}' (expected 'minio', 'filesystem' or 'segment')")
+
+
+backend = create_backend()
+
+
+async def maintain_periodically():
+    """Run the backend's housekeeping every maintenance_interval seconds on the I/O pool"""
+    while True:
+        await asyncio.sleep(backend.maintenance_interval)
+        try:
+            await run_io(backend.maintain)
+        except Exception as e:
+            print(f"Storage maintenance failed: {e}")
+
+__all__ = [
+    "STORAGE_BACKEND",
+    "backend",
+    "create_backend",
+    "maintain_periodically",
+    "run_io",
+    "run_upload",
+    "io_pool_stats",
+    "take",
+    "ChunkInfo",
+    "StorageError",
+    "ChunkNotFound",
+    "PresignUnsupported",
+    "StorageBackend",
+]
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class ChunkInfo:
+    """Metadata of a stored chunk"""
+    chunk_id: str
+    size: int
+    etag: Optional[str]  # unquoted
+    last_modified: Optional[datetime]
+
+
+class StorageError(Exception):
+    """A backend failed; the message is safe to return to callers"""
+
+
+class ChunkNotFound(StorageError):
+    """The chunk does not exist"""
+
+
+class PresignUnsupported(StorageError):
+    """The backend cannot hand out direct URLs"""
+
+
+class StorageBackend:
+    """
+    Where chunk bytes live. Methods block, so call them through run_io.
+    Chunks are immutable: a put either stores the whole body or nothing.
+    """
+
+    name = ""
+    location = ""  # bucket or directory, for /stats and responses
+    maintenance_interval = 0  # seconds between maintain() calls, 0 when the backend needs none
+
+    def ensure_ready(self):
+        """Create whatever the backend needs (bucket, directories) before serving"""
+        raise NotImplementedError
+
+    def health(self) -> dict:
+        """Details for /health; raises when the backend is unusable"""
+        raise NotImplementedError
+
+    def put(self, chunk_id: str, stream: BinaryIO, length: int = -1):
+        """Store a chunk read from a file-like object; length is -1 when unknown"""
+        raise NotImplementedError
+
+    def open(self, chunk_id: str) -> Tuple[BinaryIO, ChunkInfo]:
+        """Reader over a chunk's bytes and its metadata; the caller must close() the reader"""
+        raise NotImplementedError
+
+    def stat(self, chunk_id: str) -> ChunkInfo:
+        raise NotImplementedError
+
+    def delete(self, chunk_id: str):
+        """Remove a chunk; removing a missing chunk is not an error"""
+        raise NotImplementedError
+
+    def iter_chunks(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[ChunkInfo]:
+        """
+        Lazily iterate stored chunks in a stable order, resuming after the chunk
+        `start_after` when given. Nothing is collected up front.
+        """
+        raise NotImplementedError
+
+    def read(self, chunk_id: str) -> Tuple[bytes, ChunkInfo]:
+        """Whole chunk in memory, for small reads such as batch-get entries"""
+        reader, info = self.open(chunk_id)
+        try:
+            return reader.read(), info
+        finally:
+            reader.close()
+
+    def delete_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """Remove many chunks; returns {chunk_id: error message} for those that failed"""
+        errors = {}
+        for chunk_id in chunk_ids:
+            try:
+                self.delete(chunk_id)
+            except Exception as exc:
+                errors[chunk_id] = str(exc)
+        return errors
+
+    def maintain(self):
+        """Periodic housekeeping, such as compaction"""
+
+    def close(self):
+        """Persist in-memory state before the process exits"""
+
+    def bypass_cache(self, chunk_id: str) -> "StorageBackend":
+        """Backend to read a chunk from when the client asked for no cached copy; cache tiers drop theirs"""
+        return self
+
+    def tier_stats(self) -> Optional[dict]:
+        """Hit ratio and bytes served per tier, for backends with a cache in front"""
+        return None
+
+    def local_path(self, chunk_id: str) -> Optional[str]:
+        """Path of the chunk on this host when it can be served straight from disk"""
+        return None
+
+    def presigned_url(self, chunk_id: str, method: str, expires_seconds: int) -> str:
+        raise PresignUnsupported(f"The {self.name} backend does not issue presigned URLs")
@@ -0,0 +1,371 @@
+"""
+Read-through cache tier: chunks read from the primary backend (MinIO) are kept on a
+local disk, preferably an SSD, and served from there next time.
+
+- Capacity: at most CACHE_MAX_BYTES, evicting the least recently used chunks.
+- Admission: with CACHE_ADMISSION=second-read (default) a chunk is only cached the
+  second time it misses while still remembered among the last CACHE_GHOST_ENTRIES
+  misses, so a one-time scan over many chunks cannot flush the hot ones.
+  CACHE_ADMISSION=always caches every miss.
+- CACHE_ON_WRITE=true also caches chunks as they are uploaded.
+
+Chunks are immutable, so cached copies and their validators (ETag, Last-Modified)
+never need revalidation. Writes and deletes through this service drop the cached copy.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import os
+import tempfile
+import threading
+
+from .base import ChunkInfo, ChunkNotFound, StorageBackend
+from .filesystem import FilesystemBackend
+
+CACHE_DIR = os.getenv("CACHE_DIR", "")  # local cache directory; empty disables the cache tier
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+CACHE_ADMISSION = os.getenv("CACHE_ADMISSION", "second-read").lower()  # or "always"
+CACHE_GHOST_ENTRIES = int(os.getenv("CACHE_GHOST_ENTRIES", "100000"))  # recent misses remembered for admission
+CACHE_ON_WRITE = os.getenv("CACHE_ON_WRITE", "false").lower() == "true"
+
+# A chunk larger than this share of the cache would evict too much to be worth a slot
+_MAX_CHUNK_SHARE = 8
+
+
+class _CacheEntry:
+    __slots__ = ("size", "info")
+
+    def __init__(self, size: int, info: Optional[ChunkInfo]):
+        self.size = size
+        self.info = info  # the primary's metadata; unknown for entries found on disk at startup
+
+
+class _FillingReader:
+    """Reader over a primary chunk that copies what it reads into the cache, committed at the end"""
+
+    def __init__(self, tier: "CachedBackend", chunk_id: str, reader, info: ChunkInfo, generation: int):
+        self._tier = tier
+        self._chunk_id = chunk_id
+        self._reader = reader
+        self._info = info
+        self._generation = generation  # handed to fill(), or released on discard
+        self._spool = tempfile.TemporaryFile(dir=tier.spool_dir)
+        self._received = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._reader.read(size)
+        if self._spool is not None:
+            try:
+                self._spool.write(data)
+                self._received += len(data)
+                if not data or size is None or size < 0 or self._received >= self._info.size:
+                    if self._received == self._info.size:
+                        generation, self._generation = self._generation, None
+                        self._spool.seek(0)
+                        self._tier.fill(self._chunk_id, self._spool, self._received, self._info, generation)
+                    self._discard()
+            except OSError as e:
+                # The client still gets the chunk; only the cache copy is lost
+                print(f"Caching chunk {self._chunk_id} failed: {e}")
+                self._discard()
+        return data
+
+    def _discard(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if self._generation is not None:
+            self._generation = None
+            self._tier._end_fill(self._chunk_id)
+
+    def close(self):
+        self._discard()
+        self._reader.close()
+
+
+class _TeeStream:
+    """Upload stream that keeps a copy of what the primary reads, for caching on write"""
+
+    def __init__(self, stream, spool):
+        self._stream = stream
+        self._spool = spool
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._spool.write(data)
+        self.bytes_read += len(data)
+        return data
+
+
+class CachedBackend(StorageBackend):
+    """A primary backend with a local LRU cache tier in front of its reads"""
+
+    def __init__(self, primary: StorageBackend, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 admission: str = CACHE_ADMISSION, cache_on_write: bool = CACHE_ON_WRITE):
+        self.primary = primary
+        self.name = primary.name
+        self.location = primary.location
+        self.maintenance_interval = primary.maintenance_interval
+        # Cached copies can always be fetched again, so they are not fsynced
+        self.cache = FilesystemBackend(root, fsync=False)
+        self.spool_dir = os.path.join(self.cache.root, "tmp")
+        self.max_bytes = max_bytes
+        self.admission = admission
+        self.cache_on_write = cache_on_write
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()  # least recently used first
+        self._ghosts: "OrderedDict[str, None]" = OrderedDict()  # recent misses that were not admitted
+        # Chunks being copied into the cache: [copies in flight, generation]. Dropping a chunk
+        # bumps its generation, so a copy that started before the drop is not committed.
+        self._filling: Dict[str, List[int]] = {}
+        self._bytes = 0
+        self._hits = self._misses = self._bypasses = 0
+        self._hit_bytes = self._miss_bytes = 0
+        self._admissions = self._evictions = 0
+
+    # Cache bookkeeping
+
+    def _admit(self, chunk_id: str, size: Optional[int]) -> bool:
+        if size is None or size > self.max_bytes // _MAX_CHUNK_SHARE:
+            return False
+        if self.admission == "always":
+            return True
+        with self._lock:
+            if chunk_id in self._ghosts:
+                del self._ghosts[chunk_id]
+                return True
+            self._ghosts[chunk_id] = None
+            if len(self._ghosts) > CACHE_GHOST_ENTRIES:
+                self._ghosts.popitem(last=False)
+            return False
+
+    def _begin_fill(self, chunk_id: str) -> int:
+        """Register a copy about to be read from the primary; returns the generation fill() checks"""
+        with self._lock:
+            filling = self._filling.setdefault(chunk_id, [0, 0])
+            filling[0] += 1
+            return filling[1]
+
+    def _end_fill(self, chunk_id: str):
+        with self._lock:
+            filling = self._filling[chunk_id]
+            filling[0] -= 1
+            if not filling[0]:
+                del self._filling[chunk_id]
+
+    def fill(self, chunk_id: str, stream, size: int, info: Optional[ChunkInfo], generation: int):
+        """
+        Store a copy of a chunk in the cache, evicting the least recently used ones beyond the cap.
+        The copy is written aside and only renamed into place if the chunk was not dropped
+        since _begin_fill returned `generation`, so a stale copy never replaces a current one.
+        """
+        try:
+            if size > self.max_bytes // _MAX_CHUNK_SHARE:
+                return
+            staged = self.cache.stage(chunk_id, stream, size)
+            try:
+                with self._lock:
+                    if self._filling[chunk_id][1] != generation:
+                        return  # deleted, overwritten or distrusted while the copy was made
+                    self.cache.commit(chunk_id, staged)
+                    staged = None
+                    previous = self._entries.pop(chunk_id, None)
+                    if previous is not None:
+                        self._bytes -= previous.size
+                    self._entries[chunk_id] = _CacheEntry(size, info)
+                    self._bytes += size
+                    self._admissions += 1
+                    # Unlinked under the lock, so a newer copy committed meanwhile is not removed
+                    while self._bytes > self.max_bytes:
+                        victim, entry = self._entries.popitem(last=False)
+                        self._bytes -= entry.size
+                        self._evictions += 1
+                        self.cache.delete(victim)
+            finally:
+                if staged is not None:
+                    self.cache.discard(staged)
+        finally:
+            self._end_fill(chunk_id)
+
+    def _forget(self, chunk_id: str):
+        with self._lock:
+            filling = self._filling.get(chunk_id)
+            if filling is not None:
+                filling[1] += 1
+            entry = self._entries.pop(chunk_id, None)
+            if entry is None:
+                return
+            self._bytes -= entry.size
+            self.cache.delete(chunk_id)
+
+    def _lookup(self, chunk_id: str) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(chunk_id)
+            if entry is not None:
+                self._entries.move_to_end(chunk_id)
+            return entry
+
+    def _open_cached(self, chunk_id: str):
+        """
+        The cached file, opened while its entry is held so eviction cannot unlink it first
+        (an open file stays readable after it is unlinked). No local path is handed out,
+        since a path could be evicted before the response gets to open it.
+        """
+        with self._lock:
+            if chunk_id not in self._entries:
+                return None  # evicted or dropped since the lookup
+            try:
+                reader, _ = self.cache.open(chunk_id)
+                return reader
+            except ChunkNotFound:
+                pass  # unlinked by an older eviction or removed from the disk
+        self._forget(chunk_id)
+        return None
+
+    def _checked_info(self, chunk_id: str, entry: _CacheEntry) -> Optional[ChunkInfo]:
+        """The primary's metadata for a cached chunk, or None when the cached copy does not match it"""
+        if entry.info is None:
+            try:
+                entry.info = self.primary.stat(chunk_id)
+            except ChunkNotFound:
+                self._forget(chunk_id)
+                raise
+        if entry.info.size != entry.size:
+            print(f"Cached copy of chunk {chunk_id} has {entry.size} bytes, expected {entry.info.size}; dropped")
+            self._forget(chunk_id)
+            return None
+        return entry.info
+
+    def _count(self, hit: bool, size: Optional[int]):
+        with self._lock:
+            if hit:
+                self._hits += 1
+                self._hit_bytes += size or 0
+            else:
+                self._misses += 1
+                self._miss_bytes += size or 0
+
+    # StorageBackend
+
+    def ensure_ready(self):
+        """Prepare the primary, then index the chunks already on the cache disk (oldest first)"""
+        self.primary.ensure_ready()
+        self.cache.ensure_ready()
+        found = sorted(self.cache.iter_chunks(), key=lambda info: info.last_modified)
+        evicted = []
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for info in found:
+                self._entries[info.chunk_id] = _CacheEntry(info.size, None)
+                self._bytes += info.size
+            while self._bytes > self.max_bytes:
+                victim, entry = self._entries.popitem(last=False)
+                self._bytes -= entry.size
+                evicted.append(victim)
+        for victim in evicted:
+            self.cache.delete(victim)
+        print(f"Chunk cache ready at '{self.cache.root}': {len(self._entries)} chunks, "
+              f"{self._bytes} of {self.max_bytes} bytes")
+
+    def health(self) -> dict:
+        return {**self.primary.health(), "cache": self.cache.health()}
+
+    def put(self, chunk_id: str, stream, length: int = -1):
+        if not self.cache_on_write:
+            self.primary.put(chunk_id, stream, length)
+            self._forget(chunk_id)
+            return
+        # The old copy goes before the primary changes, so it is not served once the write is done
+        self._forget(chunk_id)
+        with tempfile.TemporaryFile(dir=self.spool_dir) as spool:
+            tee = _TeeStream(stream, spool)
+            try:
+                self.primary.put(chunk_id, tee, length)
+            finally:
+                # Copies read from the primary during the write may hold the old bytes
+                self._forget(chunk_id)
+            generation = self._begin_fill(chunk_id)
+            spool.seek(0)
+            # The primary's ETag is looked up on first read
+            self.fill(chunk_id, spool, tee.bytes_read, None, generation)
+
+    def open(self, chunk_id: str):
+        entry = self._lookup(chunk_id)
+        if entry is not None:
+            info = self._checked_info(chunk_id, entry)
+            reader = self._open_cached(chunk_id) if info is not None else None
+            if reader is not None:
+                self._count(True, entry.size)
+                return reader, info
+
+        # Registered before the primary is read, so a delete from here on voids the copy
+        generation = self._begin_fill(chunk_id)
+        try:
+            reader, info = self.primary.open(chunk_id)
+        except BaseException:
+            self._end_fill(chunk_id)
+            raise
+        self._count(False, info.size)
+        if self._admit(chunk_id, info.size):
+            try:
+                return _FillingReader(self, chunk_id, reader, info, generation), info
+            except OSError as e:
+                print(f"Cannot cache chunk {chunk_id}: {e}")
+        self._end_fill(chunk_id)
+        return reader, info
+
+    def stat(self, chunk_id: str) -> ChunkInfo:
+        entry = self._lookup(chunk_id)
+        if entry is not None:
+            info = self._checked_info(chunk_id, entry)
+            if info is not None:
+                return info
+        return self.primary.stat(chunk_id)
+
+    def delete(self, chunk_id: str):
+        self.primary.delete(chunk_id)
+        self._forget(chunk_id)
+
+    def delete_many(self, chunk_ids):
+        errors = self.primary.delete_many(chunk_ids)
+        for chunk_id in chunk_ids:
+            self._forget(chunk_id)
+        return errors
+
+    def iter_chunks(self, prefix: str = "", start_after: Optional[str] = None):
+        return self.primary.iter_chunks(prefix, start_after)
+
+    def maintain(self):
+        self.primary.maintain()
+
+    def close(self):
+        self.primary.close()
+
+    def bypass_cache(self, chunk_id: str) -> StorageBackend:
+        """The client distrusts cached copies (the chunker re-fetches after a digest mismatch): drop ours"""
+        with self._lock:
+            self._bypasses += 1
+        self._forget(chunk_id)
+        return self.primary
+
+    def presigned_url(self, chunk_id: str, method: str, expires_seconds: int) -> str:
+        return self.primary.presigned_url(chunk_id, method, expires_seconds)
+
+    def tier_stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "path": self.cache.root,
+                "admission": self.admission,
+                "used_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "chunks": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "bytes_served": {"cache": self._hit_bytes, self.primary.name: self._miss_bytes},
+                "admissions": self._admissions,
+                "evictions": self._evictions,
+                "bypasses": self._bypasses,
+            }
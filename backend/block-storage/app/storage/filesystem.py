@@ -0,0 +1,171 @@
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote, unquote
+import hashlib
+import os
+import shutil
+import tempfile
+
+from .base import ChunkInfo, ChunkNotFound, StorageBackend, StorageError
+
+STORAGE_DIR = os.getenv("STORAGE_DIR", "storage")
+# fsync each chunk (and its directory) before acknowledging the upload
+FS_FSYNC = os.getenv("FS_FSYNC", "true").lower() == "true"
+FS_COPY_BUFFER_SIZE = int(os.getenv("FS_COPY_BUFFER_SIZE", str(1024 * 1024)))
+
+_SUFFIX = ".chunk"
+_MAX_NAME_LENGTH = 255
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FilesystemBackend(StorageBackend):
+    """
+    Chunks as files under STORAGE_DIR, for single-node deployments.
+
+    Files are sharded into 256 x 256 directories by the SHA-1 of the chunk ID
+    (<root>/ab/cd/<quoted id>.chunk) so no directory grows unbounded. Uploads are
+    written to <root>/tmp and renamed into place, so readers never see a partial chunk.
+    """
+
+    name = "filesystem"
+
+    def __init__(self, root: str = STORAGE_DIR, fsync: bool = FS_FSYNC):
+        self.root = os.path.abspath(root)
+        self.fsync = fsync
+        self.location = self.root
+        self._tmp = os.path.join(self.root, "tmp")
+
+    def _shard(self, chunk_id: str) -> str:
+        digest = hashlib.sha1(chunk_id.encode("utf-8")).hexdigest()
+        return f"{digest[:2]}/{digest[2:4]}"
+
+    def _filename(self, chunk_id: str) -> str:
+        name = quote(chunk_id, safe="") + _SUFFIX
+        if len(name) > _MAX_NAME_LENGTH:
+            raise StorageError(f"Chunk ID too long for the filesystem backend: {len(chunk_id)} characters")
+        return name
+
+    def _path(self, chunk_id: str) -> str:
+        return os.path.join(self.root, self._shard(chunk_id), self._filename(chunk_id))
+
+    def _info(self, chunk_id: str, st: os.stat_result) -> ChunkInfo:
+        # Chunks are immutable and replaced by rename, so mtime and size identify the content
+        return ChunkInfo(
+            chunk_id=chunk_id,
+            size=st.st_size,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            last_modified=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+        )
+
+    def ensure_ready(self):
+        os.makedirs(self._tmp, exist_ok=True)
+        # Leftovers of uploads interrupted by a crash
+        for entry in os.scandir(self._tmp):
+            with suppress(FileNotFoundError):
+                os.unlink(entry.path)
+        print(f"Filesystem storage ready at '{self.root}'")
+
+    def health(self) -> dict:
+        usage = shutil.disk_usage(self.root)
+        return {"path": self.root, "free_bytes": usage.free, "total_bytes": usage.total}
+
+    def put(self, chunk_id: str, stream, length: int = -1):
+        """Write to a temporary file, then atomically rename it into place"""
+        staged = self.stage(chunk_id, stream, length)
+        try:
+            written = os.path.getsize(staged)
+            self.commit(chunk_id, staged)
+        except BaseException:
+            self.discard(staged)
+            raise
+        print(f"Stored chunk {chunk_id}: {written} bytes")
+
+    def stage(self, chunk_id: str, stream, length: int = -1) -> str:
+        """Write a chunk to a temporary file and return its path, for commit() or discard()"""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp, suffix=".part")
+        try:
+            written = 0
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    piece = stream.read(FS_COPY_BUFFER_SIZE)
+                    if not piece:
+                        break
+                    out.write(piece)
+                    written += len(piece)
+                if length >= 0 and written != length:
+                    raise StorageError(f"Chunk {chunk_id}: expected {length} bytes, received {written}")
+                out.flush()
+                if self.fsync:
+                    os.fsync(out.fileno())
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return tmp_path
+
+    def commit(self, chunk_id: str, staged: str):
+        """Atomically rename a staged chunk into place"""
+        final_path = self._path(chunk_id)
+        shard_dir = os.path.dirname(final_path)
+        os.makedirs(shard_dir, exist_ok=True)
+        os.replace(staged, final_path)
+        if self.fsync:
+            _fsync_dir(shard_dir)
+
+    def discard(self, staged: str):
+        with suppress(FileNotFoundError):
+            os.unlink(staged)
+
+    def open(self, chunk_id: str):
+        try:
+            reader = open(self._path(chunk_id), "rb")
+        except FileNotFoundError:
+            raise ChunkNotFound(f"Chunk {chunk_id} not found") from None
+        return reader, self._info(chunk_id, os.fstat(reader.fileno()))
+
+    def stat(self, chunk_id: str) -> ChunkInfo:
+        try:
+            return self._info(chunk_id, os.stat(self._path(chunk_id)))
+        except FileNotFoundError:
+            raise ChunkNotFound(f"Chunk {chunk_id} not found") from None
+
+    def delete(self, chunk_id: str):
+        with suppress(FileNotFoundError):
+            os.unlink(self._path(chunk_id))
+
+    def iter_chunks(self, prefix: str = "", start_after: Optional[str] = None):
+        """
+        Chunks ordered by shard, then by file name, one directory in memory at a time.
+        This is not key order, but it is stable, and the shard of `start_after` says where to resume.
+        """
+        resume_shard = self._shard(start_after) if start_after else None
+        resume_name = self._filename(start_after) if start_after else None
+        for top in sorted(name for name in os.listdir(self.root) if len(name) == 2):
+            top_dir = os.path.join(self.root, top)
+            for sub in sorted(os.listdir(top_dir)):
+                shard = f"{top}/{sub}"
+                if resume_shard and shard < resume_shard:
+                    continue
+                with os.scandir(os.path.join(top_dir, sub)) as entries:
+                    names = sorted(entry.name for entry in entries if entry.name.endswith(_SUFFIX))
+                for name in names:
+                    if shard == resume_shard and name <= resume_name:
+                        continue
+                    chunk_id = unquote(name[:-len(_SUFFIX)])
+                    if prefix and not chunk_id.startswith(prefix):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(top_dir, sub, name))
+                    except FileNotFoundError:
+                        continue  # deleted while listing
+                    yield self._info(chunk_id, st)
+
+    def local_path(self, chunk_id: str) -> Optional[str]:
+        return self._path(chunk_id)
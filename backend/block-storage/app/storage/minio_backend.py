@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import os
+import time
+
+import urllib3
+from minio import Minio
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+
+from .base import ChunkInfo, ChunkNotFound, StorageBackend, StorageError
+from .pool import STORAGE_IO_THREADS
+
+# MinIO configuration
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "minio:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin123")
+MINIO_BUCKET = os.getenv("MINIO_BUCKET", "chunks")
+
+# Presigned URLs are handed to clients, so they must be signed for the host clients can reach
+MINIO_PUBLIC_ENDPOINT = os.getenv("MINIO_PUBLIC_ENDPOINT", MINIO_ENDPOINT)
+MINIO_PUBLIC_SECURE = os.getenv("MINIO_PUBLIC_SECURE", "false").lower() == "true"
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
+
+MINIO_TIMEOUT = float(os.getenv("MINIO_TIMEOUT", "300"))  # connect/read timeout in seconds
+# Uploads are buffered one part at a time; bodies larger than a part go up as a multipart upload
+UPLOAD_PART_SIZE = max(5 * 1024 * 1024, int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024))))  # S3 minimum: 5 MiB
+
+print(f"MinIO Config - Endpoint: {MINIO_ENDPOINT}, Bucket: {MINIO_BUCKET}")
+
+# Initialize MinIO client; one pooled connection per I/O thread (urllib3 keeps only 10 by default)
+minio_client = Minio(
+    MINIO_ENDPOINT,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=False,  # Set to True for HTTPS
+    http_client=urllib3.PoolManager(
+        maxsize=STORAGE_IO_THREADS,
+        timeout=urllib3.Timeout(connect=MINIO_TIMEOUT, read=MINIO_TIMEOUT),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    ),
+)
+
+# Signing happens locally; the explicit region avoids a bucket-location lookup
+presign_client = Minio(
+    MINIO_PUBLIC_ENDPOINT,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=MINIO_PUBLIC_SECURE,
+    region=MINIO_REGION,
+)
+
+
+@contextmanager
+def _s3_errors(chunk_id: Optional[str] = None):
+    """Translate S3 errors into the backend-neutral exceptions"""
+    try:
+        yield
+    except S3Error as exc:
+        if exc.code in ("NoSuchKey", "NoSuchObject"):
+            raise ChunkNotFound(f"Chunk {chunk_id} not found") from exc
+        print(f"MinIO S3 error{f' for chunk {chunk_id}' if chunk_id else ''}: {exc}")
+        raise StorageError(f"MinIO error: {exc}") from exc
+
+
+class _ObjectReader:
+    """A get_object response as a reader; close() hands its connection back to the pool"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self, size: int = -1) -> bytes:
+        return self._response.read(None if size is None or size < 0 else size)
+
+    def close(self):
+        self._response.close()
+        self._response.release_conn()
+
+
+class MinioBackend(StorageBackend):
+    """Chunks as objects in a MinIO (S3) bucket"""
+
+    name = "MinIO"
+
+    def __init__(self, bucket_name: str = MINIO_BUCKET):
+        self.bucket_name = bucket_name
+        self.location = bucket_name
+
+    def wait_for_minio(self, max_retries=10, delay=2):
+        """Wait for MinIO to be available"""
+        for i in range(max_retries):
+            try:
+                minio_client.list_buckets()
+                print("MinIO is available!")
+                return True
+            except Exception as e:
+                print(f"Waiting for MinIO... (attempt {i+1}/{max_retries}): {e}")
+                time.sleep(delay)
+        return False
+
+    def ensure_ready(self):
+        """Create bucket if it doesn't exist"""
+        # Wait for MinIO to be available
+        if not self.wait_for_minio():
+            raise Exception("MinIO not available after waiting")
+        with _s3_errors():
+            if not minio_client.bucket_exists(self.bucket_name):
+                minio_client.make_bucket(self.bucket_name)
+                print(f"Created bucket '{self.bucket_name}'")
+            else:
+                print(f"Bucket '{self.bucket_name}' already exists")
+
+    def health(self) -> dict:
+        buckets = minio_client.list_buckets()
+        return {"bucket": self.bucket_name, "minio_buckets": [b.name for b in buckets]}
+
+    def put(self, chunk_id: str, stream, length: int = -1):
+        """
+        Upload chunk to MinIO from a file-like object. At most UPLOAD_PART_SIZE bytes
+        are held in memory; unknown lengths (-1) are sent as a multipart upload.
+        """
+        print(f"Uploading {length if length >= 0 else 'unknown'} bytes to bucket '{self.bucket_name}' with key '{chunk_id}'")
+        with _s3_errors(chunk_id):
+            minio_client.put_object(
+                self.bucket_name,
+                chunk_id,
+                stream,
+                length=length,
+                part_size=UPLOAD_PART_SIZE,
+                content_type="application/octet-stream"
+            )
+        print(f"Successfully uploaded chunk {chunk_id}")
+
+    def open(self, chunk_id: str):
+        with _s3_errors(chunk_id):
+            response = minio_client.get_object(self.bucket_name, chunk_id)
+        last_modified = response.headers.get("Last-Modified")
+        length = response.headers.get("Content-Length")
+        info = ChunkInfo(
+            chunk_id=chunk_id,
+            size=int(length) if length is not None else None,
+            etag=(response.headers.get("ETag") or "").strip('"') or None,
+            last_modified=parsedate_to_datetime(last_modified) if last_modified else None,
+        )
+        return _ObjectReader(response), info
+
+    def read(self, chunk_id: str):
+        """Download chunk from MinIO with performance monitoring"""
+        start_time = time.time()
+        data, info = super().read(chunk_id)
+        download_time = time.time() - start_time
+
+        # 📊 PERFORMANCE MONITORING: Log slow MinIO operations
+        if download_time > 1.0:
+            print(f"🐌 Slow MinIO download: {chunk_id} took {download_time:.2f}s for {len(data)} bytes")
+        return data, info
+
+    def stat(self, chunk_id: str) -> ChunkInfo:
+        """Object metadata without reading the body"""
+        with _s3_errors(chunk_id):
+            stat = minio_client.stat_object(self.bucket_name, chunk_id)
+        return ChunkInfo(chunk_id, stat.size, stat.etag, stat.last_modified)
+
+    def delete(self, chunk_id: str):
+        with _s3_errors(chunk_id):
+            minio_client.remove_object(self.bucket_name, chunk_id)
+
+    def delete_many(self, chunk_ids):
+        """
+        Delete many chunks with S3 multi-object delete, 1000 keys per request.
+        Keys that did not exist count as deleted.
+        """
+        errors = {}
+        with _s3_errors():
+            for start in range(0, len(chunk_ids), 1000):
+                batch = [DeleteObject(chunk_id) for chunk_id in chunk_ids[start:start + 1000]]
+                # remove_objects is lazy: nothing is sent until its errors are iterated
+                for error in minio_client.remove_objects(self.bucket_name, batch):
+                    print(f"Error deleting chunk {error.name}: {error.code} {error.message}")
+                    errors[error.name] = f"{error.code}: {error.message}"
+        return errors
+
+    def iter_chunks(self, prefix: str = "", start_after: Optional[str] = None):
+        """Objects in key order; MinIO is asked for 1000 keys at a time as the iterator advances"""
+        with _s3_errors():
+            objects = minio_client.list_objects(
+                self.bucket_name, prefix=prefix or None, recursive=True, start_after=start_after
+            )
+            for obj in objects:
+                yield ChunkInfo(obj.object_name, obj.size, obj.etag, obj.last_modified)
+
+    def presigned_url(self, chunk_id: str, method: str, expires_seconds: int) -> str:
+        """Time-limited URL for reading (GET) or writing (PUT) a chunk directly in MinIO"""
+        return presign_client.get_presigned_url(
+            method,
+            self.bucket_name,
+            chunk_id,
+            expires=timedelta(seconds=expires_seconds),
+        )
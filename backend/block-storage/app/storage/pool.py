@@ -0,0 +1,40 @@
+"""
+Thread pools for storage calls. Backends are synchronous (the minio client,
+file I/O); their calls run here so they never block the event loop.
+Streamed uploads get a pool of their own: their threads wait on the client's
+body, and slow uploaders must not starve reads of I/O threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+import asyncio
+import os
+
+STORAGE_IO_THREADS = int(os.getenv("STORAGE_IO_THREADS", "32"))
+STORAGE_UPLOAD_THREADS = int(os.getenv("STORAGE_UPLOAD_THREADS", "16"))  # concurrent streamed uploads
+
+_io_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_THREADS, thread_name_prefix="storage-io")
+_upload_executor = ThreadPoolExecutor(max_workers=STORAGE_UPLOAD_THREADS, thread_name_prefix="storage-upload")
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking storage call on the storage I/O pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args, **kwargs))
+
+async def run_upload(func, *args, **kwargs):
+    """Run a put that reads a request body as it arrives on the upload pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_upload_executor, partial(func, *args, **kwargs))
+
+def io_pool_stats() -> dict:
+    """Size and current backlog of the storage I/O and upload pools"""
+    return {
+        "threads": STORAGE_IO_THREADS,
+        "queued": _io_executor._work_queue.qsize(),
+        "upload_threads": STORAGE_UPLOAD_THREADS,
+        "upload_queued": _upload_executor._work_queue.qsize(),
+    }
+
+def take(iterator, count: int) -> list:
+    """Next `count` items of an iterator (fewer at its end); run on the I/O pool for listings"""
+    return list(islice(iterator, count))
@@ -0,0 +1,584 @@
+"""
+Log-structured chunk store: chunks are appended to large segment files instead of
+taking a file or object each, so millions of small chunks stay a few hundred files.
+
+Layout under SEGMENT_DIR:
+
+    00000001.seg ...   segments, appended to until SEGMENT_MAX_BYTES, then sealed
+    index.snap         snapshot of the index: chunk ID -> (segment, offset, length)
+
+Every record in a segment describes itself:
+
+    magic       1 byte
+    kind        1 byte    RECORD_PUT, or RECORD_DELETE for a tombstone (no payload)
+    seq         8 bytes   global write sequence; the highest seq of a chunk ID wins
+    timestamp   8 bytes   milliseconds since the epoch of the original put
+    id_len      2 bytes   length of the chunk ID
+    length      8 bytes   length of the payload
+    data_crc    4 bytes   CRC-32 of chunk ID and payload
+    header_crc  4 bytes   CRC-32 of the fields above
+
+followed by the UTF-8 chunk ID and the payload. All integers are big-endian.
+
+Startup loads the snapshot and replays the records written after it, so nothing
+acknowledged is lost; a torn record at the end of the last segment is truncated away.
+Compaction copies the live records of mostly dead segments into the active one
+(keeping their seq) and removes them. Reads are served from memory-mapped segments.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from .base import ChunkInfo, ChunkNotFound, StorageBackend, StorageError
+from .filesystem import _fsync_dir
+
+SEGMENT_DIR = os.getenv("SEGMENT_DIR", "segments")
+SEGMENT_MAX_BYTES = int(os.getenv("SEGMENT_MAX_BYTES", str(256 * 1024 * 1024)))  # a segment is sealed past this size
+# fsync the active segment before acknowledging a write (concurrent writers share one fsync)
+SEGMENT_FSYNC = os.getenv("SEGMENT_FSYNC", "true").lower() == "true"
+SEGMENT_COMPACT_THRESHOLD = float(os.getenv("SEGMENT_COMPACT_THRESHOLD", "0.5"))  # dead fraction that gets a segment compacted
+SEGMENT_MAINTENANCE_INTERVAL = float(os.getenv("SEGMENT_MAINTENANCE_INTERVAL", "300"))  # seconds between compactions and index snapshots
+SEGMENT_SPOOL_SIZE = int(os.getenv("SEGMENT_SPOOL_SIZE", str(8 * 1024 * 1024)))  # upload bytes buffered in memory before spilling to disk
+
+COPY_BUFFER_SIZE = 1024 * 1024
+LIST_PAGE_SIZE = 1000  # index keys copied per lock hold while listing
+
+RECORD_PUT = 1
+RECORD_DELETE = 2
+
+_MAGIC = 0xC5
+_HEADER = struct.Struct(">BBQQHQI")
+_CRC = struct.Struct(">I")
+HEADER_SIZE = _HEADER.size + _CRC.size
+
+_SNAPSHOT = "index.snap"
+_SNAPSHOT_MAGIC = b"SIDX1"
+_SNAPSHOT_HEADER = struct.Struct(">QI")  # max seq, segment count
+_SNAPSHOT_SEGMENT = struct.Struct(">IQ")  # segment ID, bytes covered by the snapshot
+_SNAPSHOT_COUNT = struct.Struct(">Q")
+_SNAPSHOT_ENTRY = struct.Struct(">IQQQQH")  # segment ID, offset, length, seq, timestamp, id_len
+
+# offset is where the payload starts in the segment
+_Entry = namedtuple("_Entry", "segment offset length seq timestamp")
+
+
+def _encode_header(kind: int, seq: int, timestamp: int, id_len: int, length: int, data_crc: int) -> bytes:
+    fields = _HEADER.pack(_MAGIC, kind, seq, timestamp, id_len, length, data_crc)
+    return fields + _CRC.pack(zlib.crc32(fields))
+
+
+def _parse_header(buf, offset: int, end: int):
+    """(kind, seq, timestamp, id_len, length, data_crc) of the record at offset, or None if torn or corrupt"""
+    if offset + HEADER_SIZE > end:
+        return None
+    fields = buf[offset:offset + _HEADER.size]
+    (header_crc,) = _CRC.unpack_from(buf, offset + _HEADER.size)
+    if zlib.crc32(fields) != header_crc:
+        return None
+    magic, kind, seq, timestamp, id_len, length, data_crc = _HEADER.unpack(fields)
+    if magic != _MAGIC or kind not in (RECORD_PUT, RECORD_DELETE):
+        return None
+    if offset + HEADER_SIZE + id_len + length > end:
+        return None
+    return kind, seq, timestamp, id_len, length, data_crc
+
+
+def _record_size(chunk_id: str, length: int) -> int:
+    return HEADER_SIZE + len(chunk_id.encode("utf-8")) + length
+
+
+class _Segment:
+    """One segment file: appended through a file descriptor while active, read through mmap"""
+
+    def __init__(self, segment_id: int, path: str, size: int):
+        self.id = segment_id
+        self.path = path
+        self.size = size  # bytes written
+        self.live = 0  # bytes of the records the index points to
+        self.synced = size
+        self.fd = None  # open while this is the active segment
+        self._map = None
+        self._sync_lock = threading.Lock()
+
+    def open_for_append(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+            self.size += written
+
+    def truncate(self, size: int):
+        """Drop a partially written record"""
+        os.ftruncate(self.fd, size)
+        self.size = size
+
+    def sync(self, upto: int):
+        """Make the first `upto` bytes durable; writers waiting here share one fsync"""
+        with self._sync_lock:
+            if self.synced >= upto or self.fd is None:
+                return
+            target = self.size
+            os.fsync(self.fd)
+            self.synced = target
+
+    def seal(self):
+        with self._sync_lock:
+            os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+            self.synced = self.size
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """Bytes already written, without copying; remaps as the active segment grows"""
+        if self._map is None or len(self._map) < offset + length:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)[offset:offset + length]
+
+    def drop(self):
+        # Readers still holding views keep the old mapping alive until they close
+        self._map = None
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+
+class _MappedReader:
+    """Reader over a record payload in a memory-mapped segment"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view)
+        if size is not None and size >= 0:
+            end = min(end, self._position + size)
+        data = bytes(self._view[self._position:end])
+        self._position = end
+        return data
+
+    def close(self):
+        self._view.release()
+
+
+class SegmentBackend(StorageBackend):
+    """
+    Chunks appended to segment files under SEGMENT_DIR, with an in-memory index
+    persisted as index.snap. Appends are serialized; reads only take the lock to
+    look up the index.
+    """
+
+    name = "segment"
+    maintenance_interval = SEGMENT_MAINTENANCE_INTERVAL
+
+    def __init__(self, root: str = SEGMENT_DIR, max_segment_bytes: int = SEGMENT_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.location = self.root
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._index: Dict[str, _Entry] = {}
+        self._keys: List[str] = []  # index keys in sorted order, for listings
+        self._segments: Dict[int, _Segment] = {}
+        self._active: Optional[_Segment] = None
+        self._seq = 0
+        self._changes = 0  # records appended since the last snapshot
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.root, f"{segment_id:08d}.seg")
+
+    def _info(self, chunk_id: str, entry: _Entry) -> ChunkInfo:
+        return ChunkInfo(
+            chunk_id=chunk_id,
+            size=entry.length,
+            etag=f"{entry.seq:x}-{entry.length:x}",
+            last_modified=datetime.fromtimestamp(entry.timestamp / 1000, tz=timezone.utc),
+        )
+
+    # Recovery
+
+    def ensure_ready(self):
+        """Load the index snapshot and replay the segments written after it"""
+        with self._lock:
+            if self._active is not None:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            for name in os.listdir(self.root):
+                if name.endswith(".tmp"):
+                    os.unlink(os.path.join(self.root, name))
+            for name in sorted(os.listdir(self.root)):
+                if name.endswith(".seg") and name[:-4].isdigit():
+                    path = os.path.join(self.root, name)
+                    self._segments[int(name[:-4])] = _Segment(int(name[:-4]), path, os.path.getsize(path))
+
+            watermarks = self._load_snapshot()
+            if watermarks:
+                # Compacted segments whose files outlived the snapshot that dropped them
+                newest_known = max(watermarks)
+                for segment_id in [s for s in self._segments if s < newest_known and s not in watermarks]:
+                    print(f"Removing compacted segment {segment_id}")
+                    self._segments.pop(segment_id).drop()
+            lost = [c for c, e in self._index.items() if e.segment not in self._segments]
+            if lost:
+                print(f"Index snapshot refers to missing segments: {len(lost)} chunks dropped")
+                for chunk_id in lost:
+                    del self._index[chunk_id]
+
+            tombstones = {}
+            replayed = 0
+            segment_ids = sorted(self._segments)
+            for segment_id in segment_ids:
+                replayed += self._replay(
+                    self._segments[segment_id], watermarks.get(segment_id, 0), tombstones,
+                    last=segment_id == segment_ids[-1]
+                )
+            for chunk_id, entry in self._index.items():
+                self._segments[entry.segment].live += _record_size(chunk_id, entry.length)
+            self._keys = sorted(self._index)
+
+            last = self._segments[segment_ids[-1]] if segment_ids else None
+            if last is None or last.size >= self.max_segment_bytes:
+                self._active = self._new_segment()
+            else:
+                last.open_for_append()
+                self._active = last
+        print(f"Segment store ready at '{self.root}': {len(self._index)} chunks in "
+              f"{len(self._segments)} segments, {replayed} records replayed")
+        self.snapshot()
+
+    def _load_snapshot(self) -> Dict[int, int]:
+        """Fill the index from index.snap; returns the bytes of each segment it covers"""
+        try:
+            with open(os.path.join(self.root, _SNAPSHOT), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        body = memoryview(data)[:-_CRC.size]
+        if (len(data) < len(_SNAPSHOT_MAGIC) + _CRC.size or not data.startswith(_SNAPSHOT_MAGIC)
+                or _CRC.unpack_from(data, len(body))[0] != zlib.crc32(body)):
+            print("Index snapshot is damaged; rebuilding the index from the segments")
+            return {}
+
+        position = len(_SNAPSHOT_MAGIC)
+        self._seq, segment_count = _SNAPSHOT_HEADER.unpack_from(body, position)
+        position += _SNAPSHOT_HEADER.size
+        watermarks = {}
+        for _ in range(segment_count):
+            segment_id, watermark = _SNAPSHOT_SEGMENT.unpack_from(body, position)
+            position += _SNAPSHOT_SEGMENT.size
+            watermarks[segment_id] = watermark
+        (count,) = _SNAPSHOT_COUNT.unpack_from(body, position)
+        position += _SNAPSHOT_COUNT.size
+        for _ in range(count):
+            segment_id, offset, length, seq, timestamp, id_len = _SNAPSHOT_ENTRY.unpack_from(body, position)
+            position += _SNAPSHOT_ENTRY.size
+            chunk_id = bytes(body[position:position + id_len]).decode("utf-8")
+            position += id_len
+            self._index[chunk_id] = _Entry(segment_id, offset, length, seq, timestamp)
+        return watermarks
+
+    def _replay(self, segment: _Segment, start: int, tombstones: Dict[str, int], last: bool) -> int:
+        """Apply the records of a segment from `start` on; the first bad record ends the scan"""
+        if segment.size <= start:
+            return 0
+        applied = 0
+        offset = start
+        with open(segment.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as buf:
+                while offset < segment.size:
+                    record = _parse_header(buf, offset, segment.size)
+                    if record is None:
+                        break
+                    kind, seq, timestamp, id_len, length, data_crc = record
+                    id_start = offset + HEADER_SIZE
+                    end = id_start + id_len + length
+                    if zlib.crc32(buf[id_start:end]) != data_crc:
+                        break
+                    chunk_id = bytes(buf[id_start:id_start + id_len]).decode("utf-8")
+
+                    current = self._index.get(chunk_id)
+                    if seq > max(current.seq if current else 0, tombstones.get(chunk_id, 0)):
+                        if kind == RECORD_PUT:
+                            self._index[chunk_id] = _Entry(segment.id, id_start + id_len, length, seq, timestamp)
+                        else:
+                            self._index.pop(chunk_id, None)
+                            tombstones[chunk_id] = seq
+                    self._seq = max(self._seq, seq)
+                    applied += 1
+                    offset = end
+
+        if offset < segment.size:
+            if last:
+                print(f"Truncating torn record at {segment.path}:{offset}")
+                os.truncate(segment.path, offset)
+                segment.size = offset
+            else:
+                print(f"Corrupt record at {segment.path}:{offset}; the rest of the segment is skipped")
+        segment.synced = segment.size
+        return applied
+
+    # Writes (called with self._lock held)
+
+    def _new_segment(self) -> _Segment:
+        segment_id = max(self._segments, default=0) + 1
+        segment = _Segment(segment_id, self._segment_path(segment_id), 0)
+        segment.open_for_append()
+        _fsync_dir(self.root)
+        self._segments[segment_id] = segment
+        return segment
+
+    def _append(self, kind: int, seq: int, timestamp: int, id_bytes: bytes, length: int,
+                data_crc: int, payload=None) -> _Entry:
+        """Append one record to the active segment, sealing it first if the record does not fit"""
+        if self._active.size and self._active.size + HEADER_SIZE + len(id_bytes) + length > self.max_segment_bytes:
+            self._active.seal()
+            self._active = self._new_segment()
+        segment = self._active
+        start = segment.size
+        try:
+            segment.write(_encode_header(kind, seq, timestamp, len(id_bytes), length, data_crc) + id_bytes)
+            if hasattr(payload, "read"):
+                while True:
+                    piece = payload.read(COPY_BUFFER_SIZE)
+                    if not piece:
+                        break
+                    segment.write(piece)
+            elif payload is not None:
+                segment.write(payload)
+            if segment.size != start + HEADER_SIZE + len(id_bytes) + length:
+                raise StorageError(f"Short payload: {segment.size - start - HEADER_SIZE - len(id_bytes)} of {length} bytes")
+        except BaseException:
+            segment.truncate(start)
+            raise
+        self._changes += 1
+        return _Entry(segment.id, start + HEADER_SIZE + len(id_bytes), length, seq, timestamp)
+
+    def _point(self, chunk_id: str, entry: Optional[_Entry]):
+        """Move a chunk's index entry (None removes it), keeping live bytes per segment"""
+        previous = self._index.pop(chunk_id, None)
+        if previous is not None:
+            self._segments[previous.segment].live -= _record_size(chunk_id, previous.length)
+        if entry is not None:
+            self._index[chunk_id] = entry
+            self._segments[entry.segment].live += _record_size(chunk_id, entry.length)
+        if previous is None and entry is not None:
+            insort(self._keys, chunk_id)
+        elif previous is not None and entry is None:
+            del self._keys[bisect_left(self._keys, chunk_id)]
+
+    def _tombstone(self, chunk_id: str):
+        id_bytes = chunk_id.encode("utf-8")
+        self._seq += 1
+        self._append(RECORD_DELETE, self._seq, int(time.time() * 1000), id_bytes, 0, zlib.crc32(id_bytes))
+        self._point(chunk_id, None)
+
+    # StorageBackend
+
+    def health(self) -> dict:
+        with self._lock:
+            written = sum(s.size for s in self._segments.values())
+            live = sum(s.live for s in self._segments.values())
+            return {
+                "path": self.root,
+                "segments": len(self._segments),
+                "chunks": len(self._index),
+                "live_bytes": live,
+                "dead_bytes": written - live,
+            }
+
+    def put(self, chunk_id: str, stream, length: int = -1):
+        """Spool the body, then append it as one record and point the index at it"""
+        id_bytes = chunk_id.encode("utf-8")
+        if len(id_bytes) > 0xFFFF:
+            raise StorageError(f"Chunk ID too long for the segment store: {len(id_bytes)} bytes")
+        # The append lock is only taken once the whole body is here
+        with tempfile.SpooledTemporaryFile(max_size=SEGMENT_SPOOL_SIZE, dir=self.root) as spool:
+            data_crc = zlib.crc32(id_bytes)
+            received = 0
+            while True:
+                piece = stream.read(COPY_BUFFER_SIZE)
+                if not piece:
+                    break
+                spool.write(piece)
+                data_crc = zlib.crc32(piece, data_crc)
+                received += len(piece)
+            if length >= 0 and received != length:
+                raise StorageError(f"Chunk {chunk_id}: expected {length} bytes, received {received}")
+            spool.seek(0)
+
+            with self._lock:
+                self._seq += 1
+                entry = self._append(RECORD_PUT, self._seq, int(time.time() * 1000), id_bytes, received, data_crc, spool)
+                self._point(chunk_id, entry)
+                segment, end = self._active, self._active.size
+        if SEGMENT_FSYNC:
+            segment.sync(end)
+
+    def open(self, chunk_id: str):
+        with self._lock:
+            entry = self._index.get(chunk_id)
+            if entry is None:
+                raise ChunkNotFound(f"Chunk {chunk_id} not found")
+            view = self._segments[entry.segment].view(entry.offset, entry.length)
+        return _MappedReader(view), self._info(chunk_id, entry)
+
+    def stat(self, chunk_id: str) -> ChunkInfo:
+        with self._lock:
+            entry = self._index.get(chunk_id)
+        if entry is None:
+            raise ChunkNotFound(f"Chunk {chunk_id} not found")
+        return self._info(chunk_id, entry)
+
+    def delete(self, chunk_id: str):
+        self.delete_many([chunk_id])
+
+    def delete_many(self, chunk_ids):
+        """Append a tombstone per existing chunk, with one fsync for the batch"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._index:
+                    self._tombstone(chunk_id)
+            segment, end = self._active, self._active.size
+        if SEGMENT_FSYNC:
+            segment.sync(end)
+        return {}
+
+    def iter_chunks(self, prefix: str = "", start_after: Optional[str] = None):
+        """Chunks in key order, read from the sorted key index LIST_PAGE_SIZE keys at a time"""
+        after = start_after
+        while True:
+            with self._lock:
+                start = bisect_left(self._keys, prefix)
+                if after is not None:
+                    start = max(start, bisect_right(self._keys, after))
+                page = [(c, self._index[c]) for c in self._keys[start:start + LIST_PAGE_SIZE]]
+            for chunk_id, entry in page:
+                if not chunk_id.startswith(prefix):
+                    return
+                yield self._info(chunk_id, entry)
+            if len(page) < LIST_PAGE_SIZE:
+                return
+            after = page[-1][0]
+
+    # Maintenance
+
+    def maintain(self):
+        """Compact mostly dead segments, then snapshot the index if it changed"""
+        self.compact()
+        if self._changes:
+            self.snapshot()
+
+    def close(self):
+        self.snapshot()
+
+    def snapshot(self):
+        """Write the index to index.snap so startup only replays the records written after it"""
+        with self._snapshot_lock:
+            with self._lock:
+                if self._active is None:
+                    return  # never loaded: keep whatever snapshot is on disk
+                entries = list(self._index.items())
+                watermarks = [(s.id, s.size) for s in self._segments.values()]
+                max_seq = self._seq
+                active, active_size = self._active, self._active.size
+                self._changes = 0
+            # The snapshot must not point at bytes that could still be lost
+            active.sync(active_size)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix="index.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    crc = 0
+                    buffer = bytearray(_SNAPSHOT_MAGIC)
+                    buffer += _SNAPSHOT_HEADER.pack(max_seq, len(watermarks))
+                    for segment_id, watermark in watermarks:
+                        buffer += _SNAPSHOT_SEGMENT.pack(segment_id, watermark)
+                    buffer += _SNAPSHOT_COUNT.pack(len(entries))
+                    for chunk_id, entry in entries:
+                        id_bytes = chunk_id.encode("utf-8")
+                        buffer += _SNAPSHOT_ENTRY.pack(*entry, len(id_bytes))
+                        buffer += id_bytes
+                        if len(buffer) >= COPY_BUFFER_SIZE:
+                            out.write(buffer)
+                            crc = zlib.crc32(buffer, crc)
+                            buffer.clear()
+                    out.write(buffer)
+                    out.write(_CRC.pack(zlib.crc32(buffer, crc)))
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, os.path.join(self.root, _SNAPSHOT))
+                _fsync_dir(self.root)
+            except BaseException:
+                with suppress(FileNotFoundError):
+                    os.unlink(tmp_path)
+                raise
+
+    def compact(self) -> int:
+        """
+        Rewrite the live records of sealed segments that are at least
+        SEGMENT_COMPACT_THRESHOLD dead into the active segment, then delete them.
+        Returns the number of segments removed.
+        """
+        with self._lock:
+            victims = [
+                s for s in self._segments.values()
+                if s is not self._active and s.size and (s.size - s.live) / s.size >= SEGMENT_COMPACT_THRESHOLD
+            ]
+        if not victims:
+            return 0
+
+        removed = []
+        for segment in victims:
+            self._rewrite(segment)
+            with self._lock:
+                if segment.live:
+                    print(f"Segment {segment.id} still has {segment.live} live bytes after compaction; kept")
+                    continue
+                del self._segments[segment.id]
+            removed.append(segment)
+        # Only once no snapshot refers to them can the files go
+        self.snapshot()
+        for segment in removed:
+            segment.drop()
+        print(f"Compacted {len(removed)} segments, reclaimed {sum(s.size for s in removed)} bytes")
+        return len(removed)
+
+    def _rewrite(self, segment: _Segment):
+        with self._lock:
+            # Tombstones only matter while an older segment may still hold what they deleted
+            keep_tombstones = min(self._segments) < segment.id
+            buf = segment.view(0, segment.size)
+        try:
+            offset = 0
+            while offset < segment.size:
+                record = _parse_header(buf, offset, segment.size)
+                if record is None:
+                    break
+                kind, seq, timestamp, id_len, length, data_crc = record
+                id_start = offset + HEADER_SIZE
+                payload_start = id_start + id_len
+                id_bytes = bytes(buf[id_start:payload_start])
+                chunk_id = id_bytes.decode("utf-8")
+                with self._lock:
+                    current = self._index.get(chunk_id)
+                    if kind == RECORD_PUT:
+                        if current is not None and current.segment == segment.id and current.offset == payload_start:
+                            payload = buf[payload_start:payload_start + length]
+                            self._point(chunk_id, self._append(RECORD_PUT, seq, timestamp, id_bytes, length, data_crc, payload))
+                    elif keep_tombstones and (current is None or current.seq < seq):
+                        self._append(RECORD_DELETE, seq, timestamp, id_bytes, 0, data_crc)
+                offset = payload_start + length
+        finally:
+            buf.release()
@@ -0,0 +1,89 @@
+"""
+Bridges between request/response streams on the event loop and the synchronous
+storage backends running on the storage I/O pool.
+"""
+import asyncio
+from typing import AsyncIterator, Optional
+
+from .storage import run_io
+
+
+class AsyncBodyReader:
+    """
+    Blocking file-like view of an async byte stream, so a request body can be
+    handed to a backend's put on a storage I/O thread. Each read() pulls
+    pieces from the stream on the event loop as needed; nothing is read ahead.
+    """
+
+    def __init__(self, pieces: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._pieces = pieces.__aiter__()
+        self._loop = loop
+        self._buffer = bytearray()
+        self._eof = False
+        self._aborted = False
+        self._pending = None
+        self.bytes_read = 0
+
+    async def _next_piece(self) -> Optional[bytes]:
+        try:
+            return await self._pieces.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def _fill(self):
+        if self._aborted:
+            raise IOError("Upload aborted")
+        self._pending = asyncio.run_coroutine_threadsafe(self._next_piece(), self._loop)
+        try:
+            piece = self._pending.result()
+        finally:
+            self._pending = None
+        if piece is None:
+            self._eof = True
+        else:
+            self._buffer += piece
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
+    def abort(self):
+        """Fail the reading thread instead of leaving it waiting for a body nobody will send"""
+        self._aborted = True
+        pending = self._pending
+        if pending is not None:
+            pending.cancel()
+
+
+async def iter_object(reader, piece_size: int, head: bytes = b"", compressor=None) -> AsyncIterator[bytes]:
+    """
+    Relay a backend reader in pieces of piece_size, reading (and optionally
+    compressing) each one on the storage I/O pool. `head` is data already read
+    from the reader. The reader is closed when the stream ends, fails or
+    is abandoned by the client.
+    """
+    unread = [head] if head else []
+
+    def next_piece():
+        piece = unread.pop() if unread else reader.read(piece_size)
+        if compressor is None:
+            return piece, not piece
+        if piece:
+            return compressor.compress(piece), False
+        return compressor.flush(), True
+
+    try:
+        while True:
+            piece, done = await run_io(next_piece)
+            if piece:
+                yield piece
+            if done:
+                break
+    finally:
+        reader.close()
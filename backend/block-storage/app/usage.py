@@ -0,0 +1,67 @@
+"""
+Chunk count and total bytes of the storage backend for GET /stats.
+
+The upload and delete endpoints update the counters as they go, so /stats never
+lists the storage. A full scan at startup and every STATS_RECONCILE_INTERVAL
+seconds corrects drift from writes this process does not see: presigned PUTs,
+overwrites of an existing chunk, and other block storage instances.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+from .storage import backend, run_io
+
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))  # seconds, 0: startup scan only
+
+
+def _scan():
+    """Count chunks and bytes with one streaming pass over the listing"""
+    objects = total = 0
+    for info in backend.iter_chunks():
+        objects += 1
+        total += info.size or 0
+    return objects, total
+
+
+class StorageUsage:
+    """Incrementally maintained storage usage, reconciled by periodic scans"""
+
+    def __init__(self):
+        self.objects = 0
+        self.bytes = 0
+        self.reconciled_at = None
+
+    def record_put(self, size: int):
+        self.objects += 1
+        self.bytes += max(size, 0)
+
+    def record_delete(self, size: int):
+        self.objects = max(self.objects - 1, 0)
+        self.bytes = max(self.bytes - size, 0)
+
+    async def reconcile(self):
+        # Writes that land while the scan runs may be counted by neither side; the next scan catches them
+        self.objects, self.bytes = await run_io(_scan)
+        self.reconciled_at = datetime.now(timezone.utc)
+        print(f"Storage usage reconciled: {self.objects} chunks, {self.bytes} bytes")
+
+    async def reconcile_periodically(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Storage usage reconciliation failed: {e}")
+            if STATS_RECONCILE_INTERVAL <= 0:
+                return
+            await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+
+    def snapshot(self) -> dict:
+        return {
+            "total_chunks": self.objects,
+            "total_bytes": self.bytes,
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None,
+        }
+
+
+usage = StorageUsage()
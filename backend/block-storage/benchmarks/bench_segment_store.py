@@ -0,0 +1,127 @@
+"""
+Put and get throughput of the segment store against one object (or file) per chunk,
+for chunk sizes from 4 KB to 4 MB. The backends are called directly from a thread
+pool, the way the service's storage I/O pool calls them.
+
+The segment and filesystem backends write to temporary directories. The minio
+backend needs a running MinIO (MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY)
+and writes to a throwaway bucket that is removed afterwards.
+
+Usage (from backend/block-storage/):
+    python -m benchmarks.bench_segment_store --backends segment,filesystem,minio --sizes 4K,64K,1M,4M
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.storage import filesystem, segment
+
+_UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+def _parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("B")
+    if text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def _count_files(path: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+@contextlib.contextmanager
+def _open_backend(kind: str, fsync: bool):
+    """(backend, function returning the number of files it created); cleaned up on exit"""
+    if kind == "minio":
+        from app.storage.minio_backend import MinioBackend, minio_client
+        backend = MinioBackend(f"bench-{uuid.uuid4().hex[:8]}")
+        backend.ensure_ready()
+        try:
+            yield backend, lambda: sum(1 for _ in backend.iter_chunks())
+        finally:
+            backend.delete_many([info.chunk_id for info in backend.iter_chunks()])
+            minio_client.remove_bucket(backend.bucket_name)
+        return
+
+    root = tempfile.mkdtemp(prefix=f"bench-{kind}-")
+    try:
+        if kind == "segment":
+            backend = segment.SegmentBackend(root)
+        elif kind == "filesystem":
+            backend = filesystem.FilesystemBackend(root, fsync=fsync)
+        else:
+            raise ValueError(f"Unknown backend '{kind}'")
+        backend.ensure_ready()
+        yield backend, lambda: _count_files(root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _run(backend, size: int, count: int, threads: int):
+    payload = os.urandom(size)
+    chunk_ids = [f"bench_{size}_{i}" for i in range(count)]
+
+    def put(chunk_id):
+        backend.put(chunk_id, io.BytesIO(payload), size)
+
+    def get(chunk_id):
+        data, _ = backend.read(chunk_id)
+        assert len(data) == size
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(put, chunk_ids))
+        put_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        list(pool.map(get, chunk_ids))
+        get_seconds = time.perf_counter() - start
+    return chunk_ids, count / put_seconds, count / get_seconds
+
+
+def _format_size(size: int) -> str:
+    for unit, factor in (("M", _UNITS["M"]), ("K", _UNITS["K"])):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="segment,filesystem", help="comma separated: segment, filesystem, minio")
+    parser.add_argument("--sizes", default="4K,64K,1M,4M", help="comma separated chunk sizes")
+    parser.add_argument("--total-mb", type=float, default=256, help="data written per size (at most --max-chunks chunks)")
+    parser.add_argument("--max-chunks", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync in the segment and filesystem backends")
+    args = parser.parse_args()
+
+    if args.no_fsync:
+        segment.SEGMENT_FSYNC = False
+
+    sizes = [_parse_size(size) for size in args.sizes.split(",")]
+    print(f"{args.threads} threads, fsync {'off' if args.no_fsync else 'on'}")
+    print(f"{'backend':>10}  {'size':>7}  {'chunks':>6}  {'put/s':>8}  {'put MB/s':>8}  {'get/s':>8}  {'get MB/s':>8}  {'files':>6}")
+    for kind in args.backends.split(","):
+        with _open_backend(kind.strip(), fsync=not args.no_fsync) as (backend, count_files):
+            for size in sizes:
+                count = max(16, min(args.max_chunks, int(args.total_mb * 1024 * 1024 // size)))
+                with contextlib.redirect_stdout(io.StringIO()):  # backends log every write
+                    chunk_ids, put_rate, get_rate = _run(backend, size, count, args.threads)
+                    files = count_files()  # objects for MinIO, files (segments) otherwise
+                    backend.delete_many(chunk_ids)
+                    if kind == "segment":
+                        backend.compact()
+                mb = size / (1024 * 1024)
+                print(f"{kind:>10}  {_format_size(size):>7}  {count:>6}  {put_rate:>8.0f}  {put_rate * mb:>8.1f}  "
+                      f"{get_rate:>8.0f}  {get_rate * mb:>8.1f}  {files:>6}")
+
+
+if __name__ == "__main__":
+    main()
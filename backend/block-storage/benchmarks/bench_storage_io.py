@@ -0,0 +1,97 @@
+"""
+Concurrent throughput of block storage with MinIO calls on the event loop
+("inline", how the service used to call minio) versus on the storage I/O pool
+("pool", STORAGE_IO_THREADS).
+
+Runs the app in-process over an ASGI transport. MinIO is replaced by a stand-in
+that blocks for --latency-ms per call, like a synchronous minio request would,
+so no MinIO server is needed.
+
+Usage (from backend/block-storage/):
+    python -m benchmarks.bench_storage_io --requests 400 --concurrency 1,8,32,64
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from app import main
+from app.auth import get_current_user
+from app.storage import ChunkInfo
+
+CHUNK = b"x" * 64 * 1024
+
+
+def _install_fake_storage(latency: float):
+    def open_chunk(chunk_id):
+        time.sleep(latency)
+        return io.BytesIO(CHUNK), ChunkInfo(chunk_id, len(CHUNK), "bench", datetime.now(timezone.utc))
+
+    def put_chunk(chunk_id, stream, length=-1):
+        time.sleep(latency)
+
+    main.backend.open = open_chunk
+    main.backend.put = put_chunk
+    main.app.dependency_overrides[get_current_user] = lambda: {"sub": "bench"}
+
+
+async def _inline_io(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def _run_level(op: str, total: int, concurrency: int):
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://block-storage") as client:
+        async def one(index: int):
+            async with semaphore:
+                start = time.perf_counter()
+                if op == "get":
+                    response = await client.get(f"/chunks/bench_{index}")
+                else:
+                    response = await client.put(f"/chunks/bench_{index}", content=CHUNK)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return total / elapsed, statistics.median(latencies) * 1000, p99 * 1000
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma separated levels")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="simulated time per MinIO call")
+    parser.add_argument("--op", choices=["get", "put"], default="get")
+    args = parser.parse_args()
+
+    _install_fake_storage(args.latency_ms / 1000)
+    pooled_io = main.run_io
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"{args.requests} {args.op.upper()} requests, {args.latency_ms:.0f} ms per MinIO call, "
+          f"{main.io_pool_stats()['threads']} I/O threads")
+    print(f"{'mode':>6}  {'concurrency':>11}  {'req/s':>8}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for mode, run_io in (("inline", _inline_io), ("pool", pooled_io)):
+        main.run_io = run_io
+        for concurrency in levels:
+            with contextlib.redirect_stdout(io.StringIO()):  # the service logs every request
+                rate, p50, p99 = await _run_level(args.op, args.requests, concurrency)
+            print(f"{mode:>6}  {concurrency:>11}  {rate:>8.1f}  {p50:>8.1f}  {p99:>8.1f}")
+    main.run_io = pooled_io
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
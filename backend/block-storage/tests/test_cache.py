@@ -0,0 +1,227 @@
+import io
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.storage import ChunkNotFound
+from app.storage import cache
+from app.storage.cache import CachedBackend
+from app.storage.filesystem import FilesystemBackend
+
+
+def open_tier(tmp_path, **options):
+    primary = FilesystemBackend(str(tmp_path / "primary"), fsync=False)
+    tier = CachedBackend(primary, root=str(tmp_path / "cache"), **options)
+    tier.ensure_ready()
+    return tier
+
+
+def put(store, chunk_id, data):
+    store.put(chunk_id, io.BytesIO(data), len(data))
+
+
+def read_in_pieces(tier, chunk_id, piece_size):
+    reader, _ = tier.open(chunk_id)
+    try:
+        pieces = []
+        while True:
+            piece = reader.read(piece_size)
+            if not piece:
+                return b"".join(pieces)
+            pieces.append(piece)
+    finally:
+        reader.close()
+
+
+def test_delete_during_fill_does_not_resurrect_chunk(tmp_path):
+    """A copy still streaming when the chunk is deleted is discarded instead of cached"""
+    tier = open_tier(tmp_path, admission="always")
+    put(tier, "doomed", b"d" * 1000)
+
+    reader, _ = tier.open("doomed")
+    assert reader.read(400) == b"d" * 400
+    tier.delete("doomed")
+    assert reader.read(600) == b"d" * 600  # completes the copy
+    reader.close()
+
+    assert tier.tier_stats()["chunks"] == 0
+    assert list(tier.cache.iter_chunks()) == []  # the discarded copy is not left on disk
+    with pytest.raises(ChunkNotFound):
+        tier.stat("doomed")
+    with pytest.raises(ChunkNotFound):
+        tier.open("doomed")
+    assert tier._filling == {}
+
+
+def test_fill_started_after_delete_is_cached(tmp_path):
+    tier = open_tier(tmp_path, admission="always")
+    put(tier, "a", b"a" * 1000)
+    tier.delete("a")
+    put(tier, "a", b"A" * 1000)
+    assert read_in_pieces(tier, "a", 300) == b"A" * 1000
+    assert tier.tier_stats()["chunks"] == 1
+    assert tier._filling == {}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    tier = open_tier(tmp_path, admission="always")
+    monkeypatch.setattr(main, "backend", tier)
+    return TestClient(main.app), tier
+
+
+def test_get_falls_back_to_primary_when_cached_file_is_gone(client):
+    """A cached file evicted or removed under the service is fetched from the primary, not a 500"""
+    http, tier = client
+    put(tier, "c", b"c" * 5000)
+    assert http.get("/chunks/c").content == b"c" * 5000  # miss, cached on the way
+    assert http.get("/chunks/c").content == b"c" * 5000  # hit
+    assert tier.tier_stats()["hits"] == 1
+
+    os.unlink(tier.cache.local_path("c"))
+    response = http.get("/chunks/c")
+    assert response.status_code == 200
+    assert response.content == b"c" * 5000
+
+
+def test_hit_keeps_streaming_after_eviction(tmp_path):
+    """The handle of a hit is opened under the lock, so evicting the chunk mid-read is harmless"""
+    tier = open_tier(tmp_path, admission="always", max_bytes=8000)
+    put(tier, "hot", b"h" * 1000)
+    read_in_pieces(tier, "hot", 1000)  # cached
+    reader, _ = tier.open("hot")
+    for i in range(8):
+        put(tier, f"cold{i}", bytes([i]) * 1000)
+        read_in_pieces(tier, f"cold{i}", 1000)
+    assert not os.path.exists(tier.cache.local_path("hot"))
+    assert reader.read() == b"h" * 1000
+    reader.close()
+
+
+def test_second_read_admission(tmp_path, monkeypatch):
+    """A chunk is cached on its second miss, while it is still among the remembered misses"""
+    monkeypatch.setattr(cache, "CACHE_GHOST_ENTRIES", 2)
+    tier = open_tier(tmp_path)
+    for chunk_id in ("a", "b", "c"):
+        put(tier, chunk_id, chunk_id.encode() * 100)
+
+    read_in_pieces(tier, "a", 1000)
+    assert tier.tier_stats()["chunks"] == 0
+    read_in_pieces(tier, "a", 1000)
+    assert tier.tier_stats()["chunks"] == 1
+
+    read_in_pieces(tier, "b", 1000)
+    read_in_pieces(tier, "c", 1000)
+    read_in_pieces(tier, "a", 1000)  # hit, not a miss
+    assert len(tier._ghosts) == 2
+    read_in_pieces(tier, "c", 1000)
+    assert set(tier._entries) == {"a", "c"}
+
+    # A scan pushes b out of the ghost list, so its next miss starts over
+    for i in range(3):
+        put(tier, f"scan{i}", b"s" * 100)
+        read_in_pieces(tier, f"scan{i}", 1000)
+    assert len(tier._ghosts) == 2
+    read_in_pieces(tier, "b", 1000)
+    assert "b" not in tier._entries
+
+
+def test_lru_eviction_keeps_cache_under_max_bytes(tmp_path):
+    tier = open_tier(tmp_path, admission="always", max_bytes=4000)
+    for chunk_id in ("a", "b", "c", "d"):
+        put(tier, chunk_id, b"x" * 500)
+        read_in_pieces(tier, chunk_id, 1000)
+    read_in_pieces(tier, "a", 1000)  # a becomes the most recently used
+
+    for chunk_id in ("e", "f", "g", "h", "i"):
+        put(tier, chunk_id, b"x" * 500)
+        read_in_pieces(tier, chunk_id, 1000)
+
+    stats = tier.tier_stats()
+    assert stats["used_bytes"] <= 4000
+    assert stats["evictions"] == 1
+    assert list(tier._entries) == ["c", "d", "a", "e", "f", "g", "h", "i"]  # least recently used first, b evicted
+    assert sorted(info.chunk_id for info in tier.cache.iter_chunks()) == ["a", "c", "d", "e", "f", "g", "h", "i"]
+
+    put(tier, "big", b"x" * 501)  # over an eighth of the cap
+    read_in_pieces(tier, "big", 1000)
+    assert "big" not in tier._entries
+
+
+def test_partial_read_does_not_commit_a_copy(tmp_path):
+    tier = open_tier(tmp_path, admission="always")
+    put(tier, "p", b"p" * 1000)
+    reader, _ = tier.open("p")
+    assert reader.read(400) == b"p" * 400
+    reader.close()  # client went away
+    assert tier.tier_stats()["chunks"] == 0
+    assert list(tier.cache.iter_chunks()) == []
+    assert tier._filling == {}
+
+
+def test_bypass_cache_drops_the_copy_and_reads_the_primary(tmp_path):
+    tier = open_tier(tmp_path, admission="always")
+    put(tier, "b", b"b" * 1000)
+    read_in_pieces(tier, "b", 1000)
+    assert "b" in tier._entries
+
+    store = tier.bypass_cache("b")
+    assert store is tier.primary
+    assert "b" not in tier._entries
+    assert list(tier.cache.iter_chunks()) == []
+    assert store.read("b")[0] == b"b" * 1000
+    assert tier.tier_stats()["bypasses"] == 1
+
+
+def test_restart_reindexes_cached_chunks(tmp_path):
+    """Copies on the cache disk survive a restart; their metadata is fetched from the primary on first use"""
+    tier = open_tier(tmp_path, admission="always", max_bytes=8000)
+    for chunk_id in ("old", "new"):
+        put(tier, chunk_id, chunk_id.encode() * 250)
+        read_in_pieces(tier, chunk_id, 1000)
+    os.utime(tier.cache.local_path("old"), (1, 1))
+    tier.primary.delete("new")  # removed behind the cache's back
+
+    tier = open_tier(tmp_path, admission="always", max_bytes=8000)
+    assert list(tier._entries) == ["old", "new"]  # oldest first
+    assert all(entry.info is None for entry in tier._entries.values())
+    assert read_in_pieces(tier, "old", 1000) == b"old" * 250
+    assert tier.tier_stats()["hits"] == 1
+    with pytest.raises(ChunkNotFound):
+        tier.stat("new")
+    assert list(tier._entries) == ["old"]
+
+    # A smaller cap evicts the oldest copies on startup
+    tier = open_tier(tmp_path, admission="always", max_bytes=700)
+    assert tier.tier_stats()["used_bytes"] == 0
+
+
+def test_read_during_overwrite_does_not_cache_old_bytes(tmp_path):
+    """A copy of the old bytes finishing after a cache-on-write overwrite must not replace the new copy"""
+    tier = open_tier(tmp_path, admission="always", cache_on_write=True)
+    put(tier.primary, "a", b"1" * 1000)
+    started, release = threading.Event(), threading.Event()
+
+    class SlowBody(io.BytesIO):
+        def read(self, size=-1):
+            started.set()
+            release.wait(5)
+            return super().read(size)
+
+    writer = threading.Thread(target=tier.put, args=("a", SlowBody(b"2" * 1000), 1000))
+    writer.start()
+    started.wait(5)
+    reader, _ = tier.open("a")  # reads the primary's old bytes while the overwrite is running
+    release.set()
+    writer.join(5)
+
+    assert reader.read() == b"1" * 1000  # completes the (now stale) copy
+    reader.close()
+
+    assert tier.cache.read("a")[0] == b"2" * 1000
+    assert read_in_pieces(tier, "a", 300) == b"2" * 1000
+    assert os.listdir(tier.spool_dir) == []
+    assert tier._filling == {}
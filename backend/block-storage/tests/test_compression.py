@@ -0,0 +1,79 @@
+import base64
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression, main
+from app.auth import get_current_user
+from app.storage import ChunkNotFound
+from app.storage.filesystem import FilesystemBackend
+
+ENCODINGS = compression.SUPPORTED_ENCODINGS
+
+
+def payload(size=200_000):
+    # Compressible, but not so much that the encoded body is tiny
+    return base64.b64encode(os.urandom(size * 3 // 4))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = FilesystemBackend(str(tmp_path), fsync=False)
+    store.ensure_ready()
+    monkeypatch.setattr(main, "backend", store)
+    main.app.dependency_overrides[get_current_user] = lambda: {"sub": "test-user"}
+    yield TestClient(main.app), store
+    main.app.dependency_overrides.pop(get_current_user, None)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_decoding_reader_round_trip(encoding):
+    data = payload()
+    reader = compression.DecodingReader(io.BytesIO(compression.compress(data, encoding)), encoding, len(data))
+    assert reader.read() == data
+    assert reader.bytes_read == len(data)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+@pytest.mark.parametrize("keep", [0.0, 0.5, -1])
+def test_decoding_reader_rejects_truncated_frame(encoding, keep):
+    encoded = compression.compress(payload(), encoding)
+    cut = len(encoded) - 1 if keep == -1 else int(len(encoded) * keep)
+    reader = compression.DecodingReader(io.BytesIO(encoded[:cut]), encoding, 1 << 20)
+    with pytest.raises(compression.TruncatedBody):
+        reader.read()
+
+
+@pytest.mark.skipif("zstd" not in ENCODINGS, reason="zstandard is not installed")
+def test_zstd_concatenated_frames_and_size_limit():
+    frames = compression.compress(b"a" * 5000, "zstd") + compression.compress(b"b" * 5000, "zstd")
+    assert compression.DecodingReader(io.BytesIO(frames), "zstd", 10_000).read() == b"a" * 5000 + b"b" * 5000
+
+    bomb = compression.compress(b"\0" * (32 << 20), "zstd")
+    with pytest.raises(compression.DecompressedTooLarge):
+        compression.DecodingReader(io.BytesIO(bomb), "zstd", 1 << 20).read()
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_put_with_truncated_body_is_rejected_and_not_stored(client, encoding):
+    http, store = client
+    encoded = compression.compress(payload(), encoding)
+    response = http.put("/chunks/truncated", content=encoded[:len(encoded) // 2],
+                        headers={"Content-Encoding": encoding, "Content-Type": "application/octet-stream"})
+    assert response.status_code == 400
+    with pytest.raises(ChunkNotFound):
+        store.stat("truncated")
+    assert os.listdir(os.path.join(store.root, "tmp")) == []
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_put_with_complete_body_stores_decoded_chunk(client, encoding):
+    http, store = client
+    data = payload()
+    response = http.put("/chunks/complete", content=compression.compress(data, encoding),
+                        headers={"Content-Encoding": encoding, "Content-Type": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.json()["size"] == len(data)
+    assert store.read("complete")[0] == data
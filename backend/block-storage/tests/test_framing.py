@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app import framing
+
+
+def _decode(stream: bytes, piece_size: int):
+    async def pieces():
+        for start in range(0, len(stream), piece_size):
+            yield stream[start:start + piece_size]
+
+    async def collect():
+        return [entry async for entry in framing.iter_entries(pieces())]
+
+    return asyncio.run(collect())
+
+
+def test_entries_round_trip_across_piece_boundaries():
+    stream = (
+        framing.encode_header("user_a", framing.STATUS_OK, 5) + b"hello"
+        + framing.encode_header("user_b", framing.STATUS_NOT_FOUND, 0)
+        + framing.encode_header("user_c", framing.STATUS_ERROR, 4) + b"boom"
+    )
+    expected = [
+        ("user_a", framing.STATUS_OK, b"hello"),
+        ("user_b", framing.STATUS_NOT_FOUND, b""),
+        ("user_c", framing.STATUS_ERROR, b"boom"),
+    ]
+    for piece_size in (1, 7, len(stream)):
+        assert _decode(stream, piece_size) == expected
+
+
+def test_truncated_stream_is_rejected():
+    stream = framing.encode_header("user_a", framing.STATUS_OK, 10) + b"short"
+    with pytest.raises(ValueError):
+        _decode(stream, 4)
@@ -0,0 +1,164 @@
+import io
+import os
+
+import pytest
+
+from app.storage import ChunkNotFound
+from app.storage import segment
+from app.storage.segment import SegmentBackend
+
+
+def open_store(root, max_segment_bytes=segment.SEGMENT_MAX_BYTES):
+    store = SegmentBackend(str(root), max_segment_bytes=max_segment_bytes)
+    store.ensure_ready()
+    return store
+
+
+def put(store, chunk_id, data):
+    store.put(chunk_id, io.BytesIO(data), len(data))
+
+
+def segment_files(root):
+    return sorted(name for name in os.listdir(root) if name.endswith(".seg"))
+
+
+def assert_missing(store, chunk_id):
+    with pytest.raises(ChunkNotFound):
+        store.stat(chunk_id)
+
+
+@pytest.mark.parametrize("keep_snapshot", [True, False])
+def test_restart_recovers_index_from_snapshot_and_replay(tmp_path, keep_snapshot):
+    """Writes after the last snapshot are replayed; without a snapshot the index is rebuilt"""
+    store = open_store(tmp_path)
+    put(store, "a", b"a" * 100)
+    put(store, "b", b"b" * 200)
+    store.snapshot()
+    put(store, "c", b"c" * 300)
+    put(store, "b", b"B" * 50)  # overwritten after the snapshot
+    store.delete("a")  # deleted after the snapshot
+    # No close(): the process dies here
+    if not keep_snapshot:
+        os.unlink(tmp_path / "index.snap")
+
+    store = open_store(tmp_path)
+    assert_missing(store, "a")
+    assert store.read("b")[0] == b"B" * 50
+    assert store.read("c")[0] == b"c" * 300
+    assert [info.chunk_id for info in store.iter_chunks()] == ["b", "c"]
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    """A record cut short by a crash is dropped and the segment is cut back to the last whole record"""
+    store = open_store(tmp_path)
+    put(store, "whole", b"w" * 1000)
+    path = tmp_path / segment_files(tmp_path)[0]
+    intact = os.path.getsize(path)
+    put(store, "torn", b"t" * 1000)
+    os.truncate(path, intact + segment.HEADER_SIZE + 10)
+
+    store = open_store(tmp_path)
+    assert os.path.getsize(path) == intact
+    assert store.read("whole")[0] == b"w" * 1000
+    assert_missing(store, "torn")
+    put(store, "after", b"n" * 10)
+
+    store = open_store(tmp_path)
+    assert store.read("after")[0] == b"n" * 10
+
+
+def deleted_behind_older_segment(root, monkeypatch):
+    """
+    Segment 1 keeps live chunk y and the deleted chunk x; segment 2 holds only dead data:
+    z (deleted) and the tombstones of x and z. Compaction rewrites segment 2 alone.
+    """
+    monkeypatch.setattr(segment, "SEGMENT_COMPACT_THRESHOLD", 0.5)
+    store = open_store(root, max_segment_bytes=5000)
+    put(store, "x", b"x" * 100)
+    put(store, "y", b"y" * 4000)
+    put(store, "z", b"z" * 4000)  # does not fit: segment 2
+    store.delete("x")
+    store.delete("z")
+    put(store, "w", b"w" * 4000)  # segment 3 becomes the active one
+    assert segment_files(root) == ["00000001.seg", "00000002.seg", "00000003.seg"]
+    return store
+
+
+def test_compaction_keeps_tombstones_while_older_segments_exist(tmp_path, monkeypatch):
+    store = deleted_behind_older_segment(tmp_path, monkeypatch)
+    assert store.compact() == 1
+    assert segment_files(tmp_path) == ["00000001.seg", "00000003.seg"]
+
+    # Rebuilt from the segments alone, x in segment 1 must stay deleted
+    os.unlink(tmp_path / "index.snap")
+    store = open_store(tmp_path, max_segment_bytes=5000)
+    assert_missing(store, "x")
+    assert_missing(store, "z")
+    assert store.read("y")[0] == b"y" * 4000
+    assert store.read("w")[0] == b"w" * 4000
+
+
+def test_compacted_segment_left_behind_by_a_crash_is_removed(tmp_path, monkeypatch):
+    """A crash between the post-compaction snapshot and the unlink leaves the old file; startup removes it"""
+    store = deleted_behind_older_segment(tmp_path, monkeypatch)
+    monkeypatch.setattr(segment._Segment, "drop", lambda self: None)
+    store.compact()
+    monkeypatch.undo()
+    assert "00000002.seg" in segment_files(tmp_path)
+
+    store = open_store(tmp_path, max_segment_bytes=5000)
+    assert segment_files(tmp_path) == ["00000001.seg", "00000003.seg"]
+    assert_missing(store, "z")
+    assert store.read("y")[0] == b"y" * 4000
+
+
+def test_crash_before_compaction_snapshot_keeps_newest_copies(tmp_path, monkeypatch):
+    """Live records copied by an unfinished compaction exist twice; replay keeps one, by seq"""
+    monkeypatch.setattr(segment, "SEGMENT_COMPACT_THRESHOLD", 0.5)
+    store = open_store(tmp_path, max_segment_bytes=5000)
+    put(store, "keep", b"k" * 1000)
+    put(store, "gone", b"g" * 3000)
+    put(store, "next", b"n" * 4000)  # segment 2
+    store.delete("gone")
+    monkeypatch.setattr(SegmentBackend, "snapshot", lambda self: None)
+    monkeypatch.setattr(segment._Segment, "drop", lambda self: None)
+    assert store.compact() == 1
+    monkeypatch.undo()
+
+    store = open_store(tmp_path, max_segment_bytes=5000)
+    assert store.read("keep")[0] == b"k" * 1000
+    assert store.read("next")[0] == b"n" * 4000
+    assert_missing(store, "gone")
+    assert store.compact() == 1  # segment 1 is still mostly dead
+    assert [info.chunk_id for info in store.iter_chunks()] == ["keep", "next"]
+
+
+def test_damaged_snapshot_falls_back_to_full_replay(tmp_path):
+    store = open_store(tmp_path)
+    put(store, "a", b"a" * 10)
+    store.close()
+    with open(tmp_path / "index.snap", "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\xff")
+
+    store = open_store(tmp_path)
+    assert store.read("a")[0] == b"a" * 10
+
+
+def test_listing_pages_follow_key_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(segment, "LIST_PAGE_SIZE", 3)
+    store = open_store(tmp_path)
+    for chunk_id in ["b2", "a1", "b1", "c1", "b3", "a2", "b4"]:
+        put(store, chunk_id, chunk_id.encode())
+    store.delete("b3")
+    put(store, "b1", b"overwritten")
+
+    assert [c.chunk_id for c in store.iter_chunks()] == ["a1", "a2", "b1", "b2", "b4", "c1"]
+    assert [c.chunk_id for c in store.iter_chunks("b")] == ["b1", "b2", "b4"]
+    assert [c.chunk_id for c in store.iter_chunks("b", start_after="b1")] == ["b2", "b4"]
+    assert [c.chunk_id for c in store.iter_chunks(start_after="a9")] == ["b1", "b2", "b4", "c1"]
+    assert list(store.iter_chunks("d")) == []
+
+    store.close()
+    reopened = open_store(tmp_path)
+    assert [c.chunk_id for c in reopened.iter_chunks("b")] == ["b1", "b2", "b4"]
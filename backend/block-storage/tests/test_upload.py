@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.auth import get_current_user
+from app.storage.filesystem import FilesystemBackend
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = FilesystemBackend(str(tmp_path), fsync=False)
+    store.ensure_ready()
+    monkeypatch.setattr(main, "backend", store)
+    main.app.dependency_overrides[get_current_user] = lambda: {"sub": "test-user"}
+    yield TestClient(main.app), store
+    main.app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_streamed_put_runs_on_upload_pool(client, monkeypatch):
+    http, store = client
+    threads = []
+    put = store.put
+
+    def recording_put(*args):
+        threads.append(threading.current_thread().name)
+        return put(*args)
+
+    monkeypatch.setattr(store, "put", recording_put)
+    response = http.put("/chunks/raw", content=b"x" * 1000, headers={"Content-Type": "application/octet-stream"})
+    assert response.status_code == 200
+    assert store.read("raw")[0] == b"x" * 1000
+    assert threads and threads[0].startswith("storage-upload")
+
+
+def test_stats_report_both_pools(client):
+    http, _ = client
+    pools = http.get("/stats").json()["io_pool"]
+    assert pools["upload_threads"] > 0 and pools["threads"] > 0
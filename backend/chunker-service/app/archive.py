@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import posixpath
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAX_FILES = int(os.getenv("ARCHIVE_MAX_FILES", "10000"))
+ARCHIVE_PREFETCH = int(os.getenv("ARCHIVE_PREFETCH", "4"))  # chunks in flight per entry
+ARCHIVE_MANIFEST_CONCURRENCY = int(os.getenv("ARCHIVE_MANIFEST_CONCURRENCY", "16"))
+
+ARCHIVE_FORMATS = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+}
+ZIP_COMPRESSION = {
+    "store": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+}
+
+
+@dataclass
+class ArchiveEntry:
+    """One file to place in the archive"""
+    name: str
+    chunk_ids: List[str]
+    size: Optional[int] = None  # None when metadata has no reliable size
+    mtime: float = field(default_factory=time.time)
+
+
+ChunkSource = Callable[[List[str]], AsyncIterator[bytes]]
+
+
+class _Sink:
+    """Write-only buffer that the archive writers fill and the response drains"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def unique_entry_names(filenames: List[str]) -> List[str]:
+    """Make archive member names safe and unique ("a.txt", "a (1).txt", ...)"""
+    seen = set()
+    names = []
+    for raw in filenames:
+        name = posixpath.basename((raw or "").replace("\\", "/")) or "file"
+        stem, ext = posixpath.splitext(name)
+        candidate, counter = name, 1
+        while candidate in seen:
+            candidate = f"{stem} ({counter}){ext}"
+            counter += 1
+        seen.add(candidate)
+        names.append(candidate)
+    return names
+
+
+async def stream_zip(entries: List[ArchiveEntry], chunk_source: ChunkSource, compression: str = "store") -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive entry by entry.
+
+    The sink is not seekable, so zipfile writes each member with a trailing
+    data descriptor and nothing has to be rewritten after the fact.
+    """
+    compress_type = ZIP_COMPRESSION[compression]
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=compress_type, allowZip64=True)
+
+    for entry in entries:
+        info = zipfile.ZipInfo(entry.name, date_time=time.localtime(entry.mtime)[:6])
+        info.compress_type = compress_type
+        info.external_attr = 0o644 << 16
+        force_zip64 = entry.size is None or entry.size >= zipfile.ZIP64_LIMIT
+
+        with archive.open(info, mode="w", force_zip64=force_zip64) as member:
+            async for data in chunk_source(entry.chunk_ids):
+                if compress_type == zipfile.ZIP_DEFLATED:
+                    # Deflate is CPU-bound, keep it off the event loop
+                    await asyncio.to_thread(member.write, data)
+                else:
+                    member.write(data)
+                output = sink.drain()
+                if output:
+                    yield output
+        yield sink.drain()
+
+    archive.close()
+    yield sink.drain()
+
+
+async def stream_tar(entries: List[ArchiveEntry], chunk_source: ChunkSource) -> AsyncIterator[bytes]:
+    """
+    Stream a POSIX (pax) TAR archive entry by entry.
+
+    TAR headers carry the member size up front. Entries without a known size
+    are buffered individually before their header is written.
+    """
+    offset = 0
+    for entry in entries:
+        if entry.size is None:
+            logger.warning(f"⚠️ Size unknown for archive entry {entry.name}, buffering it")
+            data = b"".join([piece async for piece in chunk_source(entry.chunk_ids)])
+            header = _tar_header(entry, len(data))
+            padding = _tar_padding(len(data))
+            offset += len(header) + len(data) + len(padding)
+            yield header
+            yield data
+            yield padding
+            continue
+
+        header = _tar_header(entry, entry.size)
+        offset += len(header)
+        yield header
+        written = 0
+        async for data in chunk_source(entry.chunk_ids):
+            written += len(data)
+            if written > entry.size:
+                raise Exception(f"Archive entry {entry.name} is larger than its recorded size")
+            yield data
+        if written != entry.size:
+            raise Exception(f"Archive entry {entry.name} is {written} bytes, expected {entry.size}")
+        padding = _tar_padding(written)
+        offset += written + len(padding)
+        yield padding
+
+    # End-of-archive marker, then pad to a full record like tarfile does
+    trailer = b"\0" * (2 * tarfile.BLOCKSIZE)
+    remainder = (offset + len(trailer)) % tarfile.RECORDSIZE
+    if remainder:
+        trailer += b"\0" * (tarfile.RECORDSIZE - remainder)
+    yield trailer
+
+
+def _tar_header(entry: ArchiveEntry, size: int) -> bytes:
+    info = tarfile.TarInfo(entry.name)
+    info.size = size
+    info.mtime = int(entry.mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8", errors="surrogateescape")
+
+
+def _tar_padding(size: int) -> bytes:
+    remainder = size % tarfile.BLOCKSIZE
+    return b"\0" * (tarfile.BLOCKSIZE - remainder) if remainder else b""
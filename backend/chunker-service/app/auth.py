@@ -1,7 +1,9 @@
+import hmac
 import os
+from typing import Optional
 from jose import jwt
 import requests
-from fastapi import HTTPException, Security
+from fastapi import Header, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 import logging
@@ -15,6 +17,8 @@ load_dotenv()
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_AUDIENCE = os.getenv("API_AUDIENCE")
 ALGORITHMS = os.getenv("ALGORITHMS", "RS256").split(",")
+# Shared secret other services send in X-Internal-Token on /internal endpoints (unset rejects them all)
+INTERNAL_SERVICE_TOKEN = os.getenv("INTERNAL_SERVICE_TOKEN", "")
 
 token_auth_scheme = HTTPBearer()
 
@@ -67,3 +71,10 @@ def verify_jwt(token: str):
 def get_current_user(credentials: HTTPAuthorizationCredentials = Security(token_auth_scheme)):
     """FastAPI dependency that extracts and validates the JWT token"""
     return verify_jwt(credentials.credentials)
+
+def require_service_caller(x_internal_token: Optional[str] = Header(default=None)):
+    """FastAPI dependency that admits only other services, identified by INTERNAL_SERVICE_TOKEN"""
+    if not INTERNAL_SERVICE_TOKEN or not x_internal_token or not hmac.compare_digest(
+        x_internal_token.encode(), INTERNAL_SERVICE_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Internal endpoint")
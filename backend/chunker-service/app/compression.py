@@ -0,0 +1,143 @@
+"""
+Content-Encoding negotiation for chunk transfer between services.
+
+zstd is preferred when the optional `zstandard` package is installed, gzip is
+always available. Chunks that are already compressed (recognised by their magic
+bytes) or whose leading sample does not shrink are sent as-is.
+"""
+import os
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+CHUNK_COMPRESSION_ENABLED = os.getenv("CHUNK_COMPRESSION_ENABLED", "false").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes, smaller bodies are not worth it
+COMPRESSION_SAMPLE_SIZE = int(os.getenv("COMPRESSION_SAMPLE_SIZE", "65536"))
+COMPRESSION_MIN_SAVING = float(os.getenv("COMPRESSION_MIN_SAVING", "0.1"))  # sample must shrink by 10%
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+# zstd input is fed in slices this small so one call cannot expand far past the size limit
+_ZSTD_FEED_SIZE = 256
+
+# Preference order for responses
+SUPPORTED_ENCODINGS = (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+# Magic numbers of formats that are already compressed
+_COMPRESSED_SIGNATURES = (
+    b"\x1f\x8b",              # gzip
+    b"\x28\xb5\x2f\xfd",      # zstd
+    b"PK\x03\x04",            # zip, docx, xlsx, jar, apk
+    b"\x89PNG",               # png
+    b"\xff\xd8\xff",          # jpeg
+    b"GIF8",                  # gif
+    b"BZh",                   # bzip2
+    b"\xfd7zXZ\x00",          # xz
+    b"7z\xbc\xaf\x27\x1c",    # 7z
+    b"Rar!",                  # rar
+    b"OggS",                  # ogg
+    b"fLaC",                  # flac
+    b"ID3",                   # mp3
+    b"\x1aE\xdf\xa3",         # matroska / webm
+)
+
+
+class DecompressedTooLarge(ValueError):
+    """Decoded body exceeds the allowed size"""
+
+
+class TruncatedBody(ValueError):
+    """Encoded body ends before the end of its gzip or zstd frame"""
+
+
+def looks_compressed(data: bytes) -> bool:
+    """True when the data starts with the signature of an already-compressed format"""
+    head = bytes(data[:16])
+    if head.startswith(_COMPRESSED_SIGNATURES):
+        return True
+    # RIFF containers (webp, avi) and ISO media (mp4, mov, heic)
+    if head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"AVI "):
+        return True
+    return head[4:8] == b"ftyp"
+
+
+def is_compressible(data: bytes) -> bool:
+    """Cheap check: skip small bodies, known compressed formats and samples that do not shrink"""
+    if len(data) < COMPRESSION_MIN_SIZE or looks_compressed(data):
+        return False
+    sample = bytes(data[:COMPRESSION_SAMPLE_SIZE])
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1.0 - COMPRESSION_MIN_SAVING)
+
+
+def select_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred supported encoding allowed by an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(bytes(data))
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str], max_size: int) -> bytes:
+    """Decode a Content-Encoding, refusing output larger than max_size"""
+    if encoding in (None, "", "identity"):
+        return data
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd is not supported by this service")
+        # Bounded read: a frame header may declare any size
+        output = bytearray()
+        remaining = memoryview(bytes(data))
+        reader = None
+        while remaining and len(output) <= max_size:
+            if reader is None:
+                reader = zstandard.ZstdDecompressor().decompressobj()
+            feed, remaining = remaining[:_ZSTD_FEED_SIZE], remaining[_ZSTD_FEED_SIZE:]
+            output += reader.decompress(feed)
+            if reader.eof:
+                remaining = memoryview(reader.unused_data + bytes(remaining))
+                reader = None
+        if reader is not None and len(output) <= max_size:
+            raise TruncatedBody("zstd body ends before the end of its frame")
+        output = bytes(output)
+    elif encoding == "gzip":
+        reader = zlib.decompressobj(31)
+        output = reader.decompress(data, max_size + 1)
+        if len(output) <= max_size and not reader.eof:
+            raise TruncatedBody("gzip body ends before the end of its stream")
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    if len(output) > max_size:
+        raise DecompressedTooLarge(f"Decoded body exceeds {max_size} bytes")
+    return output
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETag of an encoded representation (it differs byte-wise from identity)"""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
@@ -0,0 +1,57 @@
+"""
+Framing of POST /chunks/batch-get responses: many chunks in one binary stream.
+
+Entries follow each other in request order. Each one is a fixed header
+
+    status   1 byte    STATUS_OK, STATUS_NOT_FOUND or STATUS_ERROR
+    id_len   2 bytes   big-endian length of the chunk ID
+    length   8 bytes   big-endian length of the payload
+
+followed by the UTF-8 chunk ID and the payload: the chunk's bytes when OK,
+nothing when not found, a UTF-8 error message otherwise.
+
+block-storage and chunker-service keep identical copies of this module.
+"""
+import struct
+from typing import AsyncIterator, Tuple
+
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1
+STATUS_ERROR = 2
+
+_HEADER = struct.Struct(">BHQ")
+
+
+def encode_header(chunk_id: str, status: int, length: int) -> bytes:
+    """Header and chunk ID of one entry; the payload follows it"""
+    encoded_id = chunk_id.encode("utf-8")
+    return _HEADER.pack(status, len(encoded_id), length) + encoded_id
+
+
+async def iter_entries(pieces: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, int, bytes]]:
+    """Decode a framed stream into (chunk_id, status, payload) entries as they arrive"""
+    buffer = bytearray()
+    pieces = pieces.__aiter__()
+
+    async def fill(size: int):
+        while len(buffer) < size:
+            try:
+                buffer.extend(await pieces.__anext__())
+            except StopAsyncIteration:
+                raise ValueError("Truncated chunk batch stream") from None
+
+    while True:
+        if not buffer:
+            try:
+                buffer.extend(await pieces.__anext__())
+            except StopAsyncIteration:
+                return
+            continue
+        await fill(_HEADER.size)
+        status, id_len, length = _HEADER.unpack_from(buffer)
+        end = _HEADER.size + id_len + length
+        await fill(end)
+        chunk_id = buffer[_HEADER.size:_HEADER.size + id_len].decode("utf-8")
+        payload = bytes(buffer[_HEADER.size + id_len:end])
+        del buffer[:end]
+        yield chunk_id, status, payload
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Hedging configuration
+HEDGE_ENABLED = os.getenv("CHUNK_HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("CHUNK_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("CHUNK_HEDGE_MIN_DELAY", "0.05"))  # seconds
+HEDGE_MAX_DELAY = float(os.getenv("CHUNK_HEDGE_MAX_DELAY", "2.0"))  # seconds
+HEDGE_MIN_SAMPLES = int(os.getenv("CHUNK_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("CHUNK_HEDGE_WINDOW", "512"))
+HEDGE_BUDGET_RATIO = float(os.getenv("CHUNK_HEDGE_BUDGET_RATIO", "0.1"))  # hedges per primary request
+HEDGE_BUDGET_BURST = float(os.getenv("CHUNK_HEDGE_BUDGET_BURST", "10"))
+
+
+class LatencyTracker:
+    """Rolling window of recent request latencies"""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the latency at the given percentile, or None without enough data"""
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Token bucket that caps hedged requests to a fraction of primary requests.
+
+    Every primary request deposits `ratio` tokens (up to `burst`), every hedge
+    spends one, so a slow dependency can never see more than (1 + ratio) times
+    its normal load from hedging.
+    """
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def on_request(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class Hedger:
+    """Issues a backup request when the primary is slower than the tracked percentile"""
+
+    def __init__(self, enabled: bool = HEDGE_ENABLED, percentile: float = HEDGE_PERCENTILE):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.tracker = LatencyTracker()
+        self.budget = HedgeBudget()
+        self.stats = {
+            "requests": 0,
+            "hedges_issued": 0,
+            "hedges_won": 0,
+            "hedges_denied": 0,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedge is sent, or None while the tracker is warming up"""
+        threshold = self.tracker.percentile(self.percentile)
+        if threshold is None:
+            return None
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, threshold))
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `request` and, if it exceeds the hedge delay, race a second copy of it.
+        The first successful result wins and the loser is cancelled.
+        """
+        self.stats["requests"] += 1
+        self.budget.on_request()
+        start = time.monotonic()
+
+        delay = self.hedge_delay() if self.enabled else None
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
+
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+
+            if delay is None or primary.done():
+                result = await primary
+                self.tracker.record(time.monotonic() - start)
+                return result
+
+            if not self.budget.try_spend():
+                self.stats["hedges_denied"] += 1
+                result = await primary
+                self.tracker.record(time.monotonic() - start)
+                return result
+
+            self.stats["hedges_issued"] += 1
+            logger.debug(f"🐢 Primary request exceeded {delay:.3f}s, issuing hedged request")
+            hedge = asyncio.ensure_future(request())
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            last_error = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    if task is hedge:
+                        self.stats["hedges_won"] += 1
+                    self.tracker.record(time.monotonic() - start)
+                    return task.result()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def snapshot(self) -> dict:
+        """Current hedging counters for the stats endpoint"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "current_delay": self.hedge_delay(),
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
+
+
+# Shared hedger for chunk downloads from block storage
+chunk_hedger = Hedger()
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+import hashlib
+
+# Files change with new versions and are per-user, so caches must always revalidate
+FILE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(digest: str) -> str:
+    """Wrap a digest as a strong ETag"""
+    return f'"{digest.strip(chr(34))}"'
+
+
+def file_version_etag(file_info: Dict[str, Any]) -> str:
+    """
+    Strong ETag for a file version: a digest over the file ID, version number,
+    size and ordered chunk IDs (chunk IDs embed their content hash).
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(file_info.get("file_id", "")).encode())
+    hasher.update(f"|v{file_info.get('version', 0)}|{file_info.get('file_size', 0)}|".encode())
+    for chunk_id in file_info.get("chunk_ids", []):
+        hasher.update(chunk_id.encode())
+        hasher.update(b"\n")
+    return make_etag(hasher.hexdigest())
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO-8601 timestamp from metadata-service"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def format_http_date(value: datetime) -> str:
+    """Format a datetime as an RFC 7231 HTTP-date"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as required for If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def is_not_modified(headers: Mapping[str, str], etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since for a GET or HEAD.
+    If-None-Match takes precedence when both are present (RFC 7232 section 6).
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
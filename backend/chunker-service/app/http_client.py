@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+from . import deadline
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration for calls to other services
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "5.0"))  # when a call passes none
+# HTTP/2 is negotiated over TLS only and needs the optional `h2` package (httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED and _http2_available()
+    if HTTP2_ENABLED and not http2:
+        logger.warning("⚠️ HTTP2_ENABLED is set but the h2 package is missing, using HTTP/1.1")
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=HTTP_DEFAULT_TIMEOUT,
+        http2=http2,
+        event_hooks={"request": [deadline.apply_to_request]},  # forward and honour X-Request-Timeout
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Process-wide pooled client; created lazily if startup has not run (scripts, tests)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def startup():
+    """Open the shared client when the app starts"""
+    get_client()
+    logger.info(
+        f"🔌 HTTP pool ready: max_connections={HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={HTTP_MAX_KEEPALIVE_CONNECTIONS}/{HTTP_KEEPALIVE_EXPIRY}s, http2={HTTP2_ENABLED and _http2_available()}"
+    )
+
+
+async def shutdown():
+    """Close pooled connections when the app stops"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def pool_settings() -> dict:
+    """Pool configuration for the stats endpoint"""
+    return {
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+        "http2": HTTP2_ENABLED and _http2_available(),
+        "open": _client is not None and not _client.is_closed,
+    }
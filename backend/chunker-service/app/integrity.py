@@ -0,0 +1,41 @@
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Integrity verification configuration
+CHUNK_INTEGRITY_VERIFY = os.getenv("CHUNK_INTEGRITY_VERIFY", "true").lower() == "true"
+CHUNK_INTEGRITY_RETRIES = int(os.getenv("CHUNK_INTEGRITY_RETRIES", "2"))  # re-fetches after a mismatch
+CHUNK_HASH_WORKERS = int(os.getenv("CHUNK_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# hashlib releases the GIL on large buffers, so hashing in threads overlaps with network I/O
+_hash_executor = ThreadPoolExecutor(max_workers=CHUNK_HASH_WORKERS, thread_name_prefix="chunk-hash")
+
+stats = {
+    "verified": 0,
+    "mismatches": 0,
+    "recovered": 0,
+    "failed": 0,
+}
+
+
+class ChunkIntegrityError(Exception):
+    """A chunk kept failing digest verification"""
+
+
+async def sha256_hex(data: bytes) -> str:
+    """SHA-256 of data, computed on the hashing executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, lambda: hashlib.sha256(data).hexdigest())
+
+
+def snapshot() -> dict:
+    """Current verification counters for the stats endpoint"""
+    return {
+        **stats,
+        "enabled": CHUNK_INTEGRITY_VERIFY,
+        "hash_workers": CHUNK_HASH_WORKERS,
+    }
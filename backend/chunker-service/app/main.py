@@ -1,20 +1,34 @@
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from pydantic import BaseModel, Field, constr
+from typing import List, Optional
 import logging
-from io import BytesIO
 import asyncio
 import hashlib
 import httpx
 import os
-from . import services
-from .auth import get_current_user
+import time
+import uuid
+from . import services, archive, http_client, integrity, resilience, deadline
+from .auth import get_current_user, require_service_caller
+from .hedging import chunk_hedger
+from .manifest_cache import manifest_cache
+from .http_cache import FILE_CACHE_CONTROL, file_version_etag, format_http_date, is_not_modified, parse_timestamp
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunking configuration
+DEFAULT_CHUNK_SIZE = int(os.getenv("DEFAULT_CHUNK_SIZE", "4194304"))
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "1073741824"))
+MIN_DIRECT_CHUNK_SIZE = 64 * 1024
+MAX_DIRECT_CHUNK_SIZE = 64 * 1024 * 1024
+DOWNLOAD_PREFETCH = int(os.getenv("DOWNLOAD_PREFETCH", "4"))  # chunks in flight per download
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "5000"))
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", "8"))  # files of a batch uploaded at once
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Chunker Service API",
@@ -22,6 +36,9 @@ app = FastAPI(
     description="Service for chunking large files and orchestrating uploads"
 )
 
+# Enforce X-Request-Timeout deadlines (added first so CORS headers still wrap its 504s)
+app.add_middleware(deadline.DeadlineMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,10 +48,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    """Open the pooled HTTP client shared by all inter-service calls"""
+    await http_client.startup()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled connections"""
+    await http_client.shutdown()
+
+@app.exception_handler(resilience.DependencyUnavailable)
+async def dependency_unavailable_handler(request: Request, exc: resilience.DependencyUnavailable):
+    """Fail fast with 503 while a downstream circuit is open or its bulkhead is full"""
+    logger.warning(f"⛔ {request.method} {request.url.path} refused: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "dependency": exc.downstream},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: deadline.DeadlineExceeded):
+    """The caller's deadline ran out before a downstream call could be made"""
+    logger.warning(f"⏰ {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "chunker-service"}
+    """Health check endpoint, including circuit breaker and bulkhead state per dependency"""
+    return {
+        "status": "degraded" if resilience.degraded() else "healthy",
+        "service": "chunker-service",
+        "dependencies": resilience.snapshot()
+    }
 
 @app.options("/health")
 async def health_check_options():
@@ -98,10 +145,65 @@ async def upload_file(
             "owner": user_email  # ✅ Return owner info
         }
         
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@app.post("/upload/batch")
+async def upload_file_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload many files in one multipart request (repeated "files" field).
+    File records are created in one metadata batch; chunks are uploaded in the
+    background, then registered, versioned and synced once for the whole batch.
+    """
+    user_id = current_user.get("sub")
+    user_email = current_user.get("email")
+    auth_header = request.headers.get("Authorization")
+    
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    
+    # Parts are spooled to temporary files while the body streams in
+    form = await request.form(max_files=UPLOAD_BATCH_MAX_FILES, max_fields=UPLOAD_BATCH_MAX_FILES)
+    files = [value for value in form.getlist("files") if not isinstance(value, str)]
+    if not files:
+        await form.close()
+        raise HTTPException(status_code=400, detail="No files in request (expected one or more \"files\" parts)")
+    oversized = [f.filename for f in files if f.size is not None and f.size > MAX_FILE_SIZE]
+    if oversized:
+        await form.close()
+        raise HTTPException(status_code=413, detail={"message": f"Files larger than {MAX_FILE_SIZE} bytes", "files": oversized})
+    
+    logger.info(f"User {user_id} ({user_email}) uploading batch of {len(files)} files")
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    
+    try:
+        created = await service_integration.create_files_metadata([f.filename for f in files])
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        await form.close()
+        raise
+    except Exception as e:
+        await form.close()
+        logger.error(f"Batch upload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    
+    file_ids = [entry["file_id"] for entry in created]
+    background_tasks.add_task(process_file_batch, files, file_ids, user_id, auth_header)
+    
+    return {
+        "message": "Batch upload initiated",
+        "status": "processing",
+        "count": len(files),
+        "files": created,
+        "owner": user_email
+    }
+
 @app.get("/download/{file_id}")
 async def download_file(
     file_id: str, 
@@ -126,9 +228,11 @@ async def download_file(
         logger.info("📊 Step 1: Getting file metadata...")
         metadata_start = asyncio.get_event_loop().time()
         try:
-            file_info = await service_integration.get_file_download_info(file_id)
+            file_info = await service_integration.get_file_download_info(file_id, user_id)
             metadata_end = asyncio.get_event_loop().time()
             logger.info(f"✅ Metadata retrieved in {metadata_end - metadata_start:.2f}s: {file_info.get('filename', 'unknown')}")
+        except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"❌ Failed to get file metadata: {e}")
             raise HTTPException(status_code=404, detail="File not found or inaccessible")
@@ -136,64 +240,446 @@ async def download_file(
         filename = file_info.get("filename", f"file_{file_id}")
         chunk_ids = file_info.get("chunk_ids", [])
         
+        # Revalidation: answer 304 before touching block storage
+        etag = file_version_etag(file_info)
+        last_modified = parse_timestamp(file_info.get("last_modified"))
+        validator_headers = {"ETag": etag, "Cache-Control": FILE_CACHE_CONTROL}
+        if last_modified:
+            validator_headers["Last-Modified"] = format_http_date(last_modified)
+        if is_not_modified(request.headers, etag, last_modified):
+            logger.info(f"✅ File {file_id} not modified, answering 304")
+            return Response(status_code=304, headers=validator_headers)
+        
         if not chunk_ids:
             logger.warning(f"❌ No chunks found for file {file_id}")
             raise HTTPException(status_code=404, detail="No file chunks found")
         
-        logger.info(f"🔥 Step 2: Starting download of {len(chunk_ids)} chunks for {filename}")
+        logger.info(f"🔥 Step 2: Streaming {len(chunk_ids)} chunks for {filename}")
+        
+        # Step 2: Stream chunks in order; each is SHA-256 verified while later ones download
+        digests = file_info.get("chunk_digests") or None
+        chunk_sizes = file_info.get("chunk_sizes") or []
+        chunks = service_integration.iter_chunks(chunk_ids, prefetch=DOWNLOAD_PREFETCH, digests=digests)
         
-        # Step 2: Download chunks concurrently
+        # Wait for the first chunk so early failures still get a proper status code
         download_start = asyncio.get_event_loop().time()
         try:
-            file_chunks = await service_integration.download_chunks_concurrently(chunk_ids)
-            download_end = asyncio.get_event_loop().time()
-            logger.info(f"✅ Chunks downloaded in {download_end - download_start:.2f}s")
+            first_chunk = await chunks.__anext__()
+            first_chunk_at = asyncio.get_event_loop().time()
         except Exception as e:
+            await chunks.aclose()
+            if isinstance(e, (resilience.DependencyUnavailable, deadline.DeadlineExceeded)):
+                raise
             logger.error(f"❌ Failed to download chunks: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to download chunks: {str(e)}")
         
-        # Step 3: Combine chunks
-        logger.info("🔧 Step 3: Combining chunks...")
-        assembly_start = asyncio.get_event_loop().time()
-        complete_file_data = b''.join(file_chunks)
-        total_size = len(complete_file_data)
-        assembly_end = asyncio.get_event_loop().time()
-        logger.info(f"✅ File assembled in {assembly_end - assembly_start:.2f}s")
-        
-        overall_end = asyncio.get_event_loop().time()
-        total_time = overall_end - overall_start
-        
-        logger.info(f"🎉 DOWNLOAD COMPLETE: {total_size} bytes in {total_time:.2f} seconds")
-        logger.info(f"📊 Overall speed: {total_size / (1024*1024) / total_time:.2f} MB/s")
-        logger.info(f"⏱️ Breakdown: Metadata={metadata_end-metadata_start:.2f}s, Download={download_end-download_start:.2f}s, Assembly={assembly_end-assembly_start:.2f}s")
-        
-        # 🚀 CRITICAL FIX: Create BytesIO stream for the complete file with CORRECT headers
-        file_stream = BytesIO(complete_file_data)
-        
-        # 📊 FIXED: Ensure Content-Length matches actual data size
         headers = {
             "Content-Disposition": f'attachment; filename="{filename}"',
             "Content-Type": "application/octet-stream",
-            "Content-Length": str(total_size),  # CRITICAL: This MUST match the actual data size
-            "Cache-Control": "no-cache"  # Prevent caching issues
+            **validator_headers  # Clients revalidate with If-None-Match instead of re-downloading
         }
+        # 📊 Content-Length only when every chunk size is recorded; it MUST match the streamed bytes
+        if len(chunk_sizes) == len(chunk_ids) and all(size is not None for size in chunk_sizes):
+            headers["Content-Length"] = str(sum(chunk_sizes))
         
-        logger.info(f"🎯 Response headers: Content-Length={total_size}, filename={filename}")
+        async def stream_file():
+            total_size = len(first_chunk)
+            try:
+                yield first_chunk
+                async for data in chunks:
+                    total_size += len(data)
+                    yield data
+            except Exception as e:
+                # Headers are already sent: abort the body so the client sees a truncated transfer
+                logger.error(f"❌ Download of {file_id} aborted after {total_size} bytes: {e}")
+                raise
+            finally:
+                await chunks.aclose()
+            
+            total_time = asyncio.get_event_loop().time() - overall_start
+            logger.info(f"🎉 DOWNLOAD COMPLETE: {total_size} bytes in {total_time:.2f} seconds")
+            logger.info(f"📊 Overall speed: {total_size / (1024*1024) / max(total_time, 1e-6):.2f} MB/s")
+            logger.info(f"⏱️ Breakdown: Metadata={metadata_end-metadata_start:.2f}s, First chunk={first_chunk_at-download_start:.2f}s")
+        
+        logger.info(f"🎯 Response headers: Content-Length={headers.get('Content-Length', 'chunked')}, filename={filename}")
         
         return StreamingResponse(
-            file_stream,
+            stream_file(),
             media_type="application/octet-stream",
             headers=headers
         )
         
     except HTTPException:
         raise
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"❌ Download failed for file {file_id}: {e}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
 
+@app.get("/download/{file_id}/manifest")
+async def download_manifest(
+    file_id: str,
+    request: Request,
+    expires_in: int = 900,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Direct download mode: return presigned object-storage URLs for every chunk
+    so the client fetches bytes straight from MinIO instead of through this service
+    """
+    user_id = current_user.get("sub")
+    auth_header = request.headers.get("Authorization")
+    
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    
+    try:
+        file_info = await service_integration.get_file_download_info(file_id, user_id)
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"❌ Failed to get file metadata: {e}")
+        raise HTTPException(status_code=404, detail="File not found or inaccessible")
+    
+    chunk_ids = file_info.get("chunk_ids", [])
+    digests = file_info.get("chunk_digests") or [None] * len(chunk_ids)
+    sizes = file_info.get("chunk_sizes") or [None] * len(chunk_ids)
+    try:
+        presigned = await service_integration.presign_chunks(chunk_ids, "GET", expires_in)
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to presign chunks: {str(e)}")
+    
+    logger.info(f"🔗 User {user_id} got direct download manifest for {file_id} ({len(chunk_ids)} chunks)")
+    
+    return {
+        "file_id": file_id,
+        "filename": file_info.get("filename", f"file_{file_id}"),
+        "file_size": file_info.get("file_size", 0),
+        "version": file_info.get("version", 0),
+        "etag": file_version_etag(file_info),
+        "expires_in": presigned["expires_in"],
+        "expires_at": int(time.time()) + presigned["expires_in"],
+        "chunks": [
+            {
+                "index": index,
+                "chunk_id": chunk_id,
+                "size": sizes[index],
+                "sha256": digests[index],
+                "url": presigned["urls"][chunk_id]
+            }
+            for index, chunk_id in enumerate(chunk_ids)
+        ]
+    }
+
+@app.options("/download/{file_id}/manifest")
+async def download_manifest_options(file_id: str):
+    """Handle OPTIONS preflight for download manifest endpoint"""
+    return {"message": "OK"}
+
+class ManifestInvalidation(BaseModel):
+    """Change notification published by metadata-service"""
+    file_id: str
+    event: str = "change"   # "version", "chunk", "update", "delete" or "share"
+    version: Optional[int] = None
+
+@app.post("/internal/manifest-invalidations", dependencies=[Depends(require_service_caller)])
+async def invalidate_manifest(invalidation: ManifestInvalidation):
+    """Drop the cached download manifest for a file after metadata changed"""
+    removed = manifest_cache.invalidate(invalidation.file_id, invalidation.event)
+    logger.info(f"🧹 Manifest invalidated for {invalidation.file_id} ({invalidation.event}, cached={removed})")
+    return {"file_id": invalidation.file_id, "invalidated": removed}
+
+class DirectUploadRequest(BaseModel):
+    """Start a direct-to-storage upload"""
+    filename: str
+    file_size: int
+    chunk_size: Optional[int] = None
+    chunk_hashes: Optional[List[constr(pattern="^[0-9a-f]{32}$")]] = None  # MD5 hex per chunk, used in chunk IDs when given
+    expires_in: int = 3600
+
+class DirectUploadChunk(BaseModel):
+    index: int
+    chunk_id: str
+    digest: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")  # SHA-256 hex, recorded in the Merkle tree
+
+class DirectUploadCommit(BaseModel):
+    """Finish a direct-to-storage upload"""
+    file_size: int
+    chunks: List[DirectUploadChunk]
+
+@app.post("/upload/direct")
+async def start_direct_upload(
+    upload_request: DirectUploadRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Direct upload mode: create the file record and hand out presigned PUT URLs,
+    one per chunk slot, so chunk bytes go straight to object storage
+    """
+    user_id = current_user.get("sub")
+    user_email = current_user.get("email")
+    auth_header = request.headers.get("Authorization")
+    
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    
+    chunk_size = upload_request.chunk_size or DEFAULT_CHUNK_SIZE
+    if upload_request.file_size < 0 or upload_request.file_size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"file_size must be between 0 and {MAX_FILE_SIZE}")
+    if not MIN_DIRECT_CHUNK_SIZE <= chunk_size <= MAX_DIRECT_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between {MIN_DIRECT_CHUNK_SIZE} and {MAX_DIRECT_CHUNK_SIZE}")
+    
+    total_chunks = (upload_request.file_size + chunk_size - 1) // chunk_size
+    hashes = upload_request.chunk_hashes
+    if hashes is not None and len(hashes) != total_chunks:
+        raise HTTPException(status_code=400, detail=f"Expected {total_chunks} chunk hashes, got {len(hashes)}")
+    
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    
+    try:
+        file_metadata = await service_integration.create_file_metadata(
+            filename=upload_request.filename,
+            owner_user_id=user_id,
+            owner_email=user_email
+        )
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"Direct upload init failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    file_id = file_metadata["file_id"]
+    
+    chunk_ids = [
+        f"{user_id}_{file_id}_chunk_{index}_{(hashes[index][:8] if hashes else uuid.uuid4().hex[:8])}"
+        for index in range(total_chunks)
+    ]
+    try:
+        presigned = await service_integration.presign_chunks(chunk_ids, "PUT", upload_request.expires_in)
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to presign chunks: {str(e)}")
+    
+    logger.info(f"🔗 User {user_id} started direct upload of {upload_request.filename} as {file_id} ({total_chunks} chunks)")
+    
+    return {
+        "file_id": file_id,
+        "filename": upload_request.filename,
+        "chunk_size": chunk_size,
+        "expires_in": presigned["expires_in"],
+        "chunks": [
+            {
+                "index": index,
+                "chunk_id": chunk_id,
+                "offset": index * chunk_size,
+                "size": min(chunk_size, upload_request.file_size - index * chunk_size),
+                "url": presigned["urls"][chunk_id]
+            }
+            for index, chunk_id in enumerate(chunk_ids)
+        ],
+        "commit_url": f"/upload/direct/{file_id}/commit"
+    }
+
+@app.post("/upload/direct/{file_id}/commit")
+async def commit_direct_upload(
+    file_id: str,
+    commit: DirectUploadCommit,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Verify directly uploaded chunks exist in storage, then register them in metadata"""
+    user_id = current_user.get("sub")
+    auth_header = request.headers.get("Authorization")
+    
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    
+    chunks = sorted(commit.chunks, key=lambda c: c.index)
+    if [c.index for c in chunks] != list(range(len(chunks))):
+        raise HTTPException(status_code=400, detail="Chunk indexes must be contiguous from 0")
+    for chunk in chunks:
+        if not chunk.chunk_id.startswith(f"{user_id}_{file_id}_chunk_{chunk.index}_"):
+            raise HTTPException(status_code=400, detail=f"Chunk {chunk.chunk_id} does not belong to this upload")
+    
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    
+    # The file must exist, be writable by this user and not be committed yet
+    try:
+        file_info = await service_integration.get_file_metadata(file_id)
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"❌ Direct upload commit for unknown file {file_id}: {e}")
+        raise HTTPException(status_code=404, detail="File not found or inaccessible")
+    if file_info.get("chunks") or file_info.get("versions"):
+        raise HTTPException(status_code=409, detail="File already committed")
+    
+    # Verify every object landed in storage (stat only, no bytes are read)
+    try:
+        stats = await service_integration.stat_chunks([c.chunk_id for c in chunks])
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to verify chunks: {str(e)}")
+    
+    missing = [c.chunk_id for c in chunks if not stats.get(c.chunk_id, {}).get("exists")]
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Chunks missing from storage", "missing": missing})
+    
+    stored_size = sum(stats[c.chunk_id]["size"] for c in chunks)
+    if stored_size != commit.file_size:
+        raise HTTPException(status_code=400, detail=f"Stored chunks total {stored_size} bytes, expected {commit.file_size}")
+    
+    # Register chunks, size and the first version in one metadata transaction;
+    # new_file makes a concurrent or repeated commit fail instead of adding a second copy
+    entry = {
+        "file_id": file_id,
+        "file_size": commit.file_size,
+        "storage_path": f"version_1_{file_id}",
+        "new_file": True,
+        "chunks": [
+            {
+                "chunk_index": chunk.index,
+                "storage_path": chunk.chunk_id,
+                "digest": chunk.digest,
+                "size": stats[chunk.chunk_id]["size"]
+            }
+            for chunk in chunks
+        ]
+    }
+    try:
+        await service_integration.commit_file_batch([entry])
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 409:
+            raise HTTPException(status_code=409, detail="File already committed")
+        logger.error(f"Direct upload commit failed for {file_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Commit failed: {str(e)}")
+    except Exception as e:
+        logger.error(f"Direct upload commit failed for {file_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Commit failed: {str(e)}")
+    
+    try:
+        sync_result = await service_integration.trigger_sync_event(file_id, "upload")
+        logger.info(f"Sync event triggered: {sync_result}")
+    except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to trigger sync event (non-critical): {e}")
+    
+    logger.info(f"✅ Direct upload committed: {file_id} ({len(chunks)} chunks, {commit.file_size} bytes)")
+    
+    return {
+        "message": "File upload completed",
+        "file_id": file_id,
+        "status": "completed",
+        "chunks": len(chunks),
+        "file_size": commit.file_size
+    }
+
+@app.options("/upload/direct")
+async def direct_upload_options():
+    """Handle OPTIONS preflight for direct upload endpoint"""
+    return {"message": "OK"}
+
+@app.options("/upload/direct/{file_id}/commit")
+async def direct_upload_commit_options(file_id: str):
+    """Handle OPTIONS preflight for direct upload commit endpoint"""
+    return {"message": "OK"}
+
+class ArchiveRequest(BaseModel):
+    """Files to bundle into a single streamed archive"""
+    file_ids: List[str]
+    format: str = "zip"          # "zip" or "tar"
+    compression: str = "store"   # "store" or "deflate" (zip only)
+
+@app.post("/archive")
+async def download_archive(
+    archive_request: ArchiveRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream many files as one ZIP or TAR archive without buffering it in memory"""
+    user_id = current_user.get("sub")
+    auth_header = request.headers.get("Authorization")
+    
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    
+    file_ids = archive_request.file_ids
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="file_ids must not be empty")
+    if len(file_ids) > archive.ARCHIVE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {archive.ARCHIVE_MAX_FILES} files per archive")
+    if archive_request.format not in archive.ARCHIVE_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'zip' or 'tar'")
+    if archive_request.compression not in archive.ZIP_COMPRESSION:
+        raise HTTPException(status_code=400, detail="compression must be 'store' or 'deflate'")
+    
+    logger.info(f"📦 ARCHIVE START: User {user_id} bundling {len(file_ids)} files as {archive_request.format}")
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    
+    # Resolve every manifest before streaming so access errors surface as proper status codes
+    semaphore = asyncio.Semaphore(archive.ARCHIVE_MANIFEST_CONCURRENCY)
+    
+    async def resolve(file_id: str) -> dict:
+        async with semaphore:
+            try:
+                return await service_integration.get_file_download_info(file_id, user_id)
+            except (resilience.DependencyUnavailable, deadline.DeadlineExceeded):
+                raise
+            except Exception as e:
+                logger.error(f"❌ Failed to get file metadata for {file_id}: {e}")
+                raise HTTPException(status_code=404, detail=f"File not found or inaccessible: {file_id}")
+    
+    manifests = await asyncio.gather(*[resolve(file_id) for file_id in file_ids])
+    names = archive.unique_entry_names([m.get("filename", f"file_{m.get('file_id')}") for m in manifests])
+    entries = [
+        archive.ArchiveEntry(
+            name=name,
+            chunk_ids=manifest.get("chunk_ids", []),
+            size=manifest.get("file_size") or (0 if not manifest.get("chunk_ids") else None),
+        )
+        for name, manifest in zip(names, manifests)
+    ]
+    
+    digest_by_chunk = {
+        chunk_id: digest
+        for manifest in manifests
+        for chunk_id, digest in zip(manifest.get("chunk_ids", []), manifest.get("chunk_digests") or [])
+    }
+    
+    def chunk_source(chunk_ids: List[str]):
+        return service_integration.iter_chunks(
+            chunk_ids,
+            prefetch=archive.ARCHIVE_PREFETCH,
+            digests=[digest_by_chunk.get(chunk_id) for chunk_id in chunk_ids]
+        )
+    
+    if archive_request.format == "zip":
+        body = archive.stream_zip(entries, chunk_source, archive_request.compression)
+    else:
+        body = archive.stream_tar(entries, chunk_source)
+    
+    archive_name = f"archive-{int(time.time())}.{archive_request.format}"
+    return StreamingResponse(
+        body,
+        media_type=archive.ARCHIVE_FORMATS[archive_request.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{archive_name}"',
+            "Cache-Control": "no-cache"
+        }
+    )
+
 async def process_file_chunks(
     file: UploadFile, 
     file_id: str, 
@@ -223,15 +709,16 @@ async def process_file_chunks(
             end = min(start + chunk_size, len(content))
             chunk_data = content[start:end]
             
-            # Create chunk hash for unique ID
+            # Create chunk hash for unique ID; the full SHA-256 feeds the file's Merkle tree
             chunk_hash = hashlib.md5(chunk_data).hexdigest()
+            chunk_digest = await integrity.sha256_hex(chunk_data)
             chunk_id = f"{user_id}_{file_id}_chunk_{chunk_index}_{chunk_hash[:8]}"
             
             # Upload chunk to block storage with auth
             await service_integration.upload_chunk_with_auth(chunk_id, chunk_data, auth_header)
             
             # Register chunk in metadata service
-            await service_integration.create_chunk_metadata(file_id, chunk_index, chunk_id)
+            await service_integration.create_chunk_metadata(file_id, chunk_index, chunk_id, chunk_digest, len(chunk_data))
             
             logger.info(f"Successfully processed chunk {chunk_index}")
         
@@ -254,16 +741,83 @@ async def process_file_chunks(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+async def process_file_batch(
+    files: List[UploadFile],
+    file_ids: List[str],
+    user_id: str,
+    auth_header: str
+):
+    """Upload the chunks of every file in a batch, then commit and sync them together"""
+    service_integration = services.ServiceIntegration(auth_token=auth_header.replace("Bearer ", ""))
+    semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+    
+    async def upload_one(file: UploadFile, file_id: str) -> dict:
+        async with semaphore:
+            chunks = []
+            file_size = 0
+            while True:
+                chunk_data = await file.read(DEFAULT_CHUNK_SIZE)
+                if not chunk_data:
+                    break
+                chunk_index = len(chunks)
+                chunk_hash = hashlib.md5(chunk_data).hexdigest()
+                chunk_id = f"{user_id}_{file_id}_chunk_{chunk_index}_{chunk_hash[:8]}"
+                await service_integration.upload_chunk_with_auth(chunk_id, chunk_data, auth_header)
+                chunks.append({
+                    "chunk_index": chunk_index,
+                    "storage_path": chunk_id,
+                    "digest": await integrity.sha256_hex(chunk_data),
+                    "size": len(chunk_data)
+                })
+                file_size += len(chunk_data)
+            return {"file_id": file_id, "file_size": file_size, "storage_path": f"version_1_{file_id}", "chunks": chunks}
+    
+    try:
+        results = await asyncio.gather(
+            *[upload_one(file, file_id) for file, file_id in zip(files, file_ids)],
+            return_exceptions=True
+        )
+        entries = []
+        for file, file_id, result in zip(files, file_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Batch upload of {file.filename} ({file_id}) failed: {result}")
+            else:
+                entries.append(result)
+        
+        if entries:
+            await service_integration.commit_file_batch(entries)
+            event_ids = await service_integration.trigger_sync_events([e["file_id"] for e in entries], "upload")
+            logger.info(f"Sync events triggered: {len(event_ids)}")
+        logger.info(f"✅ Batch upload finished: {len(entries)} of {len(files)} files stored")
+        
+    except Exception as e:
+        logger.error(f"Error processing file batch: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+    finally:
+        for file in files:
+            await file.close()
+
 @app.options("/upload")
 async def upload_options():
     """Handle OPTIONS preflight for upload endpoint"""
     return {"message": "OK"}
 
+@app.options("/upload/batch")
+async def upload_batch_options():
+    """Handle OPTIONS preflight for batch upload endpoint"""
+    return {"message": "OK"}
+
 @app.options("/download/{file_id}")
 async def download_options(file_id: str):
     """Handle OPTIONS preflight for download endpoint"""
     return {"message": "OK"}
 
+@app.options("/archive")
+async def archive_options():
+    """Handle OPTIONS preflight for archive endpoint"""
+    return {"message": "OK"}
+
 @app.get("/files/{file_id}/status")
 async def get_file_status(
     file_id: str,
@@ -283,6 +837,10 @@ async def get_stats(current_user: dict = Depends(get_current_user)):
         "service": "chunker-service",
         "chunk_size": 4194304,
         "max_file_size": 1073741824,
+        "hedging": chunk_hedger.snapshot(),
+        "manifest_cache": manifest_cache.snapshot(),
+        "integrity": integrity.snapshot(),
+        "http_pool": http_client.pool_settings(),
         "user": current_user.get("sub")
     }
 
@@ -0,0 +1,114 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Manifest cache configuration
+MANIFEST_CACHE_ENABLED = os.getenv("MANIFEST_CACHE_ENABLED", "true").lower() == "true"
+MANIFEST_CACHE_TTL = float(os.getenv("MANIFEST_CACHE_TTL", "300"))  # seconds, safety net for lost invalidations
+MANIFEST_CACHE_MAX_ENTRIES = int(os.getenv("MANIFEST_CACHE_MAX_ENTRIES", "10000"))
+
+
+class ManifestCache:
+    """
+    In-process cache of metadata-service download-info responses.
+
+    Entries are keyed by file ID and remember the version they describe plus
+    the users metadata-service has already authorized for that version. A user
+    who is not in that set always goes back to metadata-service, so the cache
+    never grants access that metadata-service has not granted itself.
+    """
+
+    def __init__(self, enabled: bool = MANIFEST_CACHE_ENABLED, ttl: float = MANIFEST_CACHE_TTL,
+                 max_entries: int = MANIFEST_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # file_id -> monotonic time of the last invalidation, used to drop fills that raced it
+        self._invalidated_at: Dict[str, float] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "stale_fills_dropped": 0,
+        }
+
+    def get(self, file_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cached manifest for this user, or None when metadata-service must be asked"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(file_id)
+        if entry is None or entry["expires_at"] <= time.monotonic():
+            if entry is not None:
+                del self._entries[file_id]
+            self.stats["misses"] += 1
+            return None
+        if user_id not in entry["users"]:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(file_id)
+        self.stats["hits"] += 1
+        return entry["manifest"]
+
+    def begin_fill(self) -> float:
+        """Timestamp to pass back to `put` once the metadata call returns"""
+        return time.monotonic()
+
+    def put(self, file_id: str, user_id: str, manifest: Dict[str, Any], started_at: float):
+        """Store a manifest metadata-service returned for `user_id`"""
+        if not self.enabled:
+            return
+        if self._invalidated_at.get(file_id, float("-inf")) >= started_at:
+            # An invalidation arrived while the metadata call was in flight
+            self.stats["stale_fills_dropped"] += 1
+            return
+
+        version = manifest.get("version")
+        entry = self._entries.get(file_id)
+        if entry is not None and entry["version"] == version:
+            entry["users"].add(user_id)
+            entry["manifest"] = manifest
+            self._entries.move_to_end(file_id)
+            return
+
+        self._entries[file_id] = {
+            "version": version,
+            "manifest": manifest,
+            "users": {user_id},
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        self._entries.move_to_end(file_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, file_id: str, event: str = "change") -> bool:
+        """Drop the cached manifest for a file; returns whether one was cached"""
+        now = time.monotonic()
+        self._invalidated_at[file_id] = now
+        self.stats["invalidations"] += 1
+
+        # Only fills started after the last TTL window can still be racing
+        if len(self._invalidated_at) > self.max_entries:
+            cutoff = now - self.ttl
+            self._invalidated_at = {k: v for k, v in self._invalidated_at.items() if v >= cutoff}
+
+        removed = self._entries.pop(file_id, None) is not None
+        logger.debug(f"🧹 Manifest cache invalidated for {file_id} ({event}, cached={removed})")
+        return removed
+
+    def snapshot(self) -> dict:
+        """Current cache counters for the stats endpoint"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+        }
+
+
+# Shared cache for download manifests
+manifest_cache = ManifestCache()
@@ -0,0 +1,250 @@
+"""
+Circuit breakers and bulkheads for calls to other services.
+
+Each downstream gets its own breaker and concurrency limit, so a slow or failing
+dependency makes its callers fail fast (503) instead of tying up the event loop
+and the shared connection pool for every request:
+
+- Bulkhead: at most `max_concurrent` calls in flight; a caller waits up to
+  BULKHEAD_MAX_WAIT for a slot, then fails with BulkheadFullError.
+- Circuit breaker: BREAKER_FAILURE_THRESHOLD consecutive failures (connection
+  errors, timeouts, 429/5xx answers) open the circuit. Calls then fail with
+  CircuitOpenError until BREAKER_RECOVERY_TIMEOUT has passed, after which a
+  trial call decides whether it closes again.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+import httpx
+
+from . import deadline
+from .http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "15"))  # seconds open before a trial call
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))  # trial calls allowed at once
+BULKHEAD_MAX_WAIT = float(os.getenv("BULKHEAD_MAX_WAIT", "0.5"))  # seconds to wait for a free slot
+
+downstreams: Dict[str, "Downstream"] = {}
+
+
+class DependencyUnavailable(Exception):
+    """A call was refused without reaching the downstream service"""
+
+    def __init__(self, downstream: str, reason: str, retry_after: float):
+        super().__init__(f"{downstream} unavailable: {reason}")
+        self.downstream = downstream
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitOpenError(DependencyUnavailable):
+    """The downstream's circuit is open"""
+
+
+class BulkheadFullError(DependencyUnavailable):
+    """Every slot for the downstream is taken"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT, half_open_calls: int = BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trials = 0
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.name, "circuit open", remaining)
+            self.state = self.HALF_OPEN
+            self._trials = 0
+            logger.info(f"🟡 Circuit for {self.name} half-open, allowing a trial call")
+        if self.state == self.HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                raise CircuitOpenError(self.name, "trial call in progress", self.recovery_timeout)
+            self._trials += 1
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            logger.info(f"🟢 Circuit for {self.name} closed again")
+            self.state = self.CLOSED
+        if self.state == self.CLOSED:
+            self.consecutive_failures = 0
+        # A late success of a call started before the circuit opened changes nothing
+
+    def record_failure(self):
+        if self.state == self.OPEN:
+            return
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(
+                f"🔴 Circuit for {self.name} opened after {self.consecutive_failures} consecutive failures, "
+                f"failing fast for {self.recovery_timeout:.0f}s"
+            )
+
+    def release_trial(self):
+        """A trial call ended without a verdict (cancelled, refused by the bulkhead, ...)"""
+        if self.state == self.HALF_OPEN and self._trials:
+            self._trials -= 1
+
+    def snapshot(self) -> dict:
+        retry_after = 0.0
+        if self.state == self.OPEN:
+            retry_after = max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(retry_after, 1),
+        }
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = BULKHEAD_MAX_WAIT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, f"all {self.max_concurrent} slots in use", self.max_wait)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class Downstream:
+    """
+    A service we call, with its own breaker, bulkhead and default timeout.
+    Limits can be overridden per service, e.g. BLOCK_STORAGE_MAX_CONCURRENT and
+    BLOCK_STORAGE_TIMEOUT for the downstream named "block-storage".
+    """
+
+    def __init__(self, name: str, max_concurrent: int, timeout: float):
+        prefix = name.upper().replace("-", "_")
+        self.name = name
+        self.timeout = float(os.getenv(f"{prefix}_TIMEOUT", str(timeout)))
+        self.breaker = CircuitBreaker(name)
+        self.bulkhead = Bulkhead(name, int(os.getenv(f"{prefix}_MAX_CONCURRENT", str(max_concurrent))))
+        downstreams[name] = self
+
+    @asynccontextmanager
+    async def _admit(self) -> AsyncIterator[None]:
+        self.breaker.before_call()
+        try:
+            async with self.bulkhead.slot():
+                yield
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+
+    def _record_transport_error(self):
+        # A timeout cut short by the caller's deadline says nothing about the downstream
+        if not deadline.expired():
+            self.breaker.record_failure()
+
+    def _record(self, status_code: int):
+        if status_code == 429 or status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        async with self._admit():
+            try:
+                response = await get_client().request(method, url, **kwargs)
+            except httpx.TransportError:
+                self._record_transport_error()
+                raise
+            self._record(response.status_code)
+            return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming request; the slot is held until the body has been consumed"""
+        kwargs.setdefault("timeout", self.timeout)
+        async with self._admit():
+            try:
+                async with get_client().stream(method, url, **kwargs) as response:
+                    self._record(response.status_code)
+                    yield response
+            except httpx.TransportError:
+                self._record_transport_error()
+                raise
+
+    def snapshot(self) -> dict:
+        return {"timeout": self.timeout, **self.breaker.snapshot(), **self.bulkhead.snapshot()}
+
+
+def snapshot() -> Dict[str, dict]:
+    """Breaker and bulkhead state of every downstream, for health endpoints"""
+    return {name: downstream.snapshot() for name, downstream in downstreams.items()}
+
+
+def degraded() -> bool:
+    """True while any circuit is not closed"""
+    return any(d.breaker.state != CircuitBreaker.CLOSED for d in downstreams.values())
@@ -2,8 +2,13 @@ import httpx
 import logging
 import os
 import asyncio  # ✅ ADD: Missing import for asyncio
-from typing import Dict, Any, List
-from io import BytesIO
+from collections import deque
+from typing import Dict, Any, List, AsyncIterator, Optional
+from .hedging import chunk_hedger
+from . import compression, framing, integrity
+from .deadline import DeadlineExceeded
+from .resilience import DependencyUnavailable, Downstream
+from .manifest_cache import manifest_cache
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +18,19 @@ BLOCK_STORAGE_SERVICE_URL = os.getenv("BLOCK_STORAGE_SERVICE_URL", "http://block
 SYNC_SERVICE_URL = os.getenv("SYNC_SERVICE_URL", "http://sync-service:8000")
 INDEXER_SERVICE_URL = os.getenv("INDEXER_SERVICE_URL", "http://indexer-service:8004")
 
+# Circuit breaker and bulkhead per downstream; slots add up to the shared pool's HTTP_MAX_CONNECTIONS
+metadata_service = Downstream("metadata-service", max_concurrent=80, timeout=10.0)
+block_storage = Downstream("block-storage", max_concurrent=100, timeout=30.0)
+sync_service = Downstream("sync-service", max_concurrent=10, timeout=10.0)
+indexer_service = Downstream("indexer-service", max_concurrent=10, timeout=10.0)
+
+# Upper bound for a decoded chunk body (guards against compression bombs)
+MAX_DECODED_CHUNK_SIZE = int(os.getenv("MAX_DECODED_CHUNK_SIZE", str(64 * 1024 * 1024)))
+
+# Files with at least this many chunks are read with POST /chunks/batch-get, BATCH_GET_SIZE chunks per request (0 disables)
+BATCH_GET_MIN_CHUNKS = int(os.getenv("BATCH_GET_MIN_CHUNKS", "32"))
+BATCH_GET_SIZE = min(1000, int(os.getenv("BATCH_GET_SIZE", "64")))
+
 class ServiceIntegration:
     """Handles integration with other microservices"""
     
@@ -32,10 +50,9 @@ class ServiceIntegration:
     async def test_metadata_service(self) -> bool:
         """Test connection to metadata service"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{METADATA_SERVICE_URL}/health", timeout=10.0)
-                logger.info(f"Metadata service health check: {response.status_code}")
-                return response.status_code == 200
+            response = await metadata_service.get(f"{METADATA_SERVICE_URL}/health")
+            logger.info(f"Metadata service health check: {response.status_code}")
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"Metadata service test failed: {e}")
             raise
@@ -55,19 +72,19 @@ class ServiceIntegration:
                 }
                 logger.info(f"Request payload: {payload}")
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{METADATA_SERVICE_URL}/files",
-                        json=payload,
-                        headers=self.headers,
-                        timeout=30.0
-                    )
+                response = await metadata_service.post(
+                    f"{METADATA_SERVICE_URL}/files",
+                    json=payload,
+                    headers=self.headers
+                )
                     
-                    response.raise_for_status()
-                    result = response.json()
-                    logger.info(f"File metadata created successfully: {result}")
-                    return result
+                response.raise_for_status()
+                result = response.json()
+                logger.info(f"File metadata created successfully: {result}")
+                return result
                     
+            except (DependencyUnavailable, DeadlineExceeded):
+                raise  # Circuit open, bulkhead full or out of time: fail fast instead of retrying
             except httpx.ConnectError as e:
                 logger.warning(f"❌ Connection failed to metadata service (attempt {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
@@ -85,49 +102,73 @@ class ServiceIntegration:
                 else:
                     raise
     
+    async def create_files_metadata(self, filenames: List[str]) -> List[Dict[str, Any]]:
+        """Create many file records with one metadata call per 1000 files; returns file_id/filename pairs in order"""
+        created = []
+        try:
+            # Metadata service creates at most 1000 files per call
+            for start in range(0, len(filenames), 1000):
+                response = await metadata_service.post(
+                    f"{METADATA_SERVICE_URL}/files/batch",
+                    json={"files": [{"filename": name} for name in filenames[start:start + 1000]]},
+                    headers=self.headers
+                )
+                response.raise_for_status()
+                created.extend(response.json())
+            return created
+        except Exception as e:
+            logger.error(f"Error creating metadata for {len(filenames)} files: {e}")
+            raise
+    
     async def upload_chunk_with_auth(self, chunk_id: str, chunk_data: bytes, auth_header: str) -> Dict[str, Any]:
-        """Upload chunk to block storage with authentication"""
+        """Upload chunk to block storage with authentication (raw octet-stream PUT)"""
         try:
-            files = {
-                "file": (chunk_id, BytesIO(chunk_data), "application/octet-stream")
+            headers = {
+                "Authorization": auth_header,
+                "Content-Type": "application/octet-stream"
             }
-            data = {"chunk_id": chunk_id}
+            body = chunk_data
             
-            headers = {"Authorization": auth_header}
+            # Compress compressible chunks; already-compressed data is sent as-is
+            if compression.CHUNK_COMPRESSION_ENABLED and compression.is_compressible(chunk_data):
+                encoding = compression.SUPPORTED_ENCODINGS[0]
+                body = await asyncio.to_thread(compression.compress, chunk_data, encoding)
+                headers["Content-Encoding"] = encoding
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{BLOCK_STORAGE_SERVICE_URL}/chunks",
-                    files=files,
-                    data=data,
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            url = f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}"
+            response = await block_storage.put(url, content=body, headers=headers)
+            
+            # Block storage without this encoding: fall back to an uncompressed body
+            if response.status_code == 415 and "Content-Encoding" in headers:
+                logger.warning(f"Block storage rejected {headers['Content-Encoding']} for chunk {chunk_id}, resending uncompressed")
+                del headers["Content-Encoding"]
+                response = await block_storage.put(url, content=chunk_data, headers=headers)
+            
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             logger.error(f"Error uploading chunk {chunk_id}: {e}")
             raise
     
-    async def create_chunk_metadata(self, file_id: str, chunk_index: int, storage_path: str) -> Dict[str, Any]:
-        """Create chunk metadata in metadata service"""
+    async def create_chunk_metadata(self, file_id: str, chunk_index: int, storage_path: str, digest: Optional[str] = None, size: Optional[int] = None) -> Dict[str, Any]:
+        """Create chunk metadata in metadata service (digest: SHA-256 hex of the chunk)"""
         try:
             payload = {
                 "file_id": file_id,
                 "chunk_index": chunk_index,
-                "storage_path": storage_path
+                "storage_path": storage_path,
+                "digest": digest,
+                "size": size
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{METADATA_SERVICE_URL}/files/{file_id}/chunks",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await metadata_service.post(
+                f"{METADATA_SERVICE_URL}/files/{file_id}/chunks",
+                json=payload,
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             logger.error(f"Error creating chunk metadata: {e}")
@@ -141,34 +182,63 @@ class ServiceIntegration:
                 "storage_path": storage_path
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{METADATA_SERVICE_URL}/files/{file_id}/versions",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await metadata_service.post(
+                f"{METADATA_SERVICE_URL}/files/{file_id}/versions",
+                json=payload,
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             logger.error(f"Error creating file version: {e}")
             raise
     
-    async def get_file_download_info(self, file_id: str) -> Dict[str, Any]:
-        """Get file download information from metadata service"""
+    async def commit_file_batch(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Register chunks and sizes and create a version for many files at once.
+        Each entry: file_id, file_size, storage_path (of the version) and chunks
+        (chunk_index, storage_path, digest, size).
+        """
+        committed = []
         try:
-            logger.info(f"Getting download info for file {file_id}")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{METADATA_SERVICE_URL}/files/{file_id}/download-info",
-                    headers=self.headers,
-                    timeout=30.0
+            for start in range(0, len(entries), 1000):
+                response = await metadata_service.post(
+                    f"{METADATA_SERVICE_URL}/files/batch/commit",
+                    json={"files": entries[start:start + 1000]},
+                    headers=self.headers
                 )
                 response.raise_for_status()
-                result = response.json()
-                logger.info(f"Download info retrieved: {result}")
-                return result
+                committed.extend(response.json())
+            return committed
+        except Exception as e:
+            logger.error(f"Error committing batch of {len(entries)} files: {e}")
+            raise
+    
+    async def get_file_download_info(self, file_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get file download information from metadata service.
+        With a user_id the manifest cache is consulted first and filled afterwards.
+        """
+        if user_id:
+            cached = manifest_cache.get(file_id, user_id)
+            if cached is not None:
+                logger.info(f"⚡ Download info for file {file_id} served from manifest cache")
+                return cached
+        started_at = manifest_cache.begin_fill()
+        
+        try:
+            logger.info(f"Getting download info for file {file_id}")
+            response = await metadata_service.get(
+                f"{METADATA_SERVICE_URL}/files/{file_id}/download-info",
+                headers=self.headers
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Download info retrieved: {result}")
+            if user_id:
+                manifest_cache.put(file_id, user_id, result, started_at)
+            return result
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error getting download info: {e.response.status_code} - {e.response.text}")
             raise Exception(f"Failed to get file info: HTTP {e.response.status_code}")
@@ -176,9 +246,10 @@ class ServiceIntegration:
             logger.error(f"Error getting file download info: {e}")
             raise
 
-    async def download_chunks_concurrently(self, chunk_ids: List[str], max_concurrent: int = None) -> List[bytes]:
+    async def download_chunks_concurrently(self, chunk_ids: List[str], max_concurrent: int = None, digests: Optional[List[Optional[str]]] = None) -> List[bytes]:
         """
         🚀 SIMPLIFIED CONCURRENT DOWNLOAD: Back to working basics
+        Chunks with a known SHA-256 in `digests` are verified as they arrive.
         """
         
         # 🎯 CONSERVATIVE CONCURRENCY: Start with what works
@@ -196,37 +267,16 @@ class ServiceIntegration:
         semaphore = asyncio.Semaphore(max_concurrent)
         
         async def download_single_chunk_with_order(chunk_id: str, index: int) -> tuple[int, bytes]:
-            """Download a single chunk with basic retry logic"""
+            """Download a single chunk, keeping its position"""
             async with semaphore:
-                retry_count = 0
-                max_retries = 2
-                
-                while retry_count <= max_retries:
-                    try:
-                        logger.debug(f"⬇️ Downloading chunk {index+1}/{len(chunk_ids)}: {chunk_id}")
-                        
-                        async with httpx.AsyncClient() as client:
-                            response = await client.get(
-                                f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
-                                timeout=10.0  # Simple timeout
-                            )
-                            response.raise_for_status()
-                            data = response.content
-                        
-                        logger.debug(f"✅ Downloaded chunk {index+1}/{len(chunk_ids)}: {len(data)} bytes")
-                        return (index, data)
-                        
-                    except Exception as e:
-                        retry_count += 1
-                        logger.warning(f"⚠️ Chunk {index+1} download attempt {retry_count} failed: {e}")
-                        
-                        if retry_count <= max_retries:
-                            wait_time = 0.5 * retry_count
-                            logger.debug(f"🔄 Retrying chunk {index+1} in {wait_time}s...")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            logger.error(f"❌ Failed to download chunk {index+1}/{len(chunk_ids)} after {max_retries + 1} attempts")
-                            raise Exception(f"Chunk {index+1} download failed: {str(e)}")
+                logger.debug(f"⬇️ Downloading chunk {index+1}/{len(chunk_ids)}: {chunk_id}")
+                data = await self.fetch_chunk(
+                    chunk_id,
+                    label=f"{index+1}/{len(chunk_ids)}",
+                    expected_digest=digests[index] if digests else None
+                )
+                logger.debug(f"✅ Downloaded chunk {index+1}/{len(chunk_ids)}: {len(data)} bytes")
+                return (index, data)
         
         # Create all download tasks
         tasks = [
@@ -255,20 +305,214 @@ class ServiceIntegration:
             logger.error(f"❌ Simplified concurrent download failed: {e}")
             raise
 
+    async def fetch_chunk(self, chunk_id: str, label: str = None, max_retries: int = 2, expected_digest: Optional[str] = None) -> bytes:
+        """Fetch one chunk with hedging and basic retry logic, verifying its SHA-256 when known"""
+        label = label or chunk_id
+        retry_count = 0
+        
+        while True:
+            try:
+                # 🏁 Hedged fetch: a second request races a slow primary
+                data = await chunk_hedger.run(lambda: self._fetch_chunk(chunk_id, timeout=10.0))
+                break
+            except (DependencyUnavailable, DeadlineExceeded):
+                raise
+            except Exception as e:
+                retry_count += 1
+                logger.warning(f"⚠️ Chunk {label} download attempt {retry_count} failed: {e}")
+                
+                if retry_count > max_retries:
+                    logger.error(f"❌ Failed to download chunk {label} after {max_retries + 1} attempts")
+                    raise Exception(f"Chunk {label} download failed: {str(e)}")
+                
+                wait_time = 0.5 * retry_count
+                logger.debug(f"🔄 Retrying chunk {label} in {wait_time}s...")
+                await asyncio.sleep(wait_time)
+        
+        if expected_digest is None or not integrity.CHUNK_INTEGRITY_VERIFY:
+            return data
+        return await self._verify_chunk(chunk_id, label, data, expected_digest)
+
+    async def _verify_chunk(self, chunk_id: str, label: str, data: bytes, expected_digest: str) -> bytes:
+        """Check a chunk against its recorded SHA-256, re-fetching past any cache on mismatch"""
+        for attempt in range(integrity.CHUNK_INTEGRITY_RETRIES + 1):
+            if await integrity.sha256_hex(data) == expected_digest:
+                integrity.stats["verified"] += 1
+                if attempt:
+                    integrity.stats["recovered"] += 1
+                    logger.info(f"✅ Chunk {label} verified after {attempt} re-fetch(es)")
+                return data
+            
+            integrity.stats["mismatches"] += 1
+            logger.warning(f"⚠️ Chunk {label} failed SHA-256 verification (attempt {attempt + 1})")
+            if attempt < integrity.CHUNK_INTEGRITY_RETRIES:
+                data = await self._fetch_chunk(chunk_id, timeout=10.0, bypass_cache=True)
+        
+        integrity.stats["failed"] += 1
+        logger.error(f"❌ Chunk {label} is corrupt, refusing to serve it")
+        raise integrity.ChunkIntegrityError(f"Chunk {label} failed integrity verification")
+
+    async def iter_chunks(self, chunk_ids: List[str], prefetch: int = 4, digests: Optional[List[Optional[str]]] = None) -> AsyncIterator[bytes]:
+        """
+        Yield chunk payloads in order while keeping up to `prefetch` fetches in flight.
+        Memory stays bounded by the prefetch window instead of the file size.
+        Each in-flight fetch also verifies its chunk, so hashing overlaps with transfer.
+        Files with many chunks are read in batches instead (see iter_chunks_batched).
+        """
+        if BATCH_GET_MIN_CHUNKS > 0 and len(chunk_ids) >= BATCH_GET_MIN_CHUNKS:
+            async for data in self.iter_chunks_batched(chunk_ids, digests):
+                yield data
+            return
+        
+        remaining = iter(enumerate(chunk_ids))
+        in_flight = deque()
+        
+        def schedule_next():
+            index, chunk_id = next(remaining, (None, None))
+            if chunk_id is not None:
+                expected = digests[index] if digests else None
+                in_flight.append(asyncio.ensure_future(self.fetch_chunk(chunk_id, expected_digest=expected)))
+        
+        try:
+            for _ in range(max(1, prefetch)):
+                schedule_next()
+            while in_flight:
+                data = await in_flight.popleft()
+                schedule_next()
+                yield data
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def iter_chunks_batched(self, chunk_ids: List[str], digests: Optional[List[Optional[str]]] = None) -> AsyncIterator[bytes]:
+        """
+        Yield chunk payloads in order, BATCH_GET_SIZE chunks per block storage request.
+        Entries that block storage could not read are fetched on their own (with retries).
+        """
+        for start in range(0, len(chunk_ids), BATCH_GET_SIZE):
+            batch = chunk_ids[start:start + BATCH_GET_SIZE]
+            received = 0
+            async for chunk_id, status, payload in self.fetch_chunks_batch(batch):
+                index = start + received
+                received += 1
+                label = f"{index+1}/{len(chunk_ids)}"
+                expected = digests[index] if digests else None
+                if status != framing.STATUS_OK:
+                    logger.warning(f"⚠️ Batch read of chunk {label} failed (status {status}), fetching it alone")
+                    yield await self.fetch_chunk(chunk_id, label=label, expected_digest=expected)
+                elif expected is not None and integrity.CHUNK_INTEGRITY_VERIFY:
+                    yield await self._verify_chunk(chunk_id, label, payload, expected)
+                else:
+                    yield payload
+            if received != len(batch):
+                raise Exception(f"Batch read returned {received} of {len(batch)} chunks")
+
+    async def fetch_chunks_batch(self, chunk_ids: List[str], timeout: float = 30.0) -> AsyncIterator[tuple]:
+        """
+        Read up to 1000 chunks with one POST /chunks/batch-get, yielding
+        (chunk_id, status, payload) in request order as the entries arrive
+        """
+        async with block_storage.stream(
+            "POST",
+            f"{BLOCK_STORAGE_SERVICE_URL}/chunks/batch-get",
+            json={"chunk_ids": chunk_ids},
+            headers=self.headers,
+            timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            async for entry in framing.iter_entries(response.aiter_bytes()):
+                yield entry
+
+    async def _fetch_chunk(self, chunk_id: str, timeout: float = 10.0, bypass_cache: bool = False) -> bytes:
+        """Single GET of a chunk from block storage"""
+        headers = {"Cache-Control": "no-cache"} if bypass_cache else {}
+        if not compression.CHUNK_COMPRESSION_ENABLED:
+            response = await block_storage.get(
+                f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
+                headers=headers,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.content
+        
+        # Decode ourselves: httpx does not know every encoding we negotiate
+        headers["Accept-Encoding"] = ", ".join(compression.SUPPORTED_ENCODINGS)
+        async with block_storage.stream(
+            "GET",
+            f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
+            headers=headers,
+            timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            raw = b"".join([piece async for piece in response.aiter_raw()])
+            encoding = response.headers.get("content-encoding")
+        if not encoding:
+            return raw
+        return await asyncio.to_thread(compression.decompress, raw, encoding, MAX_DECODED_CHUNK_SIZE)
+
+    async def presign_chunks(self, chunk_ids: List[str], method: str = "GET", expires_in: int = 900) -> Dict[str, Any]:
+        """Get presigned object-storage URLs for chunks from block storage"""
+        urls = {}
+        granted_expiry = expires_in
+        try:
+            # Block storage presigns at most 1000 chunks per call
+            for start in range(0, len(chunk_ids), 1000):
+                response = await block_storage.post(
+                    f"{BLOCK_STORAGE_SERVICE_URL}/chunks/presign",
+                    json={
+                        "chunk_ids": chunk_ids[start:start + 1000],
+                        "method": method,
+                        "expires_in": expires_in
+                    },
+                    headers=self.headers
+                )
+                response.raise_for_status()
+                result = response.json()
+                urls.update(result["urls"])
+                granted_expiry = result.get("expires_in", expires_in)
+            return {"urls": urls, "expires_in": granted_expiry}
+        except Exception as e:
+            logger.error(f"Error presigning {len(chunk_ids)} chunks: {e}")
+            raise
+
+    async def stat_chunks(self, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Check existence and size of chunks in block storage without downloading them"""
+        results = {}
+        try:
+            for start in range(0, len(chunk_ids), 1000):
+                response = await block_storage.post(
+                    f"{BLOCK_STORAGE_SERVICE_URL}/chunks/stat",
+                    json={"chunk_ids": chunk_ids[start:start + 1000]},
+                    headers=self.headers
+                )
+                response.raise_for_status()
+                results.update(response.json()["chunks"])
+            return results
+        except Exception as e:
+            logger.error(f"Error checking {len(chunk_ids)} chunks: {e}")
+            raise
+
+    async def get_file_metadata(self, file_id: str) -> Dict[str, Any]:
+        """Get file metadata from metadata service (enforces owner/share access)"""
+        response = await metadata_service.get(
+            f"{METADATA_SERVICE_URL}/files/{file_id}",
+            headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
+
     # Keep the old method as fallback
     async def download_chunk(self, chunk_id: str) -> bytes:
         """Download a single chunk from block storage (legacy method for backward compatibility)"""
         try:
             logger.debug(f"Downloading chunk {chunk_id}")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                data = response.content
-                logger.debug(f"Chunk {chunk_id} downloaded: {len(data)} bytes")
-                return data
+            response = await block_storage.get(
+                f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}"
+            )
+            response.raise_for_status()
+            data = response.content
+            logger.debug(f"Chunk {chunk_id} downloaded: {len(data)} bytes")
+            return data
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error downloading chunk {chunk_id}: {e.response.status_code}")
             raise Exception(f"Failed to download chunk: HTTP {e.response.status_code}")
@@ -285,36 +529,50 @@ class ServiceIntegration:
                 "event_type": event_type
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{SYNC_SERVICE_URL}/sync-events",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Sync event triggered for file {file_id}: {result}")
-                return result
+            response = await sync_service.post(
+                f"{SYNC_SERVICE_URL}/sync-events",
+                json=payload,
+                headers=self.headers
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Sync event triggered for file {file_id}: {result}")
+            return result
                 
         except Exception as e:
             logger.error(f"Error triggering sync event: {e}")
             raise
     
+    async def trigger_sync_events(self, file_ids: List[str], event_type: str) -> List[str]:
+        """Trigger one batched sync event per 1000 files; returns the event IDs"""
+        event_ids = []
+        try:
+            logger.info(f"Triggering {event_type} sync event for {len(file_ids)} files")
+            for start in range(0, len(file_ids), 1000):
+                response = await sync_service.post(
+                    f"{SYNC_SERVICE_URL}/sync-events/batch",
+                    json={"file_ids": file_ids[start:start + 1000], "event_type": event_type},
+                    headers=self.headers
+                )
+                response.raise_for_status()
+                event_ids.extend(response.json()["event_ids"])
+            return event_ids
+        except Exception as e:
+            logger.error(f"Error triggering batch sync event: {e}")
+            raise
+    
     async def trigger_indexing(self, file_id: str) -> Dict[str, Any]:
         """Trigger file indexing"""
         try:
             payload = {"file_id": file_id}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{INDEXER_SERVICE_URL}/index",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await indexer_service.post(
+                f"{INDEXER_SERVICE_URL}/index",
+                json=payload,
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             logger.warning(f"Failed to index file {file_id}: {e}")
@@ -399,17 +657,15 @@ class ServiceIntegration:
         try:
             logger.info(f"Updating file size for {file_id}: {file_size} bytes")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    f"{METADATA_SERVICE_URL}/files/{file_id}",
-                    headers=self.headers,
-                    json={"file_size": file_size},
-                    timeout=30.0
-                )
-                response.raise_for_status()
+            response = await metadata_service.put(
+                f"{METADATA_SERVICE_URL}/files/{file_id}",
+                headers=self.headers,
+                json={"file_size": file_size}
+            )
+            response.raise_for_status()
                 
-                logger.info(f"Successfully updated file size for {file_id}")
-                return response.json()
+            logger.info(f"Successfully updated file size for {file_id}")
+            return response.json()
                 
         except Exception as e:
             logger.error(f"Failed to update file size for {file_id}: {e}")
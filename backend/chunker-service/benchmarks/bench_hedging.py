@@ -0,0 +1,90 @@
+"""
+Benchmark hedged chunk downloads against the slow block-storage stand-in.
+
+Starts benchmarks.slow_block_storage in-process, then downloads the same
+multi-chunk "file" repeatedly through ServiceIntegration with hedging off
+and on, and reports file-level latency percentiles and hedge counters.
+
+Usage (from backend/chunker-service):
+    python -m benchmarks.bench_hedging --files 50 --chunks 16
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import threading
+import time
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_standin(port: int):
+    import uvicorn
+    from benchmarks.slow_block_storage import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+async def _run(label: str, files: int, chunks: int, hedging_enabled: bool):
+    from app import services
+    from app.hedging import Hedger
+
+    # Fresh hedger per run so warm-up and budget are comparable
+    services.chunk_hedger = Hedger(enabled=hedging_enabled)
+    integration = services.ServiceIntegration()
+
+    latencies = []
+    for file_index in range(files):
+        chunk_ids = [f"bench_file{file_index}_chunk_{i}" for i in range(chunks)]
+        start = time.monotonic()
+        await integration.download_chunks_concurrently(chunk_ids, max_concurrent=chunks)
+        latencies.append(time.monotonic() - start)
+
+    print(f"\n== {label} ==")
+    print(f"files={files} chunks/file={chunks}")
+    print(f"p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p95={_percentile(latencies, 95) * 1000:.1f}ms "
+          f"p99={_percentile(latencies, 99) * 1000:.1f}ms "
+          f"max={max(latencies) * 1000:.1f}ms")
+    print(f"hedging: {services.chunk_hedger.snapshot()}")
+
+    # The pooled client is bound to this event loop
+    from app import http_client
+    await http_client.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=16)
+    args = parser.parse_args()
+
+    port = _free_port()
+    os.environ["BLOCK_STORAGE_SERVICE_URL"] = f"http://127.0.0.1:{port}"
+    server = _start_standin(port)
+
+    try:
+        asyncio.run(_run("hedging disabled", args.files, args.chunks, hedging_enabled=False))
+        asyncio.run(_run("hedging enabled", args.files, args.chunks, hedging_enabled=True))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
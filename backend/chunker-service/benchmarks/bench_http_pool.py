@@ -0,0 +1,89 @@
+"""
+Benchmark per-call latency of inter-service requests with and without the pooled client.
+
+Starts benchmarks.slow_block_storage in-process with latency injection turned
+off, then fetches chunks through a fresh httpx.AsyncClient per call (the old
+pattern) and through the shared pool in app.http_client, sequentially and with
+concurrency.
+
+Usage (from backend/chunker-service):
+    python -m benchmarks.bench_http_pool --calls 500 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# No injected latency: measure connection overhead only
+os.environ.setdefault("STANDIN_BASE_LATENCY", "0")
+os.environ.setdefault("STANDIN_JITTER", "0")
+os.environ.setdefault("STANDIN_SLOW_PROBABILITY", "0")
+os.environ.setdefault("STANDIN_CHUNK_SIZE", "16384")
+
+from benchmarks.bench_hedging import _free_port, _percentile, _start_standin  # noqa: E402
+
+
+async def _fresh_client_get(url: str):
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, timeout=10.0)
+        response.raise_for_status()
+        return response.content
+
+
+async def _pooled_get(url: str):
+    from app.http_client import get_client
+
+    response = await get_client().get(url, timeout=10.0)
+    response.raise_for_status()
+    return response.content
+
+
+async def _measure(label: str, fetch, base_url: str, calls: int, concurrency: int):
+    from app import http_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await fetch(f"{base_url}/chunks/bench_chunk_{index}")
+            latencies.append(time.perf_counter() - start)
+
+    # Warm-up request so imports and the first connection are not measured
+    await fetch(f"{base_url}/chunks/warmup")
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(calls)])
+    wall = time.perf_counter() - wall_start
+    await http_client.shutdown()
+
+    print(f"{label:<28} concurrency={concurrency:<3} "
+          f"p50={statistics.median(latencies) * 1000:.2f}ms "
+          f"p99={_percentile(latencies, 99) * 1000:.2f}ms "
+          f"throughput={calls / wall:.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = _start_standin(port)
+
+    try:
+        for concurrency in (1, args.concurrency):
+            asyncio.run(_measure("fresh client per call", _fresh_client_get, base_url, args.calls, concurrency))
+            asyncio.run(_measure("pooled keep-alive client", _pooled_get, base_url, args.calls, concurrency))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Local stand-in for block storage that injects latency into chunk reads.
+
+Serves GET /chunks/{chunk_id} with deterministic payloads. Most requests take
+BASE_LATENCY seconds; a SLOW_PROBABILITY fraction stalls for SLOW_LATENCY,
+mimicking the "Slow MinIO download" tail seen in production.
+
+Run standalone:
+    uvicorn benchmarks.slow_block_storage:app --port 8103
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+CHUNK_SIZE = int(os.getenv("STANDIN_CHUNK_SIZE", "65536"))
+BASE_LATENCY = float(os.getenv("STANDIN_BASE_LATENCY", "0.01"))
+JITTER = float(os.getenv("STANDIN_JITTER", "0.005"))
+SLOW_PROBABILITY = float(os.getenv("STANDIN_SLOW_PROBABILITY", "0.03"))
+SLOW_LATENCY = float(os.getenv("STANDIN_SLOW_LATENCY", "1.5"))
+
+app = FastAPI(title="Slow Block Storage Stand-in")
+stats = {"requests": 0, "slow_requests": 0}
+
+
+@app.get("/chunks/{chunk_id}")
+async def get_chunk(chunk_id: str):
+    stats["requests"] += 1
+    delay = BASE_LATENCY + random.uniform(0, JITTER)
+    if random.random() < SLOW_PROBABILITY:
+        stats["slow_requests"] += 1
+        delay = SLOW_LATENCY
+    await asyncio.sleep(delay)
+    payload = (chunk_id.encode() * (CHUNK_SIZE // max(1, len(chunk_id)) + 1))[:CHUNK_SIZE]
+    return Response(content=payload, media_type="application/octet-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import os
+
+import httpx
+import pytest
+
+from app import compression, http_client, services
+
+ENCODINGS = compression.SUPPORTED_ENCODINGS
+
+
+def payload(size=200_000):
+    # Compressible, but not so much that the encoded body is tiny
+    return base64.b64encode(os.urandom(size * 3 // 4))
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_decompress_round_trip(encoding):
+    data = payload()
+    assert compression.decompress(compression.compress(data, encoding), encoding, len(data)) == data
+
+
+@pytest.mark.parametrize("encoding", [None, "", "identity"])
+def test_identity_is_passed_through(encoding):
+    assert compression.decompress(b"plain", encoding, 1) == b"plain"
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_decompress_enforces_size_cap(encoding):
+    data = b"\0" * 1_000_000
+    with pytest.raises(compression.DecompressedTooLarge):
+        compression.decompress(compression.compress(data, encoding), encoding, len(data) - 1)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_truncated_body_is_rejected(encoding):
+    data = payload()
+    encoded = compression.compress(data, encoding)
+    with pytest.raises(compression.TruncatedBody):
+        compression.decompress(encoded[:-8], encoding, len(data))
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        compression.decompress(b"data", "br", 100)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("gzip;q=0, identity", None),
+    ("br, *", ENCODINGS[0]),
+    ("zstd;q=0, gzip", "gzip"),
+])
+def test_select_encoding(header, expected):
+    assert compression.select_encoding(header) == expected
+
+
+class RawStream(httpx.AsyncByteStream):
+    def __init__(self, body):
+        self.body = body
+
+    async def __aiter__(self):
+        yield self.body
+
+
+@pytest.fixture
+def block_storage(monkeypatch):
+    """Answers chunk GETs with the given body and Content-Encoding, recording request headers"""
+    seen = {}
+    reply = {"body": b"", "encoding": None}
+
+    def handler(request):
+        seen["accept-encoding"] = request.headers.get("accept-encoding")
+        headers = {"content-encoding": reply["encoding"]} if reply["encoding"] else {}
+        # A streamed body, so the raw (still encoded) bytes can be read like on the wire
+        return httpx.Response(200, stream=RawStream(reply["body"]), headers=headers)
+
+    monkeypatch.setattr(compression, "CHUNK_COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return seen, reply
+
+
+def fetch():
+    return asyncio.run(services.ServiceIntegration(auth_token="token")._fetch_chunk("chunk-1"))
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_fetch_chunk_negotiates_and_decodes(block_storage, encoding):
+    seen, reply = block_storage
+    data = payload()
+    reply.update(body=compression.compress(data, encoding), encoding=encoding)
+    assert fetch() == data
+    assert seen["accept-encoding"] == ", ".join(ENCODINGS)
+
+
+def test_fetch_chunk_accepts_identity_answer(block_storage):
+    seen, reply = block_storage
+    reply.update(body=b"\x89PNG already compressed", encoding=None)
+    assert fetch() == b"\x89PNG already compressed"
+
+
+def test_fetch_chunk_caps_decoded_size(block_storage, monkeypatch):
+    seen, reply = block_storage
+    monkeypatch.setattr(services, "MAX_DECODED_CHUNK_SIZE", 1000)
+    reply.update(body=compression.compress(b"\0" * 100_000, "gzip"), encoding="gzip")
+    with pytest.raises(compression.DecompressedTooLarge):
+        fetch()
+
+
+def test_fetch_chunk_rejects_truncated_body(block_storage):
+    seen, reply = block_storage
+    reply.update(body=compression.compress(payload(), "gzip")[:-8], encoding="gzip")
+    with pytest.raises(compression.TruncatedBody):
+        fetch()
+
+
+def test_fetch_chunk_without_compression_sends_no_accept_encoding(block_storage, monkeypatch):
+    seen, reply = block_storage
+    monkeypatch.setattr(compression, "CHUNK_COMPRESSION_ENABLED", False)
+    reply.update(body=b"raw", encoding=None)
+    assert fetch() == b"raw"
+    assert seen["accept-encoding"] in (None, "gzip, deflate")
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app import hedging
+from app.hedging import HedgeBudget, Hedger, LatencyTracker
+
+
+def warmed_hedger(latency=0.01, samples=hedging.HEDGE_MIN_SAMPLES):
+    hedger = Hedger(enabled=True, percentile=95)
+    for _ in range(samples):
+        hedger.tracker.record(latency)
+    return hedger
+
+
+def test_tracker_needs_minimum_samples(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 5)
+    tracker = LatencyTracker(window=10)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.record(seconds)
+    assert tracker.percentile(50) is None
+    tracker.record(0.5)
+    assert tracker.percentile(50) == 0.3
+    assert tracker.percentile(99) == 0.5
+
+
+def test_no_hedge_while_warming_up():
+    hedger = warmed_hedger(samples=hedging.HEDGE_MIN_SAMPLES - 1)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "slow"
+
+    assert hedger.hedge_delay() is None
+    assert asyncio.run(hedger.run(request)) == "slow"
+    assert len(calls) == 1 and hedger.stats["hedges_issued"] == 0
+
+
+def test_hedge_wins_and_slow_primary_is_cancelled(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.01)
+    hedger = warmed_hedger()
+    cancelled = []
+    attempts = []
+
+    async def request():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        try:
+            await asyncio.sleep(5 if attempt == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return attempt
+
+    async def scenario():
+        result = await hedger.run(request)
+        await asyncio.sleep(0)  # let the cancellation land
+        return result
+
+    assert asyncio.run(scenario()) == 1
+    assert cancelled == [0]
+    assert hedger.stats["hedges_issued"] == 1 and hedger.stats["hedges_won"] == 1
+
+
+def test_primary_result_wins_over_failed_hedge(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.01)
+    hedger = warmed_hedger()
+    attempts = []
+
+    async def request():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        if attempt == 1:
+            raise ConnectionError("hedge failed")
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert asyncio.run(hedger.run(request)) == "primary"
+    assert hedger.stats["hedges_won"] == 0
+
+
+def test_both_failing_raises():
+    hedger = warmed_hedger(latency=0.0)
+
+    async def request():
+        await asyncio.sleep(0.06)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(hedger.run(request))
+    assert hedger.stats["hedges_issued"] == 1
+
+
+def test_budget_caps_hedges():
+    budget = HedgeBudget(ratio=0.5, burst=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    budget.on_request()
+    assert not budget.try_spend()
+    budget.on_request()
+    assert budget.try_spend()
+    for _ in range(10):
+        budget.on_request()
+    assert budget.tokens == 2
+
+
+def test_exhausted_budget_denies_hedge(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.01)
+    hedger = warmed_hedger()
+    hedger.budget = HedgeBudget(ratio=0.0, burst=0)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert asyncio.run(hedger.run(request)) == "primary"
+    assert len(calls) == 1
+    assert hedger.stats["hedges_denied"] == 1 and hedger.stats["hedges_issued"] == 0
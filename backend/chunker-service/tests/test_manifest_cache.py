@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth, main
+from app.manifest_cache import ManifestCache
+
+
+def manifest(version):
+    return {"file_id": "f", "version": version, "chunk_ids": [f"chunk_{version}"]}
+
+
+@pytest.fixture
+def cache():
+    return ManifestCache(enabled=True, ttl=60, max_entries=2)
+
+
+def test_cached_manifest_served_only_to_authorized_users(cache):
+    cache.put("f", "alice", manifest(1), cache.begin_fill())
+    assert cache.get("f", "alice") == manifest(1)
+    assert cache.get("f", "bob") is None
+    
+    cache.put("f", "bob", manifest(1), cache.begin_fill())
+    assert cache.get("f", "bob") == manifest(1)
+    assert cache.get("f", "alice") == manifest(1)
+
+
+def test_new_version_resets_authorized_users(cache):
+    cache.put("f", "alice", manifest(1), cache.begin_fill())
+    cache.put("f", "bob", manifest(2), cache.begin_fill())
+    assert cache.get("f", "bob") == manifest(2)
+    assert cache.get("f", "alice") is None
+
+
+def test_fill_racing_invalidation_is_dropped(cache):
+    started_at = cache.begin_fill()
+    cache.invalidate("f", "version")
+    cache.put("f", "alice", manifest(1), started_at)
+    assert cache.get("f", "alice") is None
+    assert cache.stats["stale_fills_dropped"] == 1
+    
+    # A fill that starts after the invalidation is kept
+    cache.put("f", "alice", manifest(2), cache.begin_fill())
+    assert cache.get("f", "alice") == manifest(2)
+
+
+def test_invalidate_drops_entry_for_every_user(cache):
+    cache.put("f", "alice", manifest(1), cache.begin_fill())
+    cache.put("f", "bob", manifest(1), cache.begin_fill())
+    assert cache.invalidate("f", "share")
+    assert cache.get("f", "alice") is None and cache.get("f", "bob") is None
+    assert not cache.invalidate("f", "share")
+
+
+def test_expired_and_evicted_entries_miss(cache, monkeypatch):
+    cache.put("a", "alice", manifest(1), cache.begin_fill())
+    cache.put("b", "alice", manifest(1), cache.begin_fill())
+    cache.get("a", "alice")
+    cache.put("c", "alice", manifest(1), cache.begin_fill())
+    assert cache.get("b", "alice") is None  # least recently used
+    
+    now = time.monotonic()
+    monkeypatch.setattr("app.manifest_cache.time.monotonic", lambda: now + 61)
+    assert cache.get("a", "alice") is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth, "INTERNAL_SERVICE_TOKEN", "s3cret")
+    main.app.dependency_overrides[auth.get_current_user] = lambda: {"sub": "alice"}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_invalidation_endpoint_requires_service_token(client, monkeypatch):
+    monkeypatch.setattr(main, "manifest_cache", ManifestCache(enabled=True))
+    main.manifest_cache.put("f", "alice", manifest(1), main.manifest_cache.begin_fill())
+    
+    response = client.post(
+        "/internal/manifest-invalidations", json={"file_id": "f"}, headers={"Authorization": "Bearer user-token"}
+    )
+    assert response.status_code == 403
+    response = client.post("/internal/manifest-invalidations", json={"file_id": "f"}, headers={"X-Internal-Token": "wrong"})
+    assert response.status_code == 403
+    assert main.manifest_cache.get("f", "alice") == manifest(1)
+    
+    response = client.post("/internal/manifest-invalidations", json={"file_id": "f"}, headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.json() == {"file_id": "f", "invalidated": True}
+    assert main.manifest_cache.get("f", "alice") is None
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import http_client
+from app.resilience import BulkheadFullError, CircuitBreaker, CircuitOpenError, Downstream
+
+
+def test_breaker_opens_after_threshold_and_recovers(monkeypatch):
+    breaker = CircuitBreaker("metadata", failure_threshold=3, recovery_timeout=10)
+    now = [1000.0]
+    monkeypatch.setattr("app.resilience.time.monotonic", lambda: now[0])
+
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 11
+    breaker.before_call()  # trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.consecutive_failures == 0
+
+
+def test_downstream_counts_5xx_and_fails_fast(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(503)
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    downstream = Downstream("test-storage", max_concurrent=4, timeout=1.0)
+
+    async def scenario():
+        for _ in range(downstream.breaker.failure_threshold):
+            assert (await downstream.get("http://storage/chunks/a")).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            await downstream.get("http://storage/chunks/a")
+
+    asyncio.run(scenario())
+    assert len(calls) == downstream.breaker.failure_threshold
+    assert downstream.snapshot()["state"] == "open"
+
+
+def test_bulkhead_rejects_when_full(monkeypatch):
+    monkeypatch.setenv("TEST_SLOW_MAX_CONCURRENT", "1")
+    downstream = Downstream("test-slow", max_concurrent=10, timeout=1.0)
+    downstream.bulkhead.max_wait = 0.05
+
+    async def scenario():
+        async def hold():
+            async with downstream.bulkhead.slot():
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(BulkheadFullError):
+            async with downstream._admit():
+                pass
+        await holder
+
+    asyncio.run(scenario())
+    assert downstream.bulkhead.rejected == 1
+    assert downstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_holds_slot_until_body_consumed(monkeypatch):
+    released = asyncio.Event()
+
+    class SlowBody(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"first"
+            await released.wait()
+            yield b"second"
+
+    def handler(request):
+        return httpx.Response(200, stream=SlowBody())
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    downstream = Downstream("test-stream", max_concurrent=1, timeout=1.0)
+    downstream.bulkhead.max_wait = 0.05
+
+    async def scenario():
+        body = []
+
+        async def read():
+            async with downstream.stream("GET", "http://storage/chunks/a") as response:
+                async for piece in response.aiter_raw():
+                    body.append(piece)
+
+        reader = asyncio.ensure_future(read())
+        await asyncio.sleep(0.01)
+        assert body == [b"first"] and downstream.bulkhead.active == 1
+        with pytest.raises(BulkheadFullError):
+            await downstream.get("http://storage/chunks/b")
+
+        released.set()
+        await reader
+        assert body == [b"first", b"second"] and downstream.bulkhead.active == 0
+        assert (await downstream.get("http://storage/chunks/b")).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_call_frees_half_open_slot(monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    downstream = Downstream("test-trial", max_concurrent=4, timeout=30.0)
+    downstream.breaker.recovery_timeout = 0
+    for _ in range(downstream.breaker.failure_threshold):
+        downstream.breaker.record_failure()
+
+    async def scenario():
+        trial = asyncio.ensure_future(downstream.get("http://storage/chunks/a"))
+        await asyncio.sleep(0.01)
+        assert downstream.breaker.state == CircuitBreaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        downstream.breaker.before_call()  # a new trial is allowed
+
+    asyncio.run(scenario())
@@ -1,11 +1,16 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from typing import Dict, List
 import uuid
 import logging  # ✅ ADD: Missing import for logging
-from . import models, schemas
+from . import models, schemas, merkle
 
 # ✅ ADD: Create logger instance
 logger = logging.getLogger(__name__)
 
+# Positions per IN (...) when reading Merkle nodes, well under SQLite's bound parameter limit
+MERKLE_QUERY_BATCH = 500
+
 def get_file(db: Session, file_id: str):
     """
     Get a file by ID
@@ -22,6 +27,17 @@ def get_files(db: Session, owner_user_id: str, skip: int = 0, limit: int = 100):
     ).offset(skip).limit(limit).all()
 
 
+def _fallback_owner_email(owner_user_id: str) -> str:
+    """
+    Derive a placeholder email for owners whose token carries none
+    """
+    if '|' in owner_user_id:
+        # For Auth0 users like "google-oauth2|112121276812139100082"
+        provider, user_part = owner_user_id.split('|', 1)
+        return f"{user_part}@{provider}.auth0.local"
+    return f"{owner_user_id}@unknown.local"
+
+
 def create_file(db: Session, file: schemas.FileInput, owner_user_id: str, owner_email: str = None):
     """
     Create a new file record with enhanced user ownership handling
@@ -30,14 +46,7 @@ def create_file(db: Session, file: schemas.FileInput, owner_user_id: str, owner_
     
     # ✅ ENHANCED: Handle cases where owner_email might be None
     if not owner_email:
-        # Create a fallback email from user_id
-        if '|' in owner_user_id:
-            # For Auth0 users like "google-oauth2|112121276812139100082"
-            provider, user_part = owner_user_id.split('|', 1)
-            owner_email = f"{user_part}@{provider}.auth0.local"
-        else:
-            owner_email = f"{owner_user_id}@unknown.local"
-        
+        owner_email = _fallback_owner_email(owner_user_id)
         logger.info(f"No email provided, using fallback: {owner_email}")
     
     db_file = models.File(
@@ -54,6 +63,35 @@ def create_file(db: Session, file: schemas.FileInput, owner_user_id: str, owner_
     return db_file
 
 
+def create_files(db: Session, files: List[schemas.FileInput], owner_user_id: str, owner_email: str = None) -> List[str]:
+    """
+    Create many file records in one transaction, returning their IDs in input order
+    """
+    if not owner_email:
+        owner_email = _fallback_owner_email(owner_user_id)
+    
+    file_ids = [str(uuid.uuid4()) for _ in files]
+    db.add_all([
+        models.File(file_id=file_id, filename=file.filename, owner_user_id=owner_user_id, owner_email=owner_email)
+        for file_id, file in zip(file_ids, files)
+    ])
+    db.commit()
+    
+    logger.info(f"✅ Created {len(file_ids)} files for user {owner_user_id} ({owner_email})")
+    return file_ids
+
+
+def get_owned_files(db: Session, file_ids: List[str], owner_user_id: str) -> Dict[str, models.File]:
+    """
+    Load the files among file_ids that belong to owner_user_id, keyed by ID
+    """
+    files = db.query(models.File).filter(
+        models.File.file_id.in_(file_ids),
+        models.File.owner_user_id == owner_user_id
+    ).all()
+    return {f.file_id: f for f in files}
+
+
 def delete_file(db: Session, file_id: str):
     """
     Delete a file by ID
@@ -97,18 +135,151 @@ def create_file_version(db: Session, version: schemas.VersionCreate):
     # Set version number to 1 if no versions exist, otherwise increment
     new_version_number = 1 if not highest_version else highest_version.version_number + 1
     
+    # Snapshot the chunk list as a Merkle tree so versions can be compared later
+    chunks = get_file_chunks(db, file_id=version.file_id)
+    levels = _merkle_levels(chunks)
+    
     # Create new version
     db_version = models.FileVersion(
         file_id=version.file_id,
         version_number=new_version_number,
-        storage_path=version.storage_path
+        storage_path=version.storage_path,
+        merkle_root=merkle.root_of(levels),
+        merkle_leaf_count=len(chunks)
     )
     db.add(db_version)
+    db.flush()
+    db.bulk_save_objects(_merkle_nodes(db_version.id, levels))
     db.commit()
     db.refresh(db_version)
     return db_version
 
 
+def _merkle_levels(chunks) -> List[List[str]]:
+    """
+    Merkle levels over chunks in index order; chunks without a digest use the legacy stand-in
+    """
+    return merkle.build_levels([
+        chunk.digest or merkle.legacy_chunk_digest(chunk.storage_path) for chunk in chunks
+    ])
+
+
+def _merkle_nodes(version_id: int, levels: List[List[str]]) -> List[models.MerkleNode]:
+    return [
+        models.MerkleNode(version_id=version_id, level=level, position=position, digest=digest)
+        for level, nodes in enumerate(levels)
+        for position, digest in enumerate(nodes)
+    ]
+
+
+class FileNotEmpty(Exception):
+    """A new_file batch entry named a file that already has chunks or a version"""
+
+
+def commit_file_batch(db: Session, files: Dict[str, models.File], entries: List[schemas.FileBatchEntry]) -> List[Dict]:
+    """
+    Register the chunks and size of many uploaded files and publish a new version of each,
+    all in one transaction. files maps every entry's file_id to its loaded record.
+    Raises FileNotEmpty, committing nothing, if a new_file entry's file already has content.
+    """
+    file_ids = list(files)
+    
+    # Lock the file rows so concurrent commits to the same files are serialized
+    db.query(models.File.file_id).filter(models.File.file_id.in_(file_ids)).with_for_update().all()
+    
+    # Existing chunks and latest version numbers for all files, one query each
+    chunks_by_file = {file_id: [] for file_id in file_ids}
+    for chunk in db.query(models.FileChunk).filter(models.FileChunk.file_id.in_(file_ids)):
+        chunks_by_file[chunk.file_id].append(chunk)
+    latest_versions = dict(
+        db.query(models.FileVersion.file_id, func.max(models.FileVersion.version_number))
+        .filter(models.FileVersion.file_id.in_(file_ids))
+        .group_by(models.FileVersion.file_id)
+    )
+    
+    new_chunks = []
+    versions = []
+    trees = []
+    for entry in entries:
+        if entry.new_file and (chunks_by_file[entry.file_id] or entry.file_id in latest_versions):
+            db.rollback()
+            raise FileNotEmpty(entry.file_id)
+        added = [
+            models.FileChunk(
+                file_id=entry.file_id,
+                chunk_index=chunk.chunk_index,
+                storage_path=chunk.storage_path,
+                digest=chunk.digest,
+                size=chunk.size
+            )
+            for chunk in entry.chunks
+        ]
+        new_chunks.extend(added)
+        files[entry.file_id].file_size = entry.file_size
+        
+        file_chunks = sorted(chunks_by_file[entry.file_id] + added, key=lambda c: c.chunk_index)
+        levels = _merkle_levels(file_chunks)
+        versions.append(models.FileVersion(
+            file_id=entry.file_id,
+            version_number=(latest_versions.get(entry.file_id) or 0) + 1,
+            storage_path=entry.storage_path,
+            merkle_root=merkle.root_of(levels),
+            merkle_leaf_count=len(file_chunks)
+        ))
+        trees.append(levels)
+    
+    db.add_all(new_chunks)
+    db.add_all(versions)
+    db.flush()
+    db.bulk_save_objects([
+        node for version, levels in zip(versions, trees) for node in _merkle_nodes(version.id, levels)
+    ])
+    committed = [
+        {"file_id": v.file_id, "version_number": v.version_number, "merkle_root": v.merkle_root}
+        for v in versions
+    ]
+    db.commit()
+    return committed
+
+
+def get_file_version(db: Session, file_id: str, version_number: int):
+    """
+    Get one version of a file by number
+    """
+    return db.query(models.FileVersion).filter(
+        models.FileVersion.file_id == file_id,
+        models.FileVersion.version_number == version_number
+    ).first()
+
+
+def get_merkle_nodes(db: Session, version_id: int, level: int, positions) -> Dict[int, str]:
+    """
+    Digests at the given positions of one level of a version's Merkle tree, by position
+    """
+    positions = sorted(set(positions))
+    found = {}
+    for start in range(0, len(positions), MERKLE_QUERY_BATCH):
+        found.update(db.query(models.MerkleNode.position, models.MerkleNode.digest).filter(
+            models.MerkleNode.version_id == version_id,
+            models.MerkleNode.level == level,
+            models.MerkleNode.position.in_(positions[start:start + MERKLE_QUERY_BATCH])
+        ).all())
+    return found
+
+
+def get_merkle_level_slice(db: Session, version_id: int, level: int, start: int, count: int) -> List[str]:
+    """
+    Digests of positions [start, start + count) of one level of a version's Merkle tree
+    """
+    rows = db.query(models.MerkleNode.digest).filter(
+        models.MerkleNode.version_id == version_id,
+        models.MerkleNode.level == level,
+        models.MerkleNode.position >= start,
+        models.MerkleNode.position < start + count
+    ).order_by(models.MerkleNode.position).all()
+    return [digest for (digest,) in rows]
+
+
 def create_file_chunk(db: Session, chunk: schemas.ChunkCreate):
     """
     Create a new file chunk
@@ -116,7 +287,9 @@ def create_file_chunk(db: Session, chunk: schemas.ChunkCreate):
     db_chunk = models.FileChunk(
         file_id=chunk.file_id,
         chunk_index=chunk.chunk_index,
-        storage_path=chunk.storage_path
+        storage_path=chunk.storage_path,
+        digest=chunk.digest,
+        size=chunk.size
     )
     db.add(db_chunk)
     db.commit()
@@ -133,6 +306,15 @@ def get_file_versions(db: Session, file_id: str):
     ).order_by(models.FileVersion.version_number).all()
 
 
+def get_latest_file_version(db: Session, file_id: str):
+    """
+    Get the newest version of a file, or None if it has no versions
+    """
+    return db.query(models.FileVersion).filter(
+        models.FileVersion.file_id == file_id
+    ).order_by(models.FileVersion.version_number.desc()).first()
+
+
 def get_file_chunks(db: Session, file_id: str):
     """
     Get all chunks of a file
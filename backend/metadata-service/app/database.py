@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import logging
 import time
 
 from .config import settings
+from . import deadline
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,8 @@ def initialize_database():
                     "application_name": "metadata-service"
                 } if 'postgresql' in settings.DATABASE_URL else {}
             )
+            if 'postgresql' in settings.DATABASE_URL:
+                event.listen(engine, "checkout", apply_statement_timeout)
             
             # Test the connection
             with engine.connect() as connection:
@@ -58,6 +61,20 @@ def initialize_database():
                 logger.error("💥 All database connection attempts failed!")
                 raise Exception(f"Failed to connect to database after {max_retries} attempts: {e}")
 
+def apply_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    """Limit queries to the remaining request deadline (pool checkout hook, PostgreSQL only)"""
+    left = deadline.remaining()
+    wanted = 0 if left is None else max(1, int(left * 1000))  # milliseconds, 0 = no limit
+    if connection_record.info.get("statement_timeout", 0) == wanted:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET statement_timeout = {wanted}")
+    finally:
+        cursor.close()
+    dbapi_connection.commit()
+    connection_record.info["statement_timeout"] = wanted
+
 # Create base class for SQLAlchemy models
 Base = declarative_base()
 
@@ -85,4 +102,24 @@ def get_engine():
     """Get database engine with lazy initialization"""
     if engine is None:
         initialize_database()
-    return engine
\ No newline at end of file
+    return engine
+
+def add_missing_columns(engine, metadata):
+    """
+    Add nullable columns that exist on the models but not yet in the database.
+    create_all() only creates missing tables, so this keeps existing deployments
+    in step with new optional columns without a migration tool.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                logger.info(f"🔧 Adding column {table.name}.{column.name} ({column_type})")
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
@@ -0,0 +1,142 @@
+"""
+Request deadlines propagated between services.
+
+A caller sends the number of seconds it is still willing to wait in the
+X-Request-Timeout header. DeadlineMiddleware turns that into a deadline for the
+request: work still running when it passes is cancelled (in-flight chunk
+fetches included) and the caller gets 504, or a truncated body if the response
+had already started. Outgoing HTTP calls forward what is left, minus
+DEADLINE_FORWARD_MARGIN so the callee gives up first, and never wait longer
+than that themselves.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "X-Request-Timeout"
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", "3600"))  # caps budgets sent by callers
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("DEFAULT_REQUEST_TIMEOUT", "0"))  # budget without the header, 0 = none
+DEADLINE_FORWARD_MARGIN = float(os.getenv("DEADLINE_FORWARD_MARGIN", "0.05"))  # seconds kept for our own reply
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed before the work could start"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, None without a deadline"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check():
+    """Raise DeadlineExceeded if the current request is out of time"""
+    if expired():
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def parse_budget(value: Optional[str]) -> Optional[float]:
+    """Budget in seconds from a header value, falling back to DEFAULT_REQUEST_TIMEOUT"""
+    default = DEFAULT_REQUEST_TIMEOUT or None
+    if value is None:
+        return default
+    try:
+        budget = float(value)
+    except ValueError:
+        return default
+    if not math.isfinite(budget):
+        return default
+    return min(budget, MAX_REQUEST_TIMEOUT)
+
+
+async def apply_to_request(request):
+    """httpx request hook: forward the remaining budget and cap the call's own timeouts by it"""
+    left = remaining()
+    if left is None:
+        return
+    forwarded = left - DEADLINE_FORWARD_MARGIN
+    if forwarded <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded before calling {request.url.host}")
+    request.headers[DEADLINE_HEADER] = f"{forwarded:.3f}"
+    timeouts = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {
+        name: left if value is None else min(value, left) for name, value in timeouts.items()
+    }
+
+
+async def _send_timeout(send):
+    body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 504,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class DeadlineMiddleware:
+    """ASGI middleware enforcing X-Request-Timeout on the whole request, response body included"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = DEADLINE_HEADER.lower().encode()
+        value = next((v.decode("latin-1") for k, v in scope["headers"] if k == header), None)
+        budget = parse_budget(value)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        if budget <= 0:
+            await _send_timeout(send)
+            return
+
+        progress = {"started": False, "finished": False, "timed_out": False}
+
+        async def tracked_send(message):
+            if message["type"] == "http.response.start":
+                progress["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                progress["finished"] = True
+                # Background tasks run after the reply and are not bound by the caller's deadline
+                _deadline.set(None)
+            await send(message)
+
+        token = _deadline.set(time.monotonic() + budget)
+        task = asyncio.ensure_future(self.app(scope, receive, tracked_send))  # copies the context
+        _deadline.reset(token)
+
+        def on_deadline():
+            if not progress["finished"]:
+                progress["timed_out"] = True
+                task.cancel()
+
+        timer = asyncio.get_running_loop().call_later(budget, on_deadline)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not progress["timed_out"]:
+                raise
+            logger.warning(f"⏰ {scope['method']} {scope['path']} cancelled after its {budget:.2f}s deadline")
+            if not progress["started"]:
+                await _send_timeout(send)
+            # Otherwise the body is cut short and the server closes the connection
+        finally:
+            timer.cancel()
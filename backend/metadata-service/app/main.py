@@ -1,16 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, BackgroundTasks
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import logging
-import requests
 import asyncio  # ✅ ADD: Missing import for asyncio
 
-from . import models, schemas, crud
-from .database import get_db, get_engine, initialize_database
+from . import models, schemas, crud, http_client, merkle, deadline
+from .database import get_db, get_engine, initialize_database, add_missing_columns
 from .config import settings
 from .auth import get_current_user
+from .services.manifest_events import publish_manifest_invalidation
+from .services.block_storage_client import BlockStorageClient
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +34,7 @@ def create_tables():
         
         # Create tables (only creates missing ones)
         models.Base.metadata.create_all(bind=engine)
+        add_missing_columns(engine, models.Base.metadata)
         logger.info("✅ Database tables created successfully")
         
     except Exception as e:
@@ -50,6 +52,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# Enforce X-Request-Timeout deadlines (added first so CORS headers still wrap its 504s)
+app.add_middleware(deadline.DeadlineMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -66,8 +71,20 @@ async def startup_event():
         create_tables()
     except Exception as e:
         logger.error(f"Startup database initialization failed: {e}")
+    await http_client.startup()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled HTTP connections"""
+    await http_client.shutdown()
 
 # Health check endpoint - public, no auth required
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: deadline.DeadlineExceeded):
+    """The caller's deadline ran out before a downstream call could be made"""
+    logger.warning(f"⏰ {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 @app.get("/health")
 def health_check():
     """Health check with database connectivity test"""
@@ -126,6 +143,61 @@ def create_file(file: schemas.FileInput, db: Session = Depends(get_db), current_
         raise HTTPException(status_code=500, detail=f"Failed to create file: {str(e)}")
 
 
+@app.post("/files/batch", response_model=List[schemas.FileCreated], status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_current_user)])
+def create_files_batch(batch: schemas.FileBatchInput, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    """
+    Create many file metadata entries in one transaction (folder uploads)
+    """
+    user_id = current_user.get('sub')
+    user_email = current_user.get('email') or current_user.get('name', f"user_{user_id.split('|')[-1]}")
+    try:
+        file_ids = crud.create_files(db, batch.files, owner_user_id=user_id, owner_email=user_email)
+    except Exception as e:
+        logger.error(f"❌ Error creating {len(batch.files)} files: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to create files: {str(e)}")
+    return [
+        schemas.FileCreated(file_id=file_id, filename=file.filename)
+        for file_id, file in zip(file_ids, batch.files)
+    ]
+
+
+@app.post("/files/batch/commit", response_model=List[schemas.FileBatchCommitted], dependencies=[Depends(get_current_user)])
+def commit_files_batch(
+    batch: schemas.FileBatchCommit,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Register chunks and file sizes and create a new version for many files in one transaction
+    """
+    file_ids = [entry.file_id for entry in batch.files]
+    if len(set(file_ids)) != len(file_ids):
+        raise HTTPException(status_code=400, detail="Each file may appear only once per batch")
+    
+    files = crud.get_owned_files(db, file_ids, current_user.get('sub'))
+    missing = [file_id for file_id in file_ids if file_id not in files]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Files not found", "missing": missing})
+    
+    try:
+        committed = crud.commit_file_batch(db, files, batch.files)
+    except crud.FileNotEmpty as e:
+        raise HTTPException(status_code=409, detail=f"File {e} already has content")
+    except Exception as e:
+        logger.error(f"❌ Error committing batch of {len(file_ids)} files: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to commit files: {str(e)}")
+    
+    # New files have no cached manifests; only files that had a version before need invalidating
+    for version in committed:
+        if version["version_number"] > 1:
+            background_tasks.add_task(
+                publish_manifest_invalidation, version["file_id"], "version", version["version_number"]
+            )
+    logger.info(f"✅ Committed batch of {len(committed)} files")
+    return committed
+
+
 @app.get("/files/{file_id}", response_model=schemas.File, dependencies=[Depends(get_current_user)])
 def read_file(file_id: str, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
     """
@@ -196,13 +268,14 @@ async def read_files(skip: int = 0, limit: int = 100, db: Session = Depends(get_
         raise HTTPException(status_code=500, detail="Failed to retrieve files")
 
 @app.put("/files/{file_id}", response_model=schemas.File, dependencies=[Depends(get_current_user)])
-def update_file(file_id: str, file_data: schemas.FileUpdate, db: Session = Depends(get_db)):
+def update_file(file_id: str, file_data: schemas.FileUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Update file metadata including file size
     """
     db_file = crud.update_file(db, file_id=file_id, file_data=file_data)
     if db_file is None:
         raise HTTPException(status_code=404, detail="File not found")
+    background_tasks.add_task(publish_manifest_invalidation, file_id, "update")
     return db_file
 
 
@@ -243,6 +316,9 @@ async def delete_file(file_id: str, request: Request, db: Session = Depends(get_
         
         logger.info(f"File {file_id} deleted successfully")
         
+        # Cached download manifests must not outlive the file
+        await publish_manifest_invalidation(file_id, "delete")
+        
         if failed_chunks > 0:
             logger.warning(f"File deleted but {failed_chunks} chunks may remain in storage")
         
@@ -253,35 +329,25 @@ async def delete_file(file_id: str, request: Request, db: Session = Depends(get_
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
 async def delete_chunks_from_storage(chunks: list, auth_header: str):
-    """Delete chunks directly from block storage service"""
+    """Delete chunks from block storage with bulk deletes (1000 chunks per request)"""
+    chunk_ids = [chunk.storage_path for chunk in chunks]
+    results = await BlockStorageClient().delete_chunks(chunk_ids, auth_header.replace("Bearer ", ""))
+    
     deleted_count = 0
     failed_count = 0
-    
-    for chunk in chunks:
-        try:
-            chunk_id = chunk.storage_path
-            response = requests.delete(
-                f"http://block-storage:8000/chunks/{chunk_id}",
-                headers={"Authorization": auth_header},
-                timeout=10.0
-            )
-            
-            if response.status_code in [200, 204, 404]:  # 404 is OK (already deleted)
-                deleted_count += 1
-                logger.info(f"Deleted chunk {chunk_id}")
-            else:
-                failed_count += 1
-                logger.warning(f"Failed to delete chunk {chunk_id}: HTTP {response.status_code}")
-                
-        except Exception as e:
+    for chunk_id in chunk_ids:
+        result = results.get(chunk_id, {"deleted": False, "error": "no result"})
+        if result["deleted"]:
+            deleted_count += 1
+        else:
             failed_count += 1
-            logger.error(f"Error deleting chunk {chunk.storage_path}: {e}")
+            logger.warning(f"Failed to delete chunk {chunk_id}: {result.get('error')}")
     
     return deleted_count, failed_count
 
 # Version endpoints - protected
 @app.post("/files/{file_id}/versions", response_model=schemas.FileVersion, dependencies=[Depends(get_current_user)])
-def create_version(file_id: str, version: schemas.VersionCreate, db: Session = Depends(get_db)):
+def create_version(file_id: str, version: schemas.VersionCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Create a new version for a file
     """
@@ -291,7 +357,11 @@ def create_version(file_id: str, version: schemas.VersionCreate, db: Session = D
         raise HTTPException(status_code=404, detail="File not found")
     
     # Create version
-    return crud.create_file_version(db=db, version=version)
+    db_version = crud.create_file_version(db=db, version=version)
+    background_tasks.add_task(
+        publish_manifest_invalidation, file_id, "version", db_version.version_number
+    )
+    return db_version
 
 
 @app.get("/files/{file_id}/versions", response_model=List[schemas.FileVersion], dependencies=[Depends(get_current_user)])
@@ -317,7 +387,7 @@ def read_versions(file_id: str, db: Session = Depends(get_db)):
 
 # Chunk endpoints - protected
 @app.post("/files/{file_id}/chunks", response_model=schemas.FileChunk, dependencies=[Depends(get_current_user)])
-def create_chunk(file_id: str, chunk: schemas.ChunkCreate, db: Session = Depends(get_db)):
+def create_chunk(file_id: str, chunk: schemas.ChunkCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Create a new chunk for a file
     """
@@ -327,7 +397,9 @@ def create_chunk(file_id: str, chunk: schemas.ChunkCreate, db: Session = Depends
         raise HTTPException(status_code=404, detail="File not found")
     
     # Create chunk
-    return crud.create_file_chunk(db=db, chunk=chunk)
+    db_chunk = crud.create_file_chunk(db=db, chunk=chunk)
+    background_tasks.add_task(publish_manifest_invalidation, file_id, "chunk")
+    return db_chunk
 
 
 @app.get("/files/{file_id}/chunks", response_model=List[schemas.FileChunk], dependencies=[Depends(get_current_user)])
@@ -352,25 +424,39 @@ def read_chunks(file_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to get chunks")
 
 @app.get("/files/{file_id}/download-info", dependencies=[Depends(get_current_user)])
-def get_file_download_info(file_id: str, db: Session = Depends(get_db)):
+def get_file_download_info(file_id: str, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
     """
-    Get file information needed for download (filename + chunk list)
+    Get file information needed for download (filename + chunk list), for owners and share recipients
     """
     try:
-        # Get file metadata
-        db_file = crud.get_file(db, file_id=file_id)
+        # Chunker caches this answer per user, so it must only be given to users with access
+        db_file, _ = crud.get_file_with_access_check(db, file_id, current_user.get('sub'))
         if db_file is None:
-            raise HTTPException(status_code=404, detail="File not found")
+            raise HTTPException(status_code=404, detail="File not found or access denied")
         
         # Get chunks in correct order
         chunks = crud.get_file_chunks(db, file_id=file_id)
+        latest_version = crud.get_latest_file_version(db, file_id=file_id)
+        
+        # Newest change to the file record, its versions or its chunks
+        timestamps = [db_file.created_at, db_file.updated_at]
+        if latest_version:
+            timestamps.append(latest_version.created_at)
+        timestamps.extend(chunk.created_at for chunk in chunks)
+        last_modified = max((t for t in timestamps if t is not None), default=None)
         
         # Return simple dict to avoid serialization issues
         return {
             "file_id": file_id,
             "filename": db_file.filename,
+            "file_size": db_file.file_size or 0,
+            "version": latest_version.version_number if latest_version else 0,
+            "last_modified": last_modified.isoformat() if last_modified else None,
             "chunk_count": len(chunks),
-            "chunk_ids": [chunk.storage_path for chunk in chunks]
+            "chunk_ids": [chunk.storage_path for chunk in chunks],
+            # Aligned with chunk_ids; None for chunks uploaded before digests were recorded
+            "chunk_digests": [chunk.digest for chunk in chunks],
+            "chunk_sizes": [chunk.size for chunk in chunks]
         }
     except HTTPException:
         raise
@@ -378,6 +464,142 @@ def get_file_download_info(file_id: str, db: Session = Depends(get_db)):
         logger.error(f"Error getting download info for {file_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to get download info")
 
+# Merkle tree endpoints - protected
+def get_version_tree(db: Session, file_id: str, user_id: str, version: Optional[int]):
+    """Resolve a readable file version and the level sizes of its Merkle tree (leaves first)"""
+    db_file, _ = crud.get_file_with_access_check(db, file_id, user_id)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found or access denied")
+    
+    if version is None:
+        db_version = crud.get_latest_file_version(db, file_id=file_id)
+    else:
+        db_version = crud.get_file_version(db, file_id=file_id, version_number=version)
+    if db_version is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    if db_version.merkle_root is None:
+        raise HTTPException(status_code=404, detail="No Merkle tree recorded for this version")
+    
+    # Nodes are read from merkle_nodes as needed, never the whole tree
+    return db_version, merkle.level_sizes(db_version.merkle_leaf_count or 0)
+
+@app.get("/files/{file_id}/merkle", dependencies=[Depends(get_current_user)])
+def get_merkle_root(file_id: str, version: Optional[int] = None, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    """
+    Merkle root of a file version (latest by default) plus the tree shape
+    """
+    db_version, sizes = get_version_tree(db, file_id, current_user.get("sub"), version)
+    return {
+        "file_id": file_id,
+        "version": db_version.version_number,
+        "root": db_version.merkle_root,
+        "leaf_count": db_version.merkle_leaf_count,
+        "height": len(sizes),
+        "level_sizes": sizes
+    }
+
+@app.get("/files/{file_id}/merkle/nodes", dependencies=[Depends(get_current_user)])
+def get_merkle_nodes(
+    file_id: str,
+    level: int,
+    start: int = 0,
+    count: int = 256,
+    version: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    A slice of one tree level (0 = leaves), so clients can descend into subtrees
+    """
+    db_version, sizes = get_version_tree(db, file_id, current_user.get("sub"), version)
+    if not 0 <= level < len(sizes):
+        raise HTTPException(status_code=400, detail=f"level must be between 0 and {len(sizes) - 1}")
+    if start < 0 or not 1 <= count <= 4096:
+        raise HTTPException(status_code=400, detail="start must be >= 0 and count between 1 and 4096")
+    return {
+        "file_id": file_id,
+        "version": db_version.version_number,
+        "level": level,
+        "start": start,
+        "nodes": crud.get_merkle_level_slice(db, db_version.id, level, start, count)
+    }
+
+@app.get("/files/{file_id}/merkle/proof", dependencies=[Depends(get_current_user)])
+def get_merkle_proof(
+    file_id: str,
+    chunk_index: int,
+    count: int = 1,
+    version: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Audit paths for chunks [chunk_index, chunk_index + count) so a client can verify
+    a byte range against the root without fetching the rest of the file
+    """
+    db_version, sizes = get_version_tree(db, file_id, current_user.get("sub"), version)
+    leaf_count = db_version.merkle_leaf_count or 0
+    if not 1 <= count <= 1024 or chunk_index < 0 or chunk_index + count > leaf_count:
+        raise HTTPException(status_code=400, detail=f"Chunk range out of bounds (file has {leaf_count} chunks)")
+    
+    # Only the leaves in range and the siblings on their audit paths, one query per level
+    indexes = range(chunk_index, chunk_index + count)
+    wanted = {0: set(indexes)}
+    for index in indexes:
+        for level, position in merkle.proof_positions(sizes, index):
+            wanted.setdefault(level, set()).add(position)
+    nodes = {level: crud.get_merkle_nodes(db, db_version.id, level, positions) for level, positions in wanted.items()}
+    return {
+        "file_id": file_id,
+        "version": db_version.version_number,
+        "root": db_version.merkle_root,
+        "proofs": [
+            {
+                "chunk_index": index,
+                "leaf": nodes[0][index],
+                "path": merkle.audit_path(lambda level, position: nodes[level][position], sizes, index)
+            }
+            for index in indexes
+        ]
+    }
+
+@app.get("/files/{file_id}/merkle/diff", dependencies=[Depends(get_current_user)])
+def get_merkle_diff(
+    file_id: str,
+    from_version: int,
+    to_version: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Chunk indexes that changed between two versions (to_version defaults to latest)
+    """
+    user_id = current_user.get("sub")
+    old_version, old_sizes = get_version_tree(db, file_id, user_id, from_version)
+    new_version, new_sizes = get_version_tree(db, file_id, user_id, to_version)
+    
+    def fetch(level: int, positions: List[int]):
+        return (crud.get_merkle_nodes(db, old_version.id, level, positions),
+                crud.get_merkle_nodes(db, new_version.id, level, positions))
+    
+    if old_version.merkle_root == new_version.merkle_root:
+        changed, compared = [], 1
+    else:
+        # Descends only into differing subtrees, reading their nodes level by level
+        changed, compared = merkle.diff_by_level(old_sizes, new_sizes, fetch)
+    
+    return {
+        "file_id": file_id,
+        "from_version": old_version.version_number,
+        "to_version": new_version.version_number,
+        "from_root": old_version.merkle_root,
+        "to_root": new_version.merkle_root,
+        "from_chunk_count": old_version.merkle_leaf_count,
+        "to_chunk_count": new_version.merkle_leaf_count,
+        "changed_chunks": changed,
+        "nodes_compared": compared
+    }
+
 # Sharing endpoints - protected
 @app.post("/files/{file_id}/share", response_model=schemas.SharingPermission, dependencies=[Depends(get_current_user)])
 async def share_file(
@@ -974,6 +1196,9 @@ async def revoke_file_sharing(
         if not result:
             raise HTTPException(status_code=404, detail="Sharing permission not found")
         
+        # Revoked users must not keep downloading through a cached manifest
+        await publish_manifest_invalidation(file_id, "share")
+        
         return JSONResponse(status_code=204, content={})
         
     except HTTPException:
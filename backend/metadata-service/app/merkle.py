@@ -0,0 +1,144 @@
+"""
+Merkle trees over chunk digests.
+
+Leaves are the SHA-256 digests of a file version's chunks in order. Leaf and
+inner hashes use distinct prefixes (as in RFC 6962) so a leaf can never be
+passed off as an inner node. A node without a sibling is promoted unchanged.
+
+Levels are stored bottom-up: level 0 holds the leaf hashes, the last level
+holds the single root.
+"""
+import hashlib
+from typing import Callable, Dict, List, Tuple
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# Digest used for the (empty) tree of a file without chunks
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+# fetch(level, positions) -> ({position: old hash}, {position: new hash}), see diff_by_level
+NodeFetcher = Callable[[int, List[int]], Tuple[Dict[int, str], Dict[int, str]]]
+
+
+def leaf_hash(chunk_digest: str) -> str:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(chunk_digest)).hexdigest()
+
+
+def node_hash(left: str, right: str) -> str:
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def legacy_chunk_digest(storage_path: str) -> str:
+    """Stand-in digest for chunks uploaded before content digests were recorded"""
+    return hashlib.sha256(storage_path.encode("utf-8")).hexdigest()
+
+
+def build_levels(chunk_digests: List[str]) -> List[List[str]]:
+    """Build every level of the tree, leaves first"""
+    if not chunk_digests:
+        return [[EMPTY_ROOT]]
+    levels = [[leaf_hash(d) for d in chunk_digests]]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        above = [node_hash(below[i], below[i + 1]) for i in range(0, len(below) - 1, 2)]
+        if len(below) % 2:
+            above.append(below[-1])
+        levels.append(above)
+    return levels
+
+
+def root_of(levels: List[List[str]]) -> str:
+    return levels[-1][0]
+
+
+def level_sizes(leaf_count: int) -> List[int]:
+    """Number of nodes on each level of a tree over `leaf_count` leaves, leaves first"""
+    sizes = [max(leaf_count, 1)]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def proof_positions(sizes: List[int], index: int) -> List[Tuple[int, int]]:
+    """(level, position) of the sibling hashes on the audit path of leaf `index`, bottom up"""
+    if not 0 <= index < sizes[0]:
+        raise IndexError(f"Leaf {index} out of range")
+    positions = []
+    for level, size in enumerate(sizes[:-1]):
+        sibling = index ^ 1
+        if sibling < size:
+            positions.append((level, sibling))
+        index //= 2
+    return positions
+
+
+def audit_path(node: Callable[[int, int], str], sizes: List[int], index: int) -> List[Dict[str, str]]:
+    """Audit path for leaf `index` of a tree with the given level sizes, reading hashes with node(level, position)"""
+    return [
+        {"side": "left" if position % 2 == 0 else "right", "hash": node(level, position)}
+        for level, position in proof_positions(sizes, index)
+    ]
+
+
+def proof(levels: List[List[str]], index: int) -> List[Dict[str, str]]:
+    """Audit path for leaf `index`: sibling hashes from the bottom up"""
+    return audit_path(lambda level, position: levels[level][position], [len(level) for level in levels], index)
+
+
+def verify_proof(chunk_digest: str, path: List[Dict[str, str]], root: str) -> bool:
+    """Check a chunk digest against a root using an audit path from `proof`"""
+    current = leaf_hash(chunk_digest)
+    for step in path:
+        if step["side"] == "left":
+            current = node_hash(step["hash"], current)
+        else:
+            current = node_hash(current, step["hash"])
+    return current == root
+
+
+def diff(old_levels: List[List[str]], new_levels: List[List[str]]) -> Tuple[List[int], int]:
+    """
+    Leaf indexes that differ between two trees, found by descending only into
+    subtrees whose hashes differ. Returns (changed_indexes, nodes_compared).
+    Leaves past the end of the shorter tree count as changed.
+    """
+    def fetch(level: int, positions: List[int]):
+        return _nodes_at(old_levels, level, positions), _nodes_at(new_levels, level, positions)
+
+    return diff_by_level([len(level) for level in old_levels], [len(level) for level in new_levels], fetch)
+
+
+def diff_by_level(old_sizes: List[int], new_sizes: List[int], fetch: NodeFetcher) -> Tuple[List[int], int]:
+    """
+    `diff` over trees read on demand, one level at a time from the top: fetch(level, positions)
+    returns the old and new hashes at those positions as two {position: hash} dicts.
+    Only the children of differing nodes are fetched, so one edit costs O(log n) nodes.
+
+    Node (level, p) covers leaves [p * 2**level, (p + 1) * 2**level) in any tree, so trees
+    of different heights line up too; a node missing from one tree differs from the other.
+    """
+    changed: List[int] = []
+    compared = 0
+    positions = [0]
+    for level in range(max(len(old_sizes), len(new_sizes)) - 1, -1, -1):
+        old_nodes, new_nodes = fetch(level, positions)
+        compared += len(positions)
+        differing = [position for position in positions if old_nodes.get(position) != new_nodes.get(position)]
+        if level == 0:
+            changed = differing
+            break
+        width = max(_size_at(old_sizes, level - 1), _size_at(new_sizes, level - 1))
+        positions = [child for position in differing for child in (2 * position, 2 * position + 1) if child < width]
+        if not positions:
+            break
+    return changed, compared
+
+
+def _size_at(sizes: List[int], level: int) -> int:
+    return sizes[level] if level < len(sizes) else 0
+
+
+def _nodes_at(levels: List[List[str]], level: int, positions: List[int]) -> Dict[int, str]:
+    nodes = levels[level] if level < len(levels) else []
+    return {position: nodes[position] for position in positions if position < len(nodes)}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -32,10 +32,14 @@ class FileVersion(Base):
     file_id = Column(String, ForeignKey("files.file_id", ondelete="CASCADE"))
     version_number = Column(Integer)
     storage_path = Column(String)
+    merkle_root = Column(String, nullable=True)        # Root over chunk digests at this version
+    merkle_leaf_count = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship with File
     file = relationship("File", back_populates="versions")
+    # Relationship with MerkleNode - persisted tree for this version
+    merkle_nodes = relationship("MerkleNode", back_populates="version", cascade="all, delete-orphan")
 
 class FileChunk(Base):
     """SQLAlchemy model for file chunks (for large files)"""
@@ -45,6 +49,8 @@ class FileChunk(Base):
     file_id = Column(String, ForeignKey("files.file_id", ondelete="CASCADE"))
     chunk_index = Column(Integer)
     storage_path = Column(String)
+    digest = Column(String, nullable=True)  # SHA-256 hex of the chunk content
+    size = Column(Integer, nullable=True)   # Chunk length in bytes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship with File
@@ -62,4 +68,19 @@ class SharingPermission(Base):
     shared_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship with File
-    file = relationship("File", back_populates="sharing_permissions")
\ No newline at end of file
+    file = relationship("File", back_populates="sharing_permissions")
+
+class MerkleNode(Base):
+    """SQLAlchemy model for one node of a file version's Merkle tree (level 0 = leaves)"""
+    __tablename__ = "merkle_nodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    version_id = Column(Integer, ForeignKey("file_versions.id", ondelete="CASCADE"), nullable=False)
+    level = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)
+    digest = Column(String, nullable=False)
+
+    # Relationship with FileVersion
+    version = relationship("FileVersion", back_populates="merkle_nodes")
+
+    __table_args__ = (Index("ix_merkle_nodes_version_level_position", "version_id", "level", "position", unique=True),)
@@ -22,6 +22,7 @@ class FileUpdate(BaseModel):
 class FileVersion(BaseModel):
     """Schema for file version"""
     version_number: int
+    merkle_root: Optional[str] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
@@ -31,6 +32,8 @@ class FileChunk(BaseModel):
     """Schema for file chunk"""
     chunk_index: int
     storage_path: str
+    digest: Optional[str] = None
+    size: Optional[int] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
@@ -53,6 +56,17 @@ class File(FileBase):
     )
 
 
+class FileBatchInput(BaseModel):
+    """Schema for creating many files at once"""
+    files: List[FileInput] = Field(..., min_length=1, max_length=1000)
+
+
+class FileCreated(BaseModel):
+    """Schema for a file created in a batch"""
+    file_id: str
+    filename: str
+
+
 # Version schemas
 class VersionCreate(BaseModel):
     """Schema for creating a new version"""
@@ -66,6 +80,37 @@ class ChunkCreate(BaseModel):
     file_id: str
     chunk_index: int
     storage_path: str
+    digest: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")  # SHA-256 hex
+    size: Optional[int] = Field(default=None, ge=0)
+
+
+class BatchChunk(BaseModel):
+    """Schema for one chunk of a file in a batch commit"""
+    chunk_index: int = Field(..., ge=0)
+    storage_path: str
+    digest: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")  # SHA-256 hex
+    size: Optional[int] = Field(default=None, ge=0)
+
+
+class FileBatchEntry(BaseModel):
+    """Schema for the uploaded content of one file in a batch commit"""
+    file_id: str
+    file_size: int = Field(..., ge=0)
+    storage_path: str  # Storage path recorded on the new version
+    chunks: List[BatchChunk] = []
+    new_file: bool = False  # Reject the commit if the file already has chunks or a version
+
+
+class FileBatchCommit(BaseModel):
+    """Schema for registering chunks and versions of many files at once"""
+    files: List[FileBatchEntry] = Field(..., min_length=1, max_length=1000)
+
+
+class FileBatchCommitted(BaseModel):
+    """Schema for the version created for one file of a batch commit"""
+    file_id: str
+    version_number: int
+    merkle_root: Optional[str] = None
 
 
 # Sharing schemas
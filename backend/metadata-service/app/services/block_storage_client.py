@@ -8,6 +8,8 @@ import logging
 import re
 import asyncio
 
+from ..http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 class Auth0UserSearchClient:
@@ -30,26 +32,26 @@ class Auth0UserSearchClient:
                 return self.management_token
             
             # Get new token
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"https://{self.auth0_domain}/oauth/token",
-                    json={
-                        "client_id": self.management_client_id,
-                        "client_secret": self.management_client_secret,
-                        "audience": f"https://{self.auth0_domain}/api/v2/",
-                        "grant_type": "client_credentials"
-                    },
-                    timeout=10.0
-                )
+            client = get_client()
+            response = await client.post(
+                f"https://{self.auth0_domain}/oauth/token",
+                json={
+                    "client_id": self.management_client_id,
+                    "client_secret": self.management_client_secret,
+                    "audience": f"https://{self.auth0_domain}/api/v2/",
+                    "grant_type": "client_credentials"
+                },
+                timeout=10.0
+            )
                 
-                if response.status_code == 200:
-                    token_data = response.json()
-                    self.management_token = token_data["access_token"]
-                    self.token_expires_at = time.time() + token_data.get("expires_in", 3600) - 60
-                    return self.management_token
-                else:
-                    logger.warning(f"Failed to get Auth0 management token: {response.status_code}")
-                    return None
+            if response.status_code == 200:
+                token_data = response.json()
+                self.management_token = token_data["access_token"]
+                self.token_expires_at = time.time() + token_data.get("expires_in", 3600) - 60
+                return self.management_token
+            else:
+                logger.warning(f"Failed to get Auth0 management token: {response.status_code}")
+                return None
                     
         except Exception as e:
             logger.warning(f"Error getting Auth0 management token: {e}")
@@ -64,37 +66,37 @@ class Auth0UserSearchClient:
                 return self._get_demo_users(query, limit)
             
             # Search in Auth0
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://{self.auth0_domain}/api/v2/users",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "q": f'email:*{query}* OR name:*{query}*',
-                        "search_engine": "v3",
-                        "per_page": limit
-                    },
-                    timeout=10.0
-                )
+            client = get_client()
+            response = await client.get(
+                f"https://{self.auth0_domain}/api/v2/users",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                params={
+                    "q": f'email:*{query}* OR name:*{query}*',
+                    "search_engine": "v3",
+                    "per_page": limit
+                },
+                timeout=10.0
+            )
                 
-                if response.status_code == 200:
-                    users = response.json()
-                    return [
-                        {
-                            "user_id": user.get("user_id"),
-                            "email": user.get("email"),
-                            "name": user.get("name", user.get("email", "Unknown")),
-                            "picture": user.get("picture", "https://via.placeholder.com/32"),
-                            "verified": user.get("email_verified", False),
-                            "source": "auth0"
-                        }
-                        for user in users
-                        if user.get("email")  # Only include users with email
-                    ]
-                else:
-                    logger.warning(f"Auth0 user search failed: {response.status_code}")
+            if response.status_code == 200:
+                users = response.json()
+                return [
+                    {
+                        "user_id": user.get("user_id"),
+                        "email": user.get("email"),
+                        "name": user.get("name", user.get("email", "Unknown")),
+                        "picture": user.get("picture", "https://via.placeholder.com/32"),
+                        "verified": user.get("email_verified", False),
+                        "source": "auth0"
+                    }
+                    for user in users
+                    if user.get("email")  # Only include users with email
+                ]
+            else:
+                logger.warning(f"Auth0 user search failed: {response.status_code}")
                     
         except Exception as e:
             logger.warning(f"Error searching Auth0 users: {e}")
@@ -109,32 +111,32 @@ class Auth0UserSearchClient:
             if not token:
                 return None
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://{self.auth0_domain}/api/v2/users",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "q": f'email:"{email}"',
-                        "search_engine": "v3"
-                    },
-                    timeout=10.0
-                )
+            client = get_client()
+            response = await client.get(
+                f"https://{self.auth0_domain}/api/v2/users",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                params={
+                    "q": f'email:"{email}"',
+                    "search_engine": "v3"
+                },
+                timeout=10.0
+            )
                 
-                if response.status_code == 200:
-                    users = response.json()
-                    if users:
-                        user = users[0]
-                        return {
-                            "user_id": user.get("user_id"),
-                            "email": user.get("email"),
-                            "name": user.get("name", user.get("email", "Unknown")),
-                            "picture": user.get("picture", "https://via.placeholder.com/32"),
-                            "verified": user.get("email_verified", False),
-                            "source": "auth0"
-                        }
+            if response.status_code == 200:
+                users = response.json()
+                if users:
+                    user = users[0]
+                    return {
+                        "user_id": user.get("user_id"),
+                        "email": user.get("email"),
+                        "name": user.get("name", user.get("email", "Unknown")),
+                        "picture": user.get("picture", "https://via.placeholder.com/32"),
+                        "verified": user.get("email_verified", False),
+                        "source": "auth0"
+                    }
                         
         except Exception as e:
             logger.warning(f"Error getting user by email from Auth0: {e}")
@@ -212,16 +214,16 @@ class BlockStorageClient:
             files = {"file": (chunk_id, chunk_data, "application/octet-stream")}
             data = {"chunk_id": chunk_id}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chunks",
-                    files=files,
-                    data=data,
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            client = get_client()
+            response = await client.post(
+                f"{self.base_url}/chunks",
+                files=files,
+                data=data,
+                headers=headers,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.json()
                 
         except Exception as e:
             logger.error(f"Error uploading chunk {chunk_id}: {e}")
@@ -234,14 +236,14 @@ class BlockStorageClient:
             if auth_token:
                 headers["Authorization"] = f"Bearer {auth_token}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/chunks/{chunk_id}",
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.content
+            client = get_client()
+            response = await client.get(
+                f"{self.base_url}/chunks/{chunk_id}",
+                headers=headers,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.content
                 
         except Exception as e:
             logger.error(f"Error downloading chunk {chunk_id}: {e}")
@@ -254,14 +256,33 @@ class BlockStorageClient:
             if auth_token:
                 headers["Authorization"] = f"Bearer {auth_token}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.base_url}/chunks/{chunk_id}",
-                    headers=headers,
-                    timeout=30.0
-                )
-                return response.status_code in [200, 204, 404]  # 404 is OK (already deleted)
+            client = get_client()
+            response = await client.delete(
+                f"{self.base_url}/chunks/{chunk_id}",
+                headers=headers,
+                timeout=30.0
+            )
+            return response.status_code in [200, 204, 404]  # 404 is OK (already deleted)
                 
         except Exception as e:
             logger.error(f"Error deleting chunk {chunk_id}: {e}")
             return False
+    
+    async def delete_chunks(self, chunk_ids: List[str], auth_token: str = None) -> Dict[str, Dict[str, Any]]:
+        """Delete many chunks, 1000 per request; returns the per-chunk results"""
+        headers = {}
+        if auth_token:
+            headers["Authorization"] = f"Bearer {auth_token}"
+        
+        results = {}
+        client = get_client()
+        for start in range(0, len(chunk_ids), 1000):
+            response = await client.post(
+                f"{self.base_url}/chunks/delete",
+                json={"chunk_ids": chunk_ids[start:start + 1000]},
+                headers=headers,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            results.update(response.json()["results"])
+        return results
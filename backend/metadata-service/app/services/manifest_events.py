@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+from ..http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+# Chunker replicas that cache download manifests (comma separated, empty disables publishing)
+MANIFEST_INVALIDATION_URLS = [
+    url.strip()
+    for url in os.getenv(
+        "MANIFEST_INVALIDATION_URLS",
+        "http://chunker-service:8002/internal/manifest-invalidations"
+    ).split(",")
+    if url.strip()
+]
+MANIFEST_INVALIDATION_TIMEOUT = float(os.getenv("MANIFEST_INVALIDATION_TIMEOUT", "2.0"))
+# Shared secret the chunker requires on invalidations (unset disables publishing)
+INTERNAL_SERVICE_TOKEN = os.getenv("INTERNAL_SERVICE_TOKEN", "")
+
+
+async def publish_manifest_invalidation(file_id: str, event: str, version: Optional[int] = None):
+    """
+    Tell every chunker replica that a file's download manifest changed.
+    Failures are logged only; the chunker cache TTL bounds staleness if a push is lost.
+    """
+    if not MANIFEST_INVALIDATION_URLS or not INTERNAL_SERVICE_TOKEN:
+        return
+
+    payload = {"file_id": file_id, "event": event, "version": version}
+
+    async def push(client: httpx.AsyncClient, url: str):
+        try:
+            response = await client.post(
+                url, json=payload, headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN}, timeout=MANIFEST_INVALIDATION_TIMEOUT
+            )
+            if response.status_code >= 400:
+                logger.warning(f"⚠️ Manifest invalidation for {file_id} rejected by {url}: HTTP {response.status_code}")
+        except Exception as e:
+            logger.warning(f"⚠️ Manifest invalidation for {file_id} to {url} failed: {e}")
+
+    client = get_client()
+    await asyncio.gather(*[push(client, url) for url in MANIFEST_INVALIDATION_URLS])
@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, merkle, models, schemas
+from app.database import Base
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def make_file(db, file_id, owner="user-1"):
+    db.add(models.File(file_id=file_id, filename=f"{file_id}.bin", owner_user_id=owner))
+    db.commit()
+
+
+def entry(file_id, count, new_file=False, salt=""):
+    return schemas.FileBatchEntry(
+        file_id=file_id,
+        file_size=count * 10,
+        storage_path=f"version_1_{file_id}",
+        new_file=new_file,
+        chunks=[
+            schemas.BatchChunk(
+                chunk_index=index,
+                storage_path=f"{file_id}_chunk_{index}",
+                digest=hashlib.sha256(f"{salt}{index}".encode()).hexdigest(),
+                size=10
+            )
+            for index in range(count)
+        ]
+    )
+
+
+def test_new_file_commit_rejects_file_with_content(db):
+    make_file(db, "a")
+    files = crud.get_owned_files(db, ["a"], "user-1")
+    crud.commit_file_batch(db, files, [entry("a", 2, new_file=True)])
+    
+    files = crud.get_owned_files(db, ["a"], "user-1")
+    with pytest.raises(crud.FileNotEmpty):
+        crud.commit_file_batch(db, files, [entry("a", 2, new_file=True, salt="x")])
+    assert db.query(models.FileChunk).filter_by(file_id="a").count() == 2
+    assert db.query(models.FileVersion).filter_by(file_id="a").count() == 1
+
+
+def test_create_files_and_commit_batch(db):
+    file_ids = crud.create_files(
+        db, [schemas.FileInput(filename=name) for name in ("a.txt", "b.txt", "c.txt")], owner_user_id="user-1"
+    )
+    assert len(set(file_ids)) == 3
+    assert [f.filename for f in (db.get(models.File, file_id) for file_id in file_ids)] == ["a.txt", "b.txt", "c.txt"]
+    
+    files = crud.get_owned_files(db, file_ids, "user-1")
+    assert crud.get_owned_files(db, file_ids, "user-2") == {}
+    entries = [entry(file_id, count) for file_id, count in zip(file_ids, (3, 1, 0))]
+    committed = crud.commit_file_batch(db, files, entries)
+    
+    assert [c["file_id"] for c in committed] == file_ids
+    assert [c["version_number"] for c in committed] == [1, 1, 1]
+    for file_id, batch_entry, version in zip(file_ids, entries, committed):
+        chunks = crud.get_file_chunks(db, file_id=file_id)
+        assert [c.storage_path for c in chunks] == [c.storage_path for c in batch_entry.chunks]
+        assert db.get(models.File, file_id).file_size == batch_entry.file_size
+        digests = [c.digest for c in batch_entry.chunks]
+        assert version["merkle_root"] == merkle.root_of(merkle.build_levels(digests))
+    
+    # Merkle nodes were stored for every level of every version
+    stored = crud.get_latest_file_version(db, file_id=file_ids[0])
+    assert stored.merkle_leaf_count == 3
+    levels = merkle.build_levels([c.digest for c in entries[0].chunks])
+    for level, nodes in enumerate(levels):
+        assert crud.get_merkle_nodes(db, stored.id, level, range(len(nodes))) == dict(enumerate(nodes))
+
+
+def test_batch_commit_appends_chunks_and_bumps_version(db):
+    make_file(db, "a")
+    crud.commit_file_batch(db, crud.get_owned_files(db, ["a"], "user-1"), [entry("a", 2)])
+    
+    grown = entry("a", 3)
+    grown.chunks = grown.chunks[2:]
+    committed = crud.commit_file_batch(db, crud.get_owned_files(db, ["a"], "user-1"), [grown])
+    
+    assert committed[0]["version_number"] == 2
+    digests = [c.digest for c in crud.get_file_chunks(db, file_id="a")]
+    assert digests == [c.digest for c in entry("a", 3).chunks]
+    assert committed[0]["merkle_root"] == merkle.root_of(merkle.build_levels(digests))
@@ -0,0 +1,99 @@
+import hashlib
+
+import pytest
+
+from app import merkle
+
+
+def digests(count, salt=""):
+    return [hashlib.sha256(f"{salt}chunk-{i}".encode()).hexdigest() for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13])
+def test_proofs_verify_against_root(count):
+    """Every chunk verifies against the root with its audit path"""
+    chunk_digests = digests(count)
+    levels = merkle.build_levels(chunk_digests)
+    root = merkle.root_of(levels)
+    for index, digest in enumerate(chunk_digests):
+        assert merkle.verify_proof(digest, merkle.proof(levels, index), root)
+
+
+def test_proof_rejects_wrong_chunk():
+    """A tampered chunk digest does not verify"""
+    chunk_digests = digests(6)
+    levels = merkle.build_levels(chunk_digests)
+    path = merkle.proof(levels, 2)
+    assert not merkle.verify_proof(chunk_digests[3], path, merkle.root_of(levels))
+
+
+def test_diff_finds_changed_and_appended_chunks():
+    """Diff reports modified chunks and chunks past the old end"""
+    old = digests(9)
+    new = list(old)
+    new[4] = hashlib.sha256(b"edited").hexdigest()
+    new.append(hashlib.sha256(b"appended").hexdigest())
+    changed, _ = merkle.diff(merkle.build_levels(old), merkle.build_levels(new))
+    assert changed == [4, 9]
+
+
+def test_diff_skips_unchanged_subtrees():
+    """A single edit in a large file compares O(log n) nodes, not every chunk"""
+    old = digests(1024)
+    new = list(old)
+    new[700] = hashlib.sha256(b"edited").hexdigest()
+    changed, compared = merkle.diff(merkle.build_levels(old), merkle.build_levels(new))
+    assert changed == [700]
+    assert compared <= 2 * 11
+
+
+def test_identical_trees_have_no_diff():
+    chunk_digests = digests(5)
+    levels = merkle.build_levels(chunk_digests)
+    assert merkle.diff(levels, merkle.build_levels(chunk_digests))[0] == []
+
+
+def test_empty_file_has_fixed_root():
+    assert merkle.root_of(merkle.build_levels([])) == merkle.EMPTY_ROOT
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 5, 8, 13, 1000])
+def test_level_sizes_match_built_tree(count):
+    """The tree shape follows from the leaf count, so it never has to be loaded"""
+    assert merkle.level_sizes(count) == [len(level) for level in merkle.build_levels(digests(count))]
+
+
+def test_proof_positions_name_the_audit_path_nodes():
+    levels = merkle.build_levels(digests(13))
+    sizes = merkle.level_sizes(13)
+    for index in range(13):
+        path = [{"side": "left" if position % 2 == 0 else "right", "hash": levels[level][position]}
+                for level, position in merkle.proof_positions(sizes, index)]
+        assert path == merkle.proof(levels, index)
+
+
+def test_diff_by_level_fetches_only_differing_subtrees():
+    """One edit in a large file reads O(log n) nodes of each tree"""
+    old = digests(100_000)
+    new = list(old)
+    new[31_337] = hashlib.sha256(b"edited").hexdigest()
+    old_levels, new_levels = merkle.build_levels(old), merkle.build_levels(new)
+    fetched = []
+
+    def fetch(level, positions):
+        fetched.extend(positions)
+        return ({p: old_levels[level][p] for p in positions if p < len(old_levels[level])},
+                {p: new_levels[level][p] for p in positions if p < len(new_levels[level])})
+
+    changed, _ = merkle.diff_by_level(merkle.level_sizes(len(old)), merkle.level_sizes(len(new)), fetch)
+    assert changed == [31_337]
+    assert len(fetched) <= 2 * 17 + 1
+
+
+def test_diff_across_tree_heights():
+    """Trees of different heights still line up position by position"""
+    old = digests(5)
+    new = digests(5) + digests(20, salt="more")
+    new[1] = hashlib.sha256(b"edited").hexdigest()
+    changed, _ = merkle.diff(merkle.build_levels(old), merkle.build_levels(new))
+    assert changed == [1] + list(range(5, 25))
@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     
     # Service settings
     SYNC_EVENT_PROCESS_INTERVAL: int = 5  # Process events every 5 seconds
+    SYNC_BATCH_CONCURRENCY: int = 4  # Events of one batch processed at a time
     
     # Auth0 settings
     AUTH0_DOMAIN: str = ""
@@ -28,6 +28,31 @@ def create_sync_event(db: Session, sync_event: schemas.SyncEventInput) -> models
     return db_event
 
 
+def create_sync_events(db: Session, batch: schemas.SyncEventBatchInput) -> list[str]:
+    """
+    Create one sync event per file of a batch in a single transaction.
+    
+    Args:
+        db: Database session
+        batch: File IDs and the event type they share
+        
+    Returns:
+        The IDs of the created sync events, in request order
+    """
+    event_ids = [str(uuid.uuid4()) for _ in batch.file_ids]
+    db.add_all([
+        models.SyncEvent(
+            event_id=event_id,
+            file_id=file_id,
+            event_type=batch.event_type,
+            status=models.EventStatus.PENDING
+        )
+        for event_id, file_id in zip(event_ids, batch.file_ids)
+    ])
+    db.commit()
+    return event_ids
+
+
 def get_sync_event(db: Session, event_id: str) -> models.SyncEvent:
     """
     Get a sync event by event ID.
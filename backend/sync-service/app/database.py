@@ -1,14 +1,35 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from os import environ
 
+from app import deadline
+
 # Get database URL from environment variable
 DATABASE_URL = environ.get("DATABASE_URL", "sqlite:///./sync_service.db")
 
 # Create SQLAlchemy engine
 engine = create_engine(DATABASE_URL)
 
+
+def apply_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    """Limit queries to the remaining request deadline (pool checkout hook, PostgreSQL only)"""
+    left = deadline.remaining()
+    wanted = 0 if left is None else max(1, int(left * 1000))  # milliseconds, 0 = no limit
+    if connection_record.info.get("statement_timeout", 0) == wanted:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET statement_timeout = {wanted}")
+    finally:
+        cursor.close()
+    dbapi_connection.commit()
+    connection_record.info["statement_timeout"] = wanted
+
+
+if DATABASE_URL.startswith("postgresql"):
+    event.listen(engine, "checkout", apply_statement_timeout)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,4 +1,7 @@
+import asyncio
+
 from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import logging
@@ -9,6 +12,7 @@ from app.database import engine, get_db
 from app.config import get_settings
 from app.auth import get_current_user
 from app.sync_processor import SyncProcessor
+from app import http_client, resilience, deadline
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
@@ -28,6 +32,9 @@ app = FastAPI(
     version=settings.API_VERSION,
 )
 
+# Enforce X-Request-Timeout deadlines (added first so CORS headers still wrap its 504s)
+app.add_middleware(deadline.DeadlineMiddleware)
+
 # Add CORS middleware - IMPORTANT: This must be added BEFORE other routes
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +45,25 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: deadline.DeadlineExceeded):
+    """The caller's deadline ran out before a downstream call could be made"""
+    logger.warning(f"⏰ {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the pooled HTTP client shared by all inter-service calls"""
+    await http_client.startup()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled connections"""
+    await http_client.shutdown()
+
+
 # Background task to process sync events
 async def process_sync_event(event_id: str, auth_token: str):
     """
@@ -81,6 +107,20 @@ async def process_sync_event(event_id: str, auth_token: str):
         db.close()
 
 
+async def process_sync_event_batch(event_ids: List[str], auth_token: str):
+    """
+    Process the events of a batch, SYNC_BATCH_CONCURRENCY at a time.
+    """
+    semaphore = asyncio.Semaphore(settings.SYNC_BATCH_CONCURRENCY)
+    
+    async def process(event_id: str):
+        async with semaphore:
+            await process_sync_event(event_id, auth_token)
+    
+    await asyncio.gather(*[process(event_id) for event_id in event_ids])
+    logger.info(f"Finished sync event batch of {len(event_ids)} events")
+
+
 @app.post("/sync-events", response_model=schemas.SyncEventResponse, tags=["Sync"], dependencies=[Depends(get_current_user)])
 async def create_sync_event(
     sync_event: schemas.SyncEventInput,
@@ -120,6 +160,42 @@ async def sync_events_options():
     """Handle OPTIONS preflight for sync-events endpoint"""
     return {"message": "OK"}
 
+
+@app.post("/sync-events/batch", response_model=schemas.SyncEventBatchResponse, tags=["Sync"], dependencies=[Depends(get_current_user)])
+async def create_sync_event_batch(
+    batch: schemas.SyncEventBatchInput,
+    background_tasks: BackgroundTasks,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Submit one sync event for many files (e.g. a folder upload).
+    Each file still gets its own event record, so per-file status works as usual.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+    
+    access_token = auth_header.split(" ")[1]
+    user_id = current_user.get("sub")
+    
+    logger.info(f"User {user_id} creating {batch.event_type.value} sync events for {len(batch.file_ids)} files")
+    
+    event_ids = crud.create_sync_events(db, batch)
+    background_tasks.add_task(process_sync_event_batch, event_ids, access_token)
+    
+    return schemas.SyncEventBatchResponse(
+        message=f"{len(event_ids)} {batch.event_type.value} sync events received and being processed",
+        event_ids=event_ids
+    )
+
+
+@app.options("/sync-events/batch")
+async def sync_events_batch_options():
+    """Handle OPTIONS preflight for batch sync-events endpoint"""
+    return {"message": "OK"}
+
 @app.get("/sync-events", response_model=List[schemas.SyncEventDB], tags=["Sync"], dependencies=[Depends(get_current_user)])
 async def get_sync_events(
     skip: int = 0,
@@ -198,11 +274,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, including circuit breaker and bulkhead state per dependency"""
     return {
-        "status": "healthy", 
+        "status": "degraded" if resilience.degraded() else "healthy", 
         "service": "sync-service",
-        "version": settings.API_VERSION
+        "version": settings.API_VERSION,
+        "dependencies": resilience.snapshot()
     }
 
 @app.options("/health")
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -25,12 +25,24 @@ class SyncEventInput(BaseModel):
     event_type: EventType = Field(..., description="Type of sync event being triggered")
 
 
+class SyncEventBatchInput(BaseModel):
+    """Pydantic schema for one sync event covering many files."""
+    file_ids: List[str] = Field(..., min_length=1, max_length=1000, description="Files affected by the event")
+    event_type: EventType = Field(..., description="Type of sync event being triggered")
+
+
 class SyncEventResponse(BaseModel):
     """Pydantic schema for sync event response."""
     message: str = Field("Sync event successfully received", description="Confirmation message")
     event_id: str = Field(..., description="Unique ID assigned to the received sync event")
 
 
+class SyncEventBatchResponse(BaseModel):
+    """Pydantic schema for batch sync event response."""
+    message: str = Field("Sync events successfully received", description="Confirmation message")
+    event_ids: List[str] = Field(..., description="Event ID per file, in request order")
+
+
 class SyncEventDB(BaseModel):
     """Pydantic schema for sync event database model."""
     id: int
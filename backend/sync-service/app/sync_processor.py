@@ -3,6 +3,7 @@ import logging
 import os
 from typing import Dict, Any
 from . import models
+from .resilience import DependencyUnavailable, Downstream
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +12,10 @@ METADATA_SERVICE_URL = os.getenv("METADATA_SERVICE_URL", "http://metadata-servic
 BLOCK_STORAGE_SERVICE_URL = os.getenv("BLOCK_STORAGE_SERVICE_URL", "http://block-storage:8000")
 CHUNKER_SERVICE_URL = os.getenv("CHUNKER_SERVICE_URL", "http://chunker-service:8002")
 
+# Circuit breaker and bulkhead per downstream, so a sick dependency fails sync events fast
+metadata_service = Downstream("metadata-service", max_concurrent=50, timeout=10.0)
+block_storage = Downstream("block-storage", max_concurrent=50, timeout=10.0)
+
 class SyncProcessor:
     """Handles actual synchronization logic with other services"""
     
@@ -21,65 +26,46 @@ class SyncProcessor:
             "Content-Type": "application/json"
         }
     
-    async def _verify_chunks_concurrently(self, chunks: list, max_concurrent: int = 3) -> tuple[int, list]:
+    async def _verify_chunks_concurrently(self, chunks: list) -> tuple[int, list]:
         """
-        🚀 CONCURRENT chunk verification for sync service
-        This prevents sync service from interfering with chunker downloads
+        🚀 BATCHED chunk verification for sync service
+        One POST /chunks/stat per 1000 chunks: existence comes from MinIO object
+        metadata, no chunk data is transferred
         """
         import asyncio
         
-        logger.info(f"🔥 Starting CONCURRENT chunk verification for {len(chunks)} chunks (max {max_concurrent} concurrent)")
-        
-        # Create semaphore to limit concurrent verification
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def verify_single_chunk_with_index(chunk: dict, index: int) -> tuple[int, bool, dict]:
-            """Verify a single chunk and return result with index"""
-            async with semaphore:
-                try:
-                    chunk_path = chunk.get("storage_path", f"unknown_chunk_{chunk.get('chunk_index', 0)}")
-                    logger.debug(f"⚡ Verifying chunk {index+1}/{len(chunks)}: {chunk_path}")
-                    
-                    exists = await self._verify_chunk_exists(chunk_path)
-                    logger.debug(f"✅ Chunk {index+1}/{len(chunks)} verified: {exists}")
-                    return (index, exists, chunk)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Failed to verify chunk {index+1}/{len(chunks)}: {e}")
-                    return (index, False, chunk)
-        
-        # Create all verification tasks
-        tasks = [
-            verify_single_chunk_with_index(chunk, index) 
-            for index, chunk in enumerate(chunks)
-        ]
+        logger.info(f"🔥 Starting BATCHED chunk verification for {len(chunks)} chunks")
         
         try:
-            # 🚀 Execute all verifications concurrently!
             start_time = asyncio.get_event_loop().time()
-            results = await asyncio.gather(*tasks)
-            end_time = asyncio.get_event_loop().time()
-            
-            verification_time = end_time - start_time
             
-            # Process results
             verified_chunks = 0
             missing_chunks = []
+            for start in range(0, len(chunks), 1000):
+                batch = chunks[start:start + 1000]
+                chunk_paths = [
+                    chunk.get("storage_path", f"unknown_chunk_{chunk.get('chunk_index', 0)}")
+                    for chunk in batch
+                ]
+                stats = await self._stat_chunks(chunk_paths)
+                for chunk, chunk_path in zip(batch, chunk_paths):
+                    if stats.get(chunk_path, {}).get("exists"):
+                        verified_chunks += 1
+                    else:
+                        missing_chunks.append(chunk)
             
-            for index, exists, chunk in results:
-                if exists:
-                    verified_chunks += 1
-                else:
-                    missing_chunks.append(chunk)
+            verification_time = asyncio.get_event_loop().time() - start_time
             
-            logger.info(f"🎉 CONCURRENT CHUNK VERIFICATION COMPLETE!")
+            logger.info(f"🎉 BATCHED CHUNK VERIFICATION COMPLETE!")
             logger.info(f"📊 Verified {len(chunks)} chunks in {verification_time:.2f}s")
             logger.info(f"✅ {verified_chunks} verified, ❌ {len(missing_chunks)} missing")
             
             return (verified_chunks, missing_chunks)
             
+        except DependencyUnavailable:
+            raise  # Not evidence of missing chunks: fail the event so it can be retried
         except Exception as e:
-            logger.error(f"❌ Concurrent chunk verification failed: {e}")
+            logger.error(f"❌ Batched chunk verification failed: {e}")
             # Fallback to sequential verification
             return await self._verify_chunks_sequential(chunks)
 
@@ -206,20 +192,26 @@ class SyncProcessor:
             deleted_chunks = 0
             failed_deletions = 0
             
-            for chunk in chunks:
+            chunk_paths = [chunk.get("storage_path", f"chunk_{chunk.get('chunk_index', 0)}") for chunk in chunks]
+            for start in range(0, len(chunk_paths), 1000):
+                batch = chunk_paths[start:start + 1000]
                 try:
-                    chunk_path = chunk.get("storage_path", f"chunk_{chunk.get('chunk_index', 0)}")
-                    logger.info(f"Attempting to delete chunk: {chunk_path}")
-                    
-                    # Call block storage service to delete chunk
-                    await self._delete_chunk(chunk_path)
-                    deleted_chunks += 1
-                    logger.info(f"✅ Successfully deleted chunk {chunk_path}")
-                    
+                    # One multi-object delete per 1000 chunks
+                    results = await self._delete_chunks(batch)
                 except Exception as e:
-                    failed_deletions += 1
-                    logger.error(f"❌ Failed to delete chunk {chunk.get('storage_path', 'unknown')}: {e}")
-                    # Continue with other chunks even if one fails
+                    failed_deletions += len(batch)
+                    logger.error(f"❌ Failed to delete {len(batch)} chunks: {e}")
+                    # Continue with the remaining batches even if one fails
+                    continue
+                
+                for chunk_path in batch:
+                    result = results.get(chunk_path, {"deleted": False, "error": "no result"})
+                    if result["deleted"]:
+                        deleted_chunks += 1
+                    else:
+                        failed_deletions += 1
+                        logger.error(f"❌ Failed to delete chunk {chunk_path}: {result.get('error')}")
+                logger.info(f"✅ Deleted batch of {len(batch)} chunks")
             
             # 4. Log chunk deletion summary
             logger.info(f"Chunk deletion summary for file {file_id}: {deleted_chunks} deleted, {failed_deletions} failed")
@@ -282,7 +274,7 @@ class SyncProcessor:
             if versions:
                 latest_version = max(versions, key=lambda v: v.get("version_number", 0))
             
-            return {
+            result = {
                 "status": "completed",
                 "file_id": file_id,
                 "filename": file_metadata.get("filename", "unknown"),
@@ -292,6 +284,25 @@ class SyncProcessor:
                 "action": "update_synchronized"
             }
             
+            # 5. Diff against the previous version via Merkle trees and verify only changed chunks
+            if latest_version and latest_version.get("version_number", 0) > 1:
+                try:
+                    diff = await self._get_version_diff(file_id, latest_version["version_number"] - 1, latest_version["version_number"])
+                    changed = set(diff["changed_chunks"])
+                    chunks = await self._get_file_chunks(file_id)
+                    changed_chunks = [c for c in chunks if c.get("chunk_index") in changed]
+                    verified, missing = await self._verify_chunks_concurrently(changed_chunks) if changed_chunks else (0, [])
+                    logger.info(f"🌳 Update of {file_id}: {len(changed)} changed chunks ({diff['nodes_compared']} nodes compared)")
+                    result.update({
+                        "changed_chunks": sorted(changed),
+                        "changed_chunks_verified": verified,
+                        "missing_chunks": [c.get("storage_path") for c in missing]
+                    })
+                except Exception as e:
+                    logger.warning(f"Could not diff versions of {file_id}: {e}")
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Update sync failed for file {file_id}: {e}")
             raise Exception(f"Update sync processing failed: {str(e)}")
@@ -299,70 +310,86 @@ class SyncProcessor:
     # Helper methods for service integration
     async def _get_file_metadata(self, file_id: str) -> Dict[str, Any]:
         """Get file metadata from metadata service"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{METADATA_SERVICE_URL}/files/{file_id}",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await metadata_service.get(
+            f"{METADATA_SERVICE_URL}/files/{file_id}",
+            headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def _get_file_chunks(self, file_id: str) -> list:
         """Get file chunks from metadata service"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{METADATA_SERVICE_URL}/files/{file_id}/chunks",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await metadata_service.get(
+            f"{METADATA_SERVICE_URL}/files/{file_id}/chunks",
+            headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def _get_file_versions(self, file_id: str) -> list:
         """Get file versions from metadata service"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{METADATA_SERVICE_URL}/files/{file_id}/versions",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await metadata_service.get(
+            f"{METADATA_SERVICE_URL}/files/{file_id}/versions",
+            headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    async def _get_version_diff(self, file_id: str, from_version: int, to_version: int) -> Dict[str, Any]:
+        """Get chunk indexes that changed between two versions from metadata service"""
+        response = await metadata_service.get(
+            f"{METADATA_SERVICE_URL}/files/{file_id}/merkle/diff",
+            params={"from_version": from_version, "to_version": to_version},
+            headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def _verify_chunk_exists(self, chunk_id: str) -> bool:
-        """Verify chunk exists in block storage with faster timeout"""
+        """Verify chunk exists in block storage with a HEAD request (no chunk data is read)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
-                    headers=self.headers,
-                    timeout=3.0  # 🚀 FASTER timeout for verification only
-                )
-                exists = response.status_code == 200
-                logger.debug(f"Chunk {chunk_id} exists: {exists}")
-                return exists
+            response = await block_storage.request(
+                "HEAD",
+                f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
+                headers=self.headers,
+                timeout=3.0  # 🚀 FASTER timeout for verification only
+            )
+            exists = response.status_code == 200
+            logger.debug(f"Chunk {chunk_id} exists: {exists}")
+            return exists
+        except DependencyUnavailable:
+            raise
         except Exception as e:
             logger.debug(f"Chunk verification failed for {chunk_id}: {e}")
             return False
     
-    async def _delete_chunk(self, chunk_id: str):
-        """Delete chunk from block storage"""
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{BLOCK_STORAGE_SERVICE_URL}/chunks/{chunk_id}",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
+    async def _stat_chunks(self, chunk_ids: list) -> Dict[str, Any]:
+        """Existence, size, etag and last-modified of up to 1000 chunks from block storage metadata"""
+        response = await block_storage.post(
+            f"{BLOCK_STORAGE_SERVICE_URL}/chunks/stat",
+            json={"chunk_ids": chunk_ids},
+            headers=self.headers,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()["chunks"]
+    
+    async def _delete_chunks(self, chunk_ids: list) -> Dict[str, Any]:
+        """Delete up to 1000 chunks from block storage in one request; returns the per-chunk results"""
+        response = await block_storage.post(
+            f"{BLOCK_STORAGE_SERVICE_URL}/chunks/delete",
+            json={"chunk_ids": chunk_ids},
+            headers=self.headers,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()["results"]
     
     async def _delete_file_metadata(self, file_id: str):
         """Delete file metadata"""
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{METADATA_SERVICE_URL}/files/{file_id}",
-                headers=self.headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
+        response = await metadata_service.delete(
+            f"{METADATA_SERVICE_URL}/files/{file_id}",
+            headers=self.headers
+        )
+        response.raise_for_status()
 
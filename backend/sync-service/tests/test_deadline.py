@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import deadline
+
+
+def test_budget_is_forwarded_and_caps_timeouts():
+    seen = {}
+
+    def handler(request):
+        seen["header"] = float(request.headers[deadline.DEADLINE_HEADER])
+        seen["timeout"] = request.extensions["timeout"]["read"]
+        return httpx.Response(200)
+
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler),
+                                   event_hooks={"request": [deadline.apply_to_request]})
+        token = deadline._deadline.set(deadline.time.monotonic() + 2)
+        try:
+            await client.get("http://storage/chunks/a", timeout=30)
+        finally:
+            deadline._deadline.reset(token)
+
+    asyncio.run(scenario())
+    assert 1.5 < seen["header"] < 2 - deadline.DEADLINE_FORWARD_MARGIN + 0.01
+    assert seen["timeout"] <= 2
+
+
+def test_middleware_answers_504_when_budget_runs_out():
+    app = FastAPI()
+    app.add_middleware(deadline.DeadlineMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1)
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/slow", headers={deadline.DEADLINE_HEADER: "0.1"}).status_code == 504
+    assert client.get("/slow", headers={deadline.DEADLINE_HEADER: "5"}).status_code == 200
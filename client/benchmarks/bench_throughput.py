@@ -0,0 +1,82 @@
+"""
+Upload and download throughput of the client against a running stack.
+
+Writes a random file, then for every concurrency level uploads it, downloads it
+back, checks the bytes and deletes the remote copy. Needs `docker compose up`
+and a token in CLOUD_TOKEN (or --token).
+
+Usage (from client/):
+    python -m benchmarks.bench_throughput --size-mb 512 --concurrency 1,4,8,16
+"""
+import argparse
+import asyncio
+import filecmp
+import os
+import tempfile
+import time
+
+from cloud_client import CloudClient, TransferState
+from cloud_client.client import CHUNKER_URL, METADATA_URL
+
+MIB = 1024 * 1024
+
+
+def _write_random_file(path: str, size: int):
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            block = min(remaining, 16 * MIB)
+            f.write(os.urandom(block))
+            remaining -= block
+
+
+async def _run_level(args, workdir: str, source: str, concurrency: int):
+    client = CloudClient(
+        token=args.token,
+        chunker_url=args.chunker_url,
+        metadata_url=args.metadata_url,
+        concurrency=concurrency,
+        chunk_size=args.chunk_size_mb * MIB,
+        state=TransferState(os.path.join(workdir, f"state_{concurrency}.json")),
+    )
+    target = os.path.join(workdir, f"download_{concurrency}.bin")
+    async with client:
+        start = time.perf_counter()
+        result = await client.upload_file(source, filename=f"bench_{concurrency}.bin")
+        upload_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await client.download_file(result["file_id"], target)
+        download_time = time.perf_counter() - start
+
+        await client.delete_file(result["file_id"])
+    if not filecmp.cmp(source, target, shallow=False):
+        raise RuntimeError(f"Downloaded file differs at concurrency {concurrency}")
+    os.remove(target)
+    return upload_time, download_time
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--chunk-size-mb", type=int, default=8)
+    parser.add_argument("--concurrency", default="1,4,8,16", help="comma separated levels")
+    parser.add_argument("--token", default=os.getenv("CLOUD_TOKEN"))
+    parser.add_argument("--chunker-url", default=CHUNKER_URL)
+    parser.add_argument("--metadata-url", default=METADATA_URL)
+    args = parser.parse_args()
+
+    size = args.size_mb * MIB
+    levels = [int(level) for level in args.concurrency.split(",")]
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.bin")
+        _write_random_file(source, size)
+        print(f"{args.size_mb} MiB file, {args.chunk_size_mb} MiB chunks")
+        print(f"{'concurrency':>11}  {'upload MiB/s':>12}  {'download MiB/s':>14}")
+        for concurrency in levels:
+            upload_time, download_time = await _run_level(args, workdir, source, concurrency)
+            print(f"{concurrency:>11}  {size / MIB / upload_time:>12.1f}  {size / MIB / download_time:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
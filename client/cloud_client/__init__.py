@@ -0,0 +1,5 @@
+"""Python client for bulk transfers against the cloud file service."""
+from .client import CloudClient, TransferError, plan_chunk_size
+from .state import TransferState
+
+__all__ = ["CloudClient", "TransferError", "TransferState", "plan_chunk_size"]
@@ -0,0 +1,134 @@
+"""
+Command line interface.
+
+    python -m cloud_client upload big.bin other.bin
+    python -m cloud_client download <file_id> -o ./restore/
+    python -m cloud_client sync ./dataset            # push new and modified files
+    python -m cloud_client sync ./dataset --pull     # fetch remote files into ./dataset
+    python -m cloud_client ls
+    python -m cloud_client rm <file_id>
+
+The access token is read from --token or CLOUD_TOKEN.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from .client import (
+    CHUNKER_URL, DEFAULT_CHUNK_SIZE, DEFAULT_CONCURRENCY, DEFAULT_FILE_CONCURRENCY,
+    METADATA_URL, CloudClient, TransferError,
+)
+from .state import TransferState
+
+MIB = 1024 * 1024
+
+
+class Progress:
+    """Transferred bytes and throughput on stderr, refreshed at most once a second"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled and sys.stderr.isatty()
+        self.total = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def __call__(self, transferred: int):
+        self.total += transferred
+        now = time.monotonic()
+        if self.enabled and now - self._last_report >= 1.0:
+            self._last_report = now
+            sys.stderr.write(f"\r{self.summary()}   ")
+            sys.stderr.flush()
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return f"{self.total / MIB:.1f} MiB in {elapsed:.1f}s ({self.total / MIB / elapsed:.1f} MiB/s)"
+
+    def finish(self):
+        if self.enabled:
+            sys.stderr.write("\r")
+        print(self.summary(), file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cloud_client", description="Bulk transfers for the cloud file service")
+    parser.add_argument("--token", help="Bearer token (default: $CLOUD_TOKEN)")
+    parser.add_argument("--chunker-url", default=CHUNKER_URL)
+    parser.add_argument("--metadata-url", default=METADATA_URL)
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="chunk transfers in flight")
+    parser.add_argument("--file-concurrency", type=int, default=DEFAULT_FILE_CONCURRENCY, help="files in flight during sync")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE // MIB, help="upload chunk size in MiB")
+    parser.add_argument("--state-file", help="resume state (default: ~/.cloud_client/state.json)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    parser.add_argument("-v", "--verbose", action="store_true")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    upload = commands.add_parser("upload", help="upload files")
+    upload.add_argument("paths", nargs="+")
+    download = commands.add_parser("download", help="download a file")
+    download.add_argument("file_id")
+    download.add_argument("-o", "--output", default=".", help="destination file or directory")
+    sync = commands.add_parser("sync", help="synchronise a directory")
+    sync.add_argument("directory")
+    sync.add_argument("--pull", action="store_true", help="download remote files instead of uploading local ones")
+    sync.add_argument("--keep-replaced", action="store_true", help="keep the previous remote copy of modified files")
+    commands.add_parser("ls", help="list your files")
+    remove = commands.add_parser("rm", help="delete a file")
+    remove.add_argument("file_id")
+    return parser
+
+
+async def run(args: argparse.Namespace) -> int:
+    progress = Progress(enabled=not args.quiet)
+    client = CloudClient(
+        token=args.token,
+        chunker_url=args.chunker_url,
+        metadata_url=args.metadata_url,
+        concurrency=args.concurrency,
+        file_concurrency=args.file_concurrency,
+        chunk_size=args.chunk_size * MIB,
+        state=TransferState(args.state_file),
+    )
+    exit_code = 0
+    async with client:
+        if args.command == "upload":
+            for path in args.paths:
+                result = await client.upload_file(path, progress=progress)
+                print(f"{result['file_id']}\t{path}")
+        elif args.command == "download":
+            print(await client.download_file(args.file_id, args.output, progress=progress))
+        elif args.command == "sync":
+            summary = await client.sync_directory(
+                args.directory, pull=args.pull, delete_replaced=not args.keep_replaced, progress=progress
+            )
+            print(json.dumps(summary, indent=2))
+            exit_code = 1 if summary["failed"] else 0
+        elif args.command == "ls":
+            for remote in await client.list_files():
+                print(f"{remote['file_id']}\t{remote.get('file_size') or 0:>14}\t{remote.get('filename')}")
+            return 0
+        elif args.command == "rm":
+            await client.delete_file(args.file_id)
+            return 0
+    progress.finish()
+    return exit_code
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(message)s")
+    try:
+        return asyncio.run(run(args))
+    except (TransferError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("interrupted; run the same command again to resume", file=sys.stderr)
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from .state import TransferState
+
+logger = logging.getLogger(__name__)
+
+# Service endpoints and transfer tuning (all overridable per CloudClient)
+CHUNKER_URL = os.getenv("CLOUD_CHUNKER_URL", "http://localhost:8002")
+METADATA_URL = os.getenv("CLOUD_METADATA_URL", "http://localhost:8000")
+DEFAULT_CONCURRENCY = int(os.getenv("CLOUD_CONCURRENCY", "8"))  # chunk transfers in flight
+DEFAULT_FILE_CONCURRENCY = int(os.getenv("CLOUD_FILE_CONCURRENCY", "4"))  # files in flight during sync
+DEFAULT_CHUNK_SIZE = int(os.getenv("CLOUD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+DEFAULT_RETRIES = int(os.getenv("CLOUD_RETRIES", "4"))  # extra attempts per chunk
+DEFAULT_TIMEOUT = float(os.getenv("CLOUD_TIMEOUT", "120"))  # seconds per request
+# Presigned URL lifetime; an interrupted upload can resume until its URLs expire
+URL_EXPIRY = int(os.getenv("CLOUD_URL_EXPIRY", "86400"))
+URL_EXPIRY_MARGIN = 300  # seconds; start over instead of resuming with URLs about to expire
+
+# Server-side limits of the direct upload API
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_CHUNKS_PER_FILE = 1000
+
+ProgressCallback = Callable[[int], None]
+
+
+class TransferError(Exception):
+    """A request or transfer failed for good"""
+
+    def __init__(self, message: str, status: Optional[int] = None, detail: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.detail = detail
+
+
+class _Retryable(Exception):
+    """Transient failure worth another attempt (5xx, 429, corrupt or short chunk)"""
+
+
+def plan_chunk_size(file_size: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Smallest whole-MiB chunk size >= chunk_size that keeps the file within MAX_CHUNKS_PER_FILE chunks"""
+    mib = 1024 * 1024
+    needed = -(-file_size // MAX_CHUNKS_PER_FILE)
+    size = max(chunk_size, -(-needed // mib) * mib)
+    if size > MAX_CHUNK_SIZE:
+        raise TransferError(f"{file_size} bytes do not fit in {MAX_CHUNKS_PER_FILE} chunks of {MAX_CHUNK_SIZE} bytes")
+    return size
+
+
+def _sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_chunk(path: str, offset: int, size: int) -> Tuple[bytes, str]:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(size)
+    if len(data) != size:
+        raise TransferError(f"{path} changed during upload (short read at offset {offset})")
+    return data, _sha256_hex(data)
+
+
+def _write_chunk(path: str, offset: int, data: bytes):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def _raise_for_transfer(response: httpx.Response):
+    if response.status_code == 429 or response.status_code >= 500:
+        raise _Retryable(f"HTTP {response.status_code}")
+    if response.status_code >= 400:
+        raise TransferError(f"HTTP {response.status_code}: {response.text[:200]}", status=response.status_code)
+
+
+async def _run_all(coros: Iterable[Awaitable[Any]]):
+    """Run coroutines concurrently; on the first failure cancel the rest and re-raise it"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if not tasks:
+        return
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+
+
+def _safe_relative_path(filename: str) -> Optional[str]:
+    """Remote filename as a relative path inside a sync root, None if it would escape it"""
+    parts = [part for part in filename.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+class CloudClient:
+    """
+    Async client for bulk transfers.
+
+    Uploads use the chunker's direct upload mode: chunk bytes are PUT straight to
+    object storage through presigned URLs, `concurrency` chunks at a time, then the
+    upload is committed with each chunk's SHA-256. Downloads fetch the presigned
+    manifest and write chunks at their offsets in parallel, verifying digests.
+    Both resume from the state file after an interruption.
+
+        async with CloudClient(token=...) as client:
+            await client.upload_file("data.bin")
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        chunker_url: str = CHUNKER_URL,
+        metadata_url: str = METADATA_URL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        file_concurrency: int = DEFAULT_FILE_CONCURRENCY,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT,
+        state: Optional[TransferState] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.token = token or os.getenv("CLOUD_TOKEN")
+        if not self.token:
+            raise ValueError("An access token is required (pass token= or set CLOUD_TOKEN)")
+        self.chunker_url = chunker_url.rstrip("/")
+        self.metadata_url = metadata_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.file_concurrency = max(1, file_concurrency)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.state = state or TransferState()
+        self._transport = transport
+        self._chunk_slots = asyncio.Semaphore(self.concurrency)  # shared by every file in flight
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "CloudClient":
+        connections = self.concurrency + self.file_concurrency * 2
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=self.timeout,
+            transport=self._transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.state.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _api(self, method: str, url: str, **kwargs) -> Any:
+        """Authenticated call to a service API"""
+        try:
+            response = await self._http.request(
+                method, url, headers={"Authorization": f"Bearer {self.token}"}, **kwargs
+            )
+        except httpx.TransportError as e:
+            raise TransferError(f"{method} {url} failed: {e}") from e
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+                detail = body.get("detail") if isinstance(body, dict) else body
+            except ValueError:
+                detail = response.text[:200]
+            raise TransferError(f"{method} {url} failed: HTTP {response.status_code} {detail}",
+                                status=response.status_code, detail=detail)
+        return response.json() if response.content else None
+
+    async def _with_retries(self, description: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        for number in range(self.retries + 1):
+            try:
+                return await attempt()
+            except (httpx.TransportError, _Retryable) as e:
+                if number == self.retries:
+                    raise TransferError(f"{description} failed after {number + 1} attempts: {e}") from e
+                delay = min(0.5 * 2 ** number, 10.0) * random.uniform(0.5, 1.0)
+                logger.warning(f"⚠️ {description} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    # Uploads
+
+    async def upload_file(self, path: str, filename: Optional[str] = None,
+                          progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Upload one file, resuming a previous interrupted attempt when possible"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        filename = filename or os.path.basename(path)
+
+        session = await self._resumable_upload(path, stat, filename)
+        if session is None:
+            session = await self._start_upload(path, stat, filename)
+        else:
+            logger.info(f"🔁 Resuming upload of {path}: {len(session['digests'])}/{len(session['chunks'])} chunks stored")
+            if progress:
+                progress(sum(c["size"] for c in session["chunks"] if str(c["index"]) in session["digests"]))
+
+        pending = [c for c in session["chunks"] if str(c["index"]) not in session["digests"]]
+        try:
+            await _run_all(self._upload_chunk(path, session, chunk, progress) for chunk in pending)
+        finally:
+            self.state.flush()
+
+        if os.stat(path).st_mtime_ns != session["mtime_ns"]:
+            self.state.pop("uploads", path)
+            raise TransferError(f"{path} was modified during upload")
+
+        try:
+            result = await self._api("POST", f"{self.chunker_url}{session['commit_url']}", json={
+                "file_size": session["size"],
+                "chunks": [
+                    {"index": c["index"], "chunk_id": c["chunk_id"], "digest": session["digests"][str(c["index"])]}
+                    for c in session["chunks"]
+                ],
+            })
+        except TransferError as e:
+            if e.status == 409 and isinstance(e.detail, dict):
+                # Storage lost some chunks: forget them so the next attempt uploads them again
+                missing = set(e.detail.get("missing", []))
+                for c in session["chunks"]:
+                    if c["chunk_id"] in missing:
+                        session["digests"].pop(str(c["index"]), None)
+                self.state.touch()
+            raise
+        finally:
+            self.state.flush()
+
+        self.state.pop("uploads", path)
+        self.state.flush()
+        logger.info(f"✅ Uploaded {path} as {session['file_id']} ({len(session['chunks'])} chunks)")
+        return result
+
+    async def _resumable_upload(self, path: str, stat: os.stat_result, filename: str) -> Optional[Dict[str, Any]]:
+        session = self.state.get("uploads", path)
+        if session is None:
+            return None
+        if (session["size"] == stat.st_size and session["mtime_ns"] == stat.st_mtime_ns
+                and session["filename"] == filename and session["expires_at"] - URL_EXPIRY_MARGIN > time.time()):
+            return session
+        # File changed or URLs expired: drop the half-finished upload
+        self.state.pop("uploads", path)
+        try:
+            await self.delete_file(session["file_id"])
+        except TransferError as e:
+            logger.warning(f"⚠️ Could not remove abandoned upload {session['file_id']}: {e}")
+        return None
+
+    async def _start_upload(self, path: str, stat: os.stat_result, filename: str) -> Dict[str, Any]:
+        started = await self._api("POST", f"{self.chunker_url}/upload/direct", json={
+            "filename": filename,
+            "file_size": stat.st_size,
+            "chunk_size": plan_chunk_size(stat.st_size, self.chunk_size),
+            "expires_in": URL_EXPIRY,
+        })
+        session = {
+            "file_id": started["file_id"],
+            "filename": filename,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "expires_at": time.time() + started["expires_in"],
+            "commit_url": started["commit_url"],
+            "chunks": [
+                {key: chunk[key] for key in ("index", "chunk_id", "offset", "size", "url")}
+                for chunk in started["chunks"]
+            ],
+            "digests": {},  # chunk index (as str) -> SHA-256 of stored chunks
+        }
+        self.state.put("uploads", path, session)
+        return session
+
+    async def _upload_chunk(self, path: str, session: Dict[str, Any], chunk: Dict[str, Any],
+                            progress: Optional[ProgressCallback]):
+        async with self._chunk_slots:
+            data, digest = await asyncio.to_thread(_read_chunk, path, chunk["offset"], chunk["size"])
+
+            async def put():
+                _raise_for_transfer(await self._http.put(chunk["url"], content=data))
+
+            await self._with_retries(f"Upload of chunk {chunk['index']} of {path}", put)
+        session["digests"][str(chunk["index"])] = digest
+        self.state.touch()
+        if progress:
+            progress(len(data))
+
+    # Downloads
+
+    async def download_file(self, file_id: str, dest: str, progress: Optional[ProgressCallback] = None) -> str:
+        """Download a file to dest (a path or an existing directory); returns the written path"""
+        manifest = await self._api(
+            "GET", f"{self.chunker_url}/download/{file_id}/manifest", params={"expires_in": URL_EXPIRY}
+        )
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, os.path.basename(manifest["filename"]))
+        dest = os.path.abspath(dest)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+        chunks = manifest["chunks"]
+        if all(chunk.get("size") is not None for chunk in chunks):
+            await self._download_ranges(file_id, manifest, dest, progress)
+        else:
+            # Chunks stored before sizes were recorded: offsets unknown, write in order
+            await self._download_ordered(manifest, dest, progress)
+        logger.info(f"✅ Downloaded {file_id} to {dest} ({len(chunks)} chunks)")
+        return dest
+
+    async def _download_ranges(self, file_id: str, manifest: Dict[str, Any], dest: str,
+                               progress: Optional[ProgressCallback]):
+        key = f"{file_id}:{dest}"
+        part_path = f"{dest}.part"
+        chunks = manifest["chunks"]
+
+        session = self.state.get("downloads", key)
+        if session is None or session["etag"] != manifest["etag"] or not os.path.exists(part_path):
+            session = {"etag": manifest["etag"], "done": []}
+            with open(part_path, "wb") as f:
+                f.truncate(sum(chunk["size"] for chunk in chunks))
+            self.state.put("downloads", key, session)
+        elif session["done"]:
+            logger.info(f"🔁 Resuming download of {file_id}: {len(session['done'])}/{len(chunks)} chunks on disk")
+
+        done = set(session["done"])
+        offsets, offset = [], 0
+        for chunk in chunks:
+            offsets.append(offset)
+            offset += chunk["size"]
+        if progress and done:
+            progress(sum(chunk["size"] for chunk in chunks if chunk["index"] in done))
+
+        async def fetch(chunk: Dict[str, Any], chunk_offset: int):
+            async with self._chunk_slots:
+                data = await self._fetch_chunk(chunk)
+                await asyncio.to_thread(_write_chunk, part_path, chunk_offset, data)
+            session["done"].append(chunk["index"])
+            self.state.touch()
+            if progress:
+                progress(len(data))
+
+        try:
+            await _run_all(
+                fetch(chunk, chunk_offset)
+                for chunk, chunk_offset in zip(chunks, offsets) if chunk["index"] not in done
+            )
+        finally:
+            self.state.flush()
+
+        os.replace(part_path, dest)
+        self.state.pop("downloads", key)
+        self.state.flush()
+
+    async def _download_ordered(self, manifest: Dict[str, Any], dest: str, progress: Optional[ProgressCallback]):
+        part_path = f"{dest}.part"
+        window: deque = deque()
+        try:
+            with open(part_path, "wb") as out:
+                for chunk in manifest["chunks"]:
+                    window.append(asyncio.ensure_future(self._fetch_chunk(chunk)))
+                    if len(window) >= self.concurrency:
+                        await self._write_next(window, out, progress)
+                while window:
+                    await self._write_next(window, out, progress)
+        except BaseException:
+            for task in window:
+                task.cancel()
+            raise
+        os.replace(part_path, dest)
+
+    async def _write_next(self, window: deque, out, progress: Optional[ProgressCallback]):
+        data = await window.popleft()
+        await asyncio.to_thread(out.write, data)
+        if progress:
+            progress(len(data))
+
+    async def _fetch_chunk(self, chunk: Dict[str, Any]) -> bytes:
+        async def get() -> bytes:
+            response = await self._http.get(chunk["url"])
+            _raise_for_transfer(response)
+            data = response.content
+            if chunk.get("size") is not None and len(data) != chunk["size"]:
+                raise _Retryable(f"chunk {chunk['chunk_id']} is {len(data)} bytes, expected {chunk['size']}")
+            if chunk.get("sha256") and await asyncio.to_thread(_sha256_hex, data) != chunk["sha256"]:
+                raise _Retryable(f"chunk {chunk['chunk_id']} failed SHA-256 verification")
+            return data
+
+        return await self._with_retries(f"Download of chunk {chunk['index']}", get)
+
+    # Files and directory sync
+
+    async def list_files(self, page_size: int = 100) -> List[Dict[str, Any]]:
+        """Every file owned by the current user"""
+        files: List[Dict[str, Any]] = []
+        while True:
+            page = await self._api(
+                "GET", f"{self.metadata_url}/files", params={"skip": len(files), "limit": page_size}
+            )
+            files.extend(page)
+            if len(page) < page_size:
+                return files
+
+    async def delete_file(self, file_id: str):
+        await self._api("DELETE", f"{self.metadata_url}/files/{file_id}")
+
+    async def sync_directory(self, local_dir: str, pull: bool = False, delete_replaced: bool = True,
+                             progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Push new and modified files under local_dir (or with pull=True, fetch remote
+        files missing or outdated locally). Remote filenames are paths relative to
+        local_dir. A failed file does not stop the others; failures are returned.
+        """
+        root = os.path.abspath(local_dir)
+        synced = self.state.data["synced"].setdefault(root, {})
+        if pull:
+            work, skipped = await self._plan_pull(root, synced, progress)
+        else:
+            work, skipped = self._plan_push(root, synced, delete_replaced, progress)
+
+        slots = asyncio.Semaphore(self.file_concurrency)
+
+        async def run(transfer: Callable[[], Awaitable[int]]) -> int:
+            async with slots:
+                return await transfer()
+
+        results = await asyncio.gather(*[run(transfer) for _, transfer in work], return_exceptions=True)
+        self.state.flush()
+
+        failed = {}
+        transferred_bytes = 0
+        for (relative_path, _), result in zip(work, results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Sync of {relative_path} failed: {result}")
+                failed[relative_path] = str(result)
+            else:
+                transferred_bytes += result
+        return {
+            "transferred": len(work) - len(failed),
+            "skipped": skipped,
+            "failed": failed,
+            "bytes": transferred_bytes,
+        }
+
+    def _plan_push(self, root: str, synced: Dict[str, Any], delete_replaced: bool,
+                   progress: Optional[ProgressCallback]) -> Tuple[List[Tuple[str, Callable]], int]:
+        work, skipped = [], 0
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+                stat = os.stat(path)
+                entry = synced.get(relative_path)
+                if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                    skipped += 1
+                    continue
+                work.append((relative_path, self._push_one(synced, path, relative_path, entry, delete_replaced, progress)))
+        return work, skipped
+
+    def _push_one(self, synced: Dict[str, Any], path: str, relative_path: str, previous: Optional[Dict[str, Any]],
+                  delete_replaced: bool, progress: Optional[ProgressCallback]) -> Callable[[], Awaitable[int]]:
+        async def transfer() -> int:
+            stat = os.stat(path)
+            result = await self.upload_file(path, filename=relative_path, progress=progress)
+            synced[relative_path] = {"file_id": result["file_id"], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self.state.touch()
+            if previous and delete_replaced and previous.get("file_id") != result["file_id"]:
+                try:
+                    await self.delete_file(previous["file_id"])
+                except TransferError as e:
+                    logger.warning(f"⚠️ Could not remove replaced file {previous['file_id']}: {e}")
+            return stat.st_size
+        return transfer
+
+    async def _plan_pull(self, root: str, synced: Dict[str, Any],
+                         progress: Optional[ProgressCallback]) -> Tuple[List[Tuple[str, Callable]], int]:
+        # Newest file wins when several share a name
+        latest: Dict[str, Dict[str, Any]] = {}
+        for remote in await self.list_files():
+            relative_path = _safe_relative_path(remote.get("filename") or "")
+            if relative_path is None:
+                logger.warning(f"⚠️ Skipping {remote.get('file_id')}: unsafe filename {remote.get('filename')!r}")
+                continue
+            if not remote.get("versions"):
+                continue  # upload never committed
+            current = latest.get(relative_path)
+            if current is None or (remote.get("updated_at") or "") > (current.get("updated_at") or ""):
+                latest[relative_path] = remote
+
+        work, skipped = [], 0
+        for relative_path, remote in sorted(latest.items()):
+            path = os.path.join(root, *relative_path.split("/"))
+            entry = synced.get(relative_path)
+            if (entry and entry.get("file_id") == remote["file_id"]
+                    and entry.get("updated_at") == remote.get("updated_at") and os.path.exists(path)):
+                skipped += 1
+                continue
+            work.append((relative_path, self._pull_one(synced, path, relative_path, remote, progress)))
+        return work, skipped
+
+    def _pull_one(self, synced: Dict[str, Any], path: str, relative_path: str, remote: Dict[str, Any],
+                  progress: Optional[ProgressCallback]) -> Callable[[], Awaitable[int]]:
+        async def transfer() -> int:
+            await self.download_file(remote["file_id"], path, progress=progress)
+            stat = os.stat(path)
+            # Record size and mtime too, so a later push does not upload the file back
+            synced[relative_path] = {
+                "file_id": remote["file_id"],
+                "updated_at": remote.get("updated_at"),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            self.state.touch()
+            return stat.st_size
+        return transfer
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = os.path.join(os.path.expanduser("~"), ".cloud_client", "state.json")
+STATE_FLUSH_INTERVAL = float(os.getenv("CLOUD_STATE_FLUSH_INTERVAL", "1.0"))  # seconds between writes
+
+SECTIONS = ("uploads", "downloads", "synced")
+
+
+class TransferState:
+    """
+    Local JSON file that lets interrupted transfers resume.
+
+    - uploads: in-progress direct uploads keyed by absolute path
+    - downloads: in-progress downloads keyed by "<file_id>:<absolute destination>"
+    - synced: per sync root, the relative paths already transferred
+
+    Writes are throttled to one per STATE_FLUSH_INTERVAL and go through a
+    temporary file plus rename so a crash never leaves a truncated state file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CLOUD_STATE_FILE", DEFAULT_STATE_FILE)
+        self.data: Dict[str, Dict[str, Any]] = {section: {} for section in SECTIONS}
+        self._dirty = False
+        self._last_flush = 0.0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable state file {self.path}: {e}")
+            return
+        for section in SECTIONS:
+            self.data[section] = loaded.get(section, {})
+
+    def get(self, section: str, key: str) -> Optional[Dict[str, Any]]:
+        return self.data[section].get(key)
+
+    def put(self, section: str, key: str, value: Dict[str, Any]):
+        self.data[section][key] = value
+        self.touch()
+
+    def pop(self, section: str, key: str):
+        if self.data[section].pop(key, None) is not None:
+            self.touch()
+
+    def touch(self):
+        """Record that an entry changed in place; written out on the next flush"""
+        self._dirty = True
+        self.flush(force=False)
+
+    def flush(self, force: bool = True):
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < STATE_FLUSH_INTERVAL:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._last_flush = now
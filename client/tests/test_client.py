@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+
+import httpx
+import pytest
+
+from cloud_client import CloudClient, TransferError, TransferState
+
+MIB = 1024 * 1024
+
+
+class FakeStack:
+    """In-memory chunker, metadata service and object storage behind an httpx MockTransport"""
+
+    def __init__(self):
+        self.objects = {}
+        self.files = {}
+        self.puts = []
+        self.fail_puts = set()      # chunk indexes whose PUT answers 503
+        self.corrupt_gets = {}      # chunk_id -> remaining corrupted responses
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.url.host == "storage":
+            chunk_id = path.lstrip("/")
+            if request.method == "PUT":
+                index = int(chunk_id.split("_chunk_")[1].split("_")[0])
+                if index in self.fail_puts:
+                    return httpx.Response(503)
+                self.puts.append(chunk_id)
+                self.objects[chunk_id] = request.content
+                return httpx.Response(200)
+            data = self.objects[chunk_id]
+            if self.corrupt_gets.get(chunk_id):
+                self.corrupt_gets[chunk_id] -= 1
+                data = b"\x00" + data[1:]
+            return httpx.Response(200, content=data)
+
+        body = json.loads(request.content) if request.content else None
+        if path == "/upload/direct":
+            file_id = uuid.uuid4().hex
+            size, chunk_size = body["file_size"], body["chunk_size"]
+            chunks = []
+            for index, offset in enumerate(range(0, size, chunk_size)):
+                chunk_id = f"u1_{file_id}_chunk_{index}_{uuid.uuid4().hex[:8]}"
+                chunks.append({"index": index, "chunk_id": chunk_id, "offset": offset,
+                               "size": min(chunk_size, size - offset), "url": f"http://storage/{chunk_id}"})
+            self.files[file_id] = {"file_id": file_id, "filename": body["filename"], "versions": [], "chunks": []}
+            return httpx.Response(200, json={"file_id": file_id, "expires_in": body["expires_in"], "chunks": chunks,
+                                             "commit_url": f"/upload/direct/{file_id}/commit"})
+        if path.endswith("/commit"):
+            file_id = path.split("/")[3]
+            for chunk in body["chunks"]:
+                assert hashlib.sha256(self.objects[chunk["chunk_id"]]).hexdigest() == chunk["digest"]
+            self.files[file_id].update(chunks=body["chunks"], versions=[{"version_number": 1}],
+                                       file_size=body["file_size"], updated_at=uuid.uuid4().hex)
+            return httpx.Response(200, json={"file_id": file_id, "status": "completed"})
+        if path.endswith("/manifest"):
+            record = self.files[path.split("/")[2]]
+            return httpx.Response(200, json={
+                "file_id": record["file_id"], "filename": record["filename"], "etag": f'"{record["updated_at"]}"',
+                "chunks": [{"index": c["index"], "chunk_id": c["chunk_id"], "size": len(self.objects[c["chunk_id"]]),
+                            "sha256": c["digest"], "url": f"http://storage/{c['chunk_id']}"} for c in record["chunks"]],
+            })
+        if path == "/files":
+            return httpx.Response(200, json=list(self.files.values()))
+        if request.method == "DELETE":
+            self.files.pop(path.split("/")[2], None)
+            return httpx.Response(204)
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def stack():
+    return FakeStack()
+
+
+def make_client(stack, tmp_path, **kwargs):
+    return CloudClient(
+        token="test", chunker_url="http://chunker", metadata_url="http://metadata",
+        chunk_size=MIB, state=TransferState(str(tmp_path / "state.json")),
+        transport=httpx.MockTransport(stack.handler), **kwargs
+    )
+
+
+def write_file(path, size):
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+def test_upload_download_roundtrip(stack, tmp_path):
+    data = write_file(tmp_path / "data.bin", int(2.5 * MIB))
+
+    async def scenario():
+        async with make_client(stack, tmp_path, concurrency=3) as client:
+            result = await client.upload_file(str(tmp_path / "data.bin"))
+            return await client.download_file(result["file_id"], str(tmp_path / "copy.bin"))
+
+    target = asyncio.run(scenario())
+    assert open(target, "rb").read() == data
+    assert len(stack.puts) == 3
+    assert not os.path.exists(f"{target}.part")
+
+
+def test_interrupted_upload_resumes_missing_chunks_only(stack, tmp_path):
+    write_file(tmp_path / "data.bin", 4 * MIB)
+    stack.fail_puts = {2}
+
+    async def upload():
+        async with make_client(stack, tmp_path, retries=0, concurrency=1) as client:
+            return await client.upload_file(str(tmp_path / "data.bin"))
+
+    with pytest.raises(TransferError):
+        asyncio.run(upload())
+    assert len(stack.puts) == 2
+
+    stack.fail_puts = set()
+    stack.puts = []
+    asyncio.run(upload())
+    assert [chunk_id.split("_chunk_")[1][0] for chunk_id in stack.puts] == ["2", "3"]
+    assert TransferState(str(tmp_path / "state.json")).data["uploads"] == {}
+
+
+def test_corrupt_chunk_is_fetched_again(stack, tmp_path):
+    data = write_file(tmp_path / "data.bin", 2 * MIB)
+
+    async def scenario():
+        async with make_client(stack, tmp_path) as client:
+            result = await client.upload_file(str(tmp_path / "data.bin"))
+            stack.corrupt_gets = {stack.puts[1]: 1}
+            return await client.download_file(result["file_id"], str(tmp_path / "copy.bin"))
+
+    target = asyncio.run(scenario())
+    assert open(target, "rb").read() == data
+    assert stack.corrupt_gets[stack.puts[1]] == 0
+
+
+def test_sync_push_skips_unchanged_and_pull_restores_tree(stack, tmp_path):
+    source = tmp_path / "source"
+    (source / "nested").mkdir(parents=True)
+    first = write_file(source / "a.bin", MIB + 10)
+    second = write_file(source / "nested" / "b.bin", 100)
+
+    async def push():
+        async with make_client(stack, tmp_path) as client:
+            return await client.sync_directory(str(source))
+
+    summary = asyncio.run(push())
+    assert summary["transferred"] == 2 and summary["failed"] == {}
+    assert asyncio.run(push())["skipped"] == 2
+
+    async def pull():
+        async with make_client(stack, tmp_path) as client:
+            return await client.sync_directory(str(tmp_path / "restore"), pull=True)
+
+    assert asyncio.run(pull())["transferred"] == 2
+    assert (tmp_path / "restore" / "a.bin").read_bytes() == first
+    assert (tmp_path / "restore" / "nested" / "b.bin").read_bytes() == second